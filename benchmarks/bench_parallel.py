@@ -0,0 +1,79 @@
+"""
+Latency of rules whose operands each wait on a round trip of independent,
+exponentially distributed latency, when evaluated one after the other and
+in parallel.
+"""
+
+import asyncio
+import random
+import time
+
+from rules.predicates import predicate
+
+MEAN_LATENCY = 0.002  # seconds
+
+SAMPLES = 200
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def make_rule(num_operands, parallel):
+    def round_trip():
+        time.sleep(random.expovariate(1 / MEAN_LATENCY))
+        return None  # so that every operand is evaluated
+
+    pred = predicate(round_trip)
+    for _ in range(num_operands - 1):
+        pred = pred | predicate(round_trip)
+    return pred.parallel() if parallel else pred
+
+
+def make_async_rule(num_operands, parallel):
+    async def round_trip():
+        await asyncio.sleep(random.expovariate(1 / MEAN_LATENCY))
+        return None
+
+    pred = predicate(round_trip)
+    for _ in range(num_operands - 1):
+        pred = pred | predicate(round_trip)
+    return pred.parallel() if parallel else pred
+
+
+class ParallelLatency:
+    params = [[2, 4], [False, True]]
+    param_names = ["num_operands", "parallel"]
+
+    def setup(self, num_operands, parallel):
+        random.seed(0)
+        self.pred = make_rule(num_operands, parallel)
+        self.apred = make_async_rule(num_operands, parallel)
+        self.pred.test()  # start the threads
+
+    def latencies(self, test):
+        latencies = []
+        for _ in range(SAMPLES):
+            start = time.perf_counter()
+            test()
+            latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+    def track_p50(self, num_operands, parallel):
+        return percentile(self.latencies(self.pred.test), 50)
+
+    track_p50.unit = "ms"
+
+    def track_p99(self, num_operands, parallel):
+        return percentile(self.latencies(self.pred.test), 99)
+
+    track_p99.unit = "ms"
+
+    def track_async_p99(self, num_operands, parallel):
+        def test():
+            asyncio.run(self.apred.atest())
+
+        return percentile(self.latencies(test), 99)
+
+    track_async_p99.unit = "ms"
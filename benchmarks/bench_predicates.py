@@ -0,0 +1,87 @@
+"""
+Per-call overhead of evaluating predicates that accept zero, one or two
+arguments, through ``Predicate.test()`` and through the internal
+``Predicate._apply()`` used by combined predicates, and of testing a list
+of objects.
+"""
+
+from rules.predicates import is_active, is_group_member, is_superuser, predicate
+
+
+def make_predicate(num_args):
+    if num_args == 0:
+        return predicate(lambda: True)
+    if num_args == 1:
+        return predicate(lambda user: True)
+    return predicate(lambda user, obj: True)
+
+
+class PredicateCall:
+    params = [0, 1, 2]
+    param_names = ["num_args"]
+
+    def setup(self, num_args):
+        self.pred = make_predicate(num_args)
+        self.bound = predicate(bind=True)(lambda self, user, obj: True)
+
+    def time_test(self, num_args):
+        self.pred.test("user", "obj")
+
+    def time_apply(self, num_args):
+        self.pred._apply("user", "obj")
+
+    def time_test_bind(self, num_args):
+        self.bound.test("user", "obj")
+
+
+class TestMany:
+    """
+    Testing a rule against a list of objects in a loop and with
+    ``Predicate.test_many()``.
+    """
+
+    params = [10, 100, 1000]
+    param_names = ["num_objects"]
+
+    def setup(self, num_objects):
+        is_staff = predicate(lambda user: user == "staff")
+        is_owner = predicate(lambda user, obj: obj % 2 == 0)
+        self.pred = is_staff | (is_owner & ~is_staff)
+        self.objects = list(range(num_objects))
+
+    def time_test_loop(self, num_objects):
+        [self.pred.test("user", obj) for obj in self.objects]
+
+    def time_test_many(self, num_objects):
+        self.pred.test_many("user", self.objects)
+
+
+class User:
+    is_active = True
+    is_superuser = False
+    _group_names_cache = frozenset(["authors"])
+
+
+class Specialize:
+    """
+    Testing a rule that checks the groups of the user against a list of
+    objects in a loop, and with ``Predicate.specialize()``.
+    """
+
+    params = [10, 100, 1000]
+    param_names = ["num_objects"]
+
+    def setup(self, num_objects):
+        is_owner = predicate(lambda user, obj: obj % 2 == 0)
+        self.pred = (is_superuser | is_group_member("editors")) | (
+            is_owner & is_active & is_group_member("authors")
+        )
+        self.user = User()
+        self.objects = list(range(num_objects))
+
+    def time_test_loop(self, num_objects):
+        [self.pred.test(self.user, obj) for obj in self.objects]
+
+    def time_specialize(self, num_objects):
+        residual = self.pred.specialize(self.user)
+        [residual.test(obj) for obj in self.objects]
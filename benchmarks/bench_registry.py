@@ -0,0 +1,126 @@
+"""
+Time it takes to create and register the predicates of a large number of
+rules, eg. generated per tenant when a worker starts, and to test one of
+them once registered.
+"""
+
+import tracemalloc
+
+from rules.permissions import ObjectPermissionBackend, permissions
+from rules.predicates import is_active, is_superuser, predicate
+from rules.rulesets import RuleSet
+
+
+class User:
+    is_active = True
+    is_superuser = False
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+
+
+def make_predicate(tenant):
+    @predicate
+    def is_tenant_member(user, obj):
+        return user.tenant == tenant
+
+    return is_tenant_member
+
+
+class RuleRegistration:
+    params = [50000]
+    param_names = ["num_rules"]
+
+    def time_register(self, num_rules):
+        rules = RuleSet()
+        for i in range(num_rules):
+            pred = (make_predicate(i) & is_active) | is_superuser
+            rules.add_rule("tenant_%d.view" % i, pred)
+
+
+class RuleLookup:
+    """
+    Testing a rule, and checking a permission through the authentication
+    backend, among a large number of registered ones.
+    """
+
+    params = [10000]
+    param_names = ["num_rules"]
+
+    def setup(self, num_rules):
+        self.names = ["tenant_%d.view" % i for i in range(num_rules)]
+        self.rules = RuleSet()
+        for i, name in enumerate(self.names):
+            pred = (make_predicate(i) & is_active) | is_superuser
+            self.rules.add_rule(name, pred)
+            permissions.add_rule(name, pred)
+        self.name = self.names[num_rules // 2]
+        self.user = User(tenant=num_rules // 2)
+        self.backend = ObjectPermissionBackend()
+
+    def teardown(self, num_rules):
+        for name in self.names:
+            permissions.pop(name)
+
+    def time_test_rule(self, num_rules):
+        self.rules.test_rule(self.name, self.user, None)
+
+    def time_test_missing_rule(self, num_rules):
+        self.rules.test_rule("nonexistent", self.user, None)
+
+    def time_backend_has_perm(self, num_rules):
+        self.backend.has_perm(self.user, self.name, None)
+
+
+class SharedRules:
+    """
+    Memory taken by a large number of rules built from the same few
+    expressions, eg. permissions of many models.
+    """
+
+    params = [10000]
+    param_names = ["num_rules"]
+
+    def track_memory(self, num_rules):
+        is_owner = predicate(lambda user, obj: obj.owner == user)
+        is_editor = predicate(lambda user: user.is_editor)
+        tracemalloc.start()
+        try:
+            rules = RuleSet()
+            for i in range(num_rules):
+                pred = (is_editor & is_active) | (is_owner | is_superuser)
+                rules.add_rule("app.perm_%d" % i, pred)
+            return tracemalloc.get_traced_memory()[0] / 1024
+        finally:
+            tracemalloc.stop()
+
+    track_memory.unit = "KiB"
+
+
+class Capabilities:
+    """
+    Deciding all the actions a user may take on an object, among a large
+    number of registered rules, one rule at a time or all at once.
+    """
+
+    params = [10000]
+    param_names = ["num_rules"]
+
+    def setup(self, num_rules):
+        is_member = predicate(lambda user, obj: user.tenant == obj, memoize=True)
+        self.rules = RuleSet()
+        for i in range(num_rules):
+            pred = (is_member & is_active) | is_superuser
+            self.rules.add_rule("tenant_%d.view" % i, pred)
+        self.actions = ("view", "change", "delete", "share", "export")
+        for action in self.actions:
+            pred = (is_member & is_active & predicate(lambda: True)) | is_superuser
+            self.rules.add_rule("app.%s" % action, pred)
+        self.user = User(tenant=1)
+
+    def time_test_rule(self, num_rules):
+        for name in self.rules.rule_names("app."):
+            self.rules.test_rule(name, self.user, 1)
+
+    def time_test_rules(self, num_rules):
+        self.rules.test_rules(self.rules.rule_names("app."), self.user, 1)
@@ -0,0 +1,101 @@
+"""
+Time it takes to test rules made of many predicates: deep trees of nested
+operations, wide operations with many operands, and predicates that use the
+invocation context.
+"""
+
+from rules.predicates import predicate
+
+
+def make_leaves(num_leaves, value=None):
+    # Distinct functions, so that simplify() doesn't dedupe them. A result of
+    # None is skipped, so that every predicate of the tree is evaluated.
+    return [
+        predicate(lambda user, obj: value, name="leaf_%d" % i)
+        for i in range(num_leaves)
+    ]
+
+
+class DeepTree:
+    """
+    A rule that nests ``&``, ``|`` and ``~`` ``depth`` levels deep, each level
+    having a predicate of its own.
+    """
+
+    params = [10, 50, 200]
+    param_names = ["depth"]
+
+    def setup(self, depth):
+        pred = None
+        for i, leaf in enumerate(make_leaves(depth)):
+            if pred is None:
+                pred = leaf
+            elif i % 3 == 0:
+                pred = ~(leaf | pred)
+            elif i % 3 == 1:
+                pred = leaf & pred
+            else:
+                pred = leaf | pred
+        self.pred = pred
+        self.compiled = pred.compile()
+
+    def time_test(self, depth):
+        self.pred.test("user", "obj")
+
+    def time_test_compiled(self, depth):
+        self.compiled.test("user", "obj")
+
+
+class WideTree:
+    """
+    A rule that is a single ``|`` of ``width`` predicates, none of which
+    decides it.
+    """
+
+    params = [10, 100, 500]
+    param_names = ["width"]
+
+    def setup(self, width):
+        leaves = make_leaves(width)
+        pred = leaves[0]
+        for leaf in leaves[1:]:
+            pred = pred | leaf
+        # flattened, as when added to a rule set
+        self.pred = pred.simplify()
+        self.compiled = self.pred.compile()
+
+    def time_test(self, width):
+        self.pred.test("user", "obj")
+
+    def time_test_compiled(self, width):
+        self.compiled.test("user", "obj")
+
+
+class ContextHeavy:
+    """
+    A rule whose predicates all take ``bind=True`` and share results through
+    the invocation context, with and without memoization.
+    """
+
+    params = [10, 100]
+    param_names = ["num_predicates"]
+
+    def setup(self, num_predicates):
+        def make(i, memoize):
+            def fn(self, user, obj):
+                self.context[i] = self.context.get(i - 1, 0) + 1
+                return None
+
+            return predicate(fn, name="bound_%d" % i, bind=True, memoize=memoize)
+
+        self.pred = make(0, False)
+        self.memoized = make(0, True)
+        for i in range(1, num_predicates):
+            self.pred = self.pred & make(i, False)
+            self.memoized = self.memoized & make(i, True)
+
+    def time_test(self, num_predicates):
+        self.pred.test("user", "obj")
+
+    def time_test_memoized(self, num_predicates):
+        self.memoized.test("user", "obj")
@@ -0,0 +1,227 @@
+"""
+Request round trips through views that check permissions of the test app in
+``tests/testapp``: ``permission_required``, ``PermissionRequiredMixin`` and
+``AutoPermissionViewSetMixin``, along with the authentication backend they
+go through. Uses an in-memory database that is set up on first use.
+"""
+
+import logging
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+_data = {}
+
+
+def setup_django():
+    """
+    Configures Django with the settings of the test app, creates its tables
+    and returns the test data.
+    """
+    if _data:
+        return _data
+
+    sys.path.insert(0, os.path.join(os.path.dirname(HERE), "tests"))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testapp.settings")
+
+    import django
+
+    django.setup()
+    # not a warning for every denied request
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+
+    from django.contrib.auth.models import Group, User
+    from django.core.management import call_command
+
+    import testapp.rules  # noqa: F401 registers the rules of the test app
+    from testapp.models import Book
+
+    call_command("migrate", verbosity=0)
+    author = User.objects.create_user("author", is_staff=True)
+    editor = User.objects.create_user("editor", is_staff=True)
+    editor.groups.add(Group.objects.create(name="editors"))
+    _data.update(
+        author=author,
+        editor=editor,
+        book=Book.objects.create(isbn="isbn", title="A Book", author=author),
+    )
+    return _data
+
+
+class ViewRoundTrip:
+    """
+    Requests through the whole middleware stack, including the session
+    lookup, by a user who may and by one who may not delete the book.
+    """
+
+    params = ["author", "editor"]
+    param_names = ["user"]
+
+    def setup(self, user):
+        data = setup_django()
+
+        from django.test import Client
+
+        self.client = Client()
+        self.client.force_login(data[user])
+        self.book_id = data["book"].pk
+
+    def time_permission_required(self, user):
+        self.client.get("/%d/delete/" % self.book_id)
+
+    def time_permission_required_mixin(self, user):
+        self.client.get("/cbv/%d/delete/" % self.book_id)
+
+
+class ViewSetRoundTrip:
+    """
+    Requests to a viewset of the test app's ``TestModel``.
+    """
+
+    def setup(self):
+        data = setup_django()
+
+        from rest_framework.serializers import ModelSerializer
+        from rest_framework.test import APIRequestFactory
+        from rest_framework.viewsets import ModelViewSet
+        from testapp.models import TestModel
+
+        from rules.contrib.rest_framework import AutoPermissionViewSetMixin
+
+        class TestModelSerializer(ModelSerializer):
+            class Meta:
+                model = TestModel
+                fields = "__all__"
+
+        class TestViewSet(AutoPermissionViewSetMixin, ModelViewSet):
+            queryset = TestModel.objects.all()
+            serializer_class = TestModelSerializer
+
+        self.pk = TestModel.objects.create().pk
+        self.list = TestViewSet.as_view({"get": "list"})
+        self.retrieve = TestViewSet.as_view({"get": "retrieve"})
+        self.request = APIRequestFactory().get("/")
+        self.request.user = data["author"]
+
+    def time_list(self):
+        self.list(self.request)
+
+    def time_retrieve(self):
+        self.retrieve(self.request, pk=self.pk)
+
+
+class BackendHasPerm:
+    """
+    ``User.has_perm()``, which goes through all authentication backends.
+    """
+
+    params = ["author", "editor"]
+    param_names = ["user"]
+
+    def setup(self, user):
+        data = setup_django()
+        self.user = data[user]
+        self.book = data["book"]
+
+    def time_has_perm_object(self, user):
+        self.user.has_perm("testapp.delete_book", self.book)
+
+    def time_has_perm_model(self, user):
+        self.user.has_perm("testapp.create_book")
+
+
+class AsyncBackendHasPerm:
+    """
+    Checks of an object permission from async code, awaiting
+    ``ObjectPermissionBackend.ahas_perm()`` or calling ``has_perm()`` in a
+    thread with ``sync_to_async``, for a rule that queries the database, and
+    so is tested in a thread either way, and for one that is async-safe.
+    """
+
+    params = [[1, 20], [False, True]]
+    param_names = ["checks", "async_safe"]
+
+    def setup(self, checks, async_safe):
+        data = setup_django()
+
+        from asgiref.sync import sync_to_async
+
+        import rules.permissions
+        from rules.permissions import ObjectPermissionBackend
+        from rules.predicates import is_staff
+
+        rules.permissions.set_perm("testapp.view_book", is_staff)
+        backend = ObjectPermissionBackend()
+        self.has_perm = sync_to_async(backend.has_perm)
+        self.ahas_perm = backend.ahas_perm
+        self.perm = "testapp.view_book" if async_safe else "testapp.delete_book"
+        self.user = data["author"]
+        self.book = data["book"]
+
+    def teardown(self, checks, async_safe):
+        import rules.permissions
+
+        rules.permissions.remove_perm("testapp.view_book")
+
+    def run(self, check, checks):
+        import asyncio
+
+        async def main():
+            for _ in range(checks):
+                await check(self.user, self.perm, self.book)
+
+        asyncio.run(main())
+
+    def time_sync_to_async(self, checks, async_safe):
+        self.run(self.has_perm, checks)
+
+    def time_ahas_perm(self, checks, async_safe):
+        self.run(self.ahas_perm, checks)
+
+
+class PermissionQueries:
+    """
+    Database queries per request to a view that requires a permission of the
+    model, rather than of an object, that the rules deny, whether
+    ``ModelBackend`` is asked about it as well or the rules are
+    authoritative.
+    """
+
+    params = [False, True]
+    param_names = ["authoritative"]
+
+    def setup(self, authoritative):
+        data = setup_django()
+
+        from django.test import Client
+
+        import rules.permissions
+        from rules.predicates import is_superuser
+
+        # the permission that ``BookCreateView`` requires, which the test app
+        # only registers as a rule
+        rules.permissions.set_perm("testapp.create_book", is_superuser)
+        self.authoritative = rules.permissions.authoritative
+        rules.permissions.authoritative = authoritative
+        self.client = Client()
+        self.client.force_login(data["author"])
+
+    def teardown(self, authoritative):
+        import rules.permissions
+
+        rules.permissions.authoritative = self.authoritative
+        rules.permissions.remove_perm("testapp.create_book")
+
+    def time_request(self, authoritative):
+        self.client.get("/cbv/create/")
+
+    def track_queries(self, authoritative):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/cbv/create/")
+        return len(queries)
+
+    track_queries.unit = "queries"
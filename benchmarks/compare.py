@@ -0,0 +1,66 @@
+"""
+Compares the results of two runs of the benchmarks, saved with
+``benchmarks/run.py --save``, and exits with status 1 if any benchmark got
+slower by more than the given factor::
+
+    python benchmarks/compare.py [--factor 1.2] baseline.json results.json
+
+As with asv, larger values of ``track_*`` benchmarks are taken to be worse.
+Benchmarks that are missing from either file are listed but not checked.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        return {key: r["value"] for key, r in json.load(f)["results"].items()}
+
+
+def compare(baseline, results, factor):
+    """
+    Prints how each benchmark changed and returns the names of those that
+    regressed by more than ``factor``.
+    """
+    regressions = []
+    for key in sorted(set(baseline) | set(results)):
+        if key not in results or key not in baseline:
+            status = "missing" if key not in results else "new"
+            print("%-10s %-60s" % (status, key))
+            continue
+        before, after = baseline[key], results[key]
+        if before:
+            ratio = after / before
+        else:
+            ratio = float("inf") if after else 1.0
+        if ratio > factor:
+            status = "slower"
+            regressions.append(key)
+        elif ratio < 1 / factor:
+            status = "faster"
+        else:
+            status = ""
+        print("%-10s %-60s %6.2fx" % (status, key, ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares benchmark results.")
+    parser.add_argument("baseline")
+    parser.add_argument("results")
+    parser.add_argument(
+        "--factor",
+        type=float,
+        default=1.2,
+        help="how much slower a benchmark may get (default: 1.2)",
+    )
+    args = parser.parse_args()
+
+    regressions = compare(load(args.baseline), load(args.results), args.factor)
+    if regressions:
+        print(
+            "\n%d benchmark(s) got slower than %.2fx." % (len(regressions), args.factor)
+        )
+        sys.exit(1)
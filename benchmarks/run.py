@@ -0,0 +1,119 @@
+"""
+Runs the benchmarks in this directory without requiring asv, and prints the
+time per call of each of them::
+
+    python benchmarks/run.py [--save results.json] [module ...]
+
+With ``--save``, results are also written to a JSON file, eg. to keep as a
+baseline to check later results against with ``benchmarks/compare.py``.
+
+Benchmarks follow the conventions of asv: classes with an optional
+``setup()`` method, ``time_*`` methods and optional ``params``. The values
+returned by ``track_*`` methods are printed as they are, in their ``unit``.
+"""
+
+import argparse
+import importlib
+import itertools
+import json
+import os
+import platform
+import sys
+import timeit
+from functools import partial
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def discover(names):
+    if not names:
+        names = sorted(
+            name[:-3]
+            for name in os.listdir(HERE)
+            if name.startswith("bench_") and name.endswith(".py")
+        )
+    for name in names:
+        module = importlib.import_module("benchmarks.%s" % name)
+        for attr in sorted(dir(module)):
+            cls = getattr(module, attr)
+            if (
+                isinstance(cls, type)
+                and cls.__module__ == module.__name__
+                and benchmarks(cls)
+            ):
+                yield name, cls
+
+
+def benchmarks(cls):
+    return sorted(m for m in dir(cls) if m.startswith(("time_", "track_")))
+
+
+def parameters(cls):
+    params = getattr(cls, "params", None)
+    if params is None:
+        return [()]
+    if not isinstance(params[0], (list, tuple)):
+        params = [params]
+    return list(itertools.product(*params))
+
+
+def measure(fn, min_time=0.2):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def run(names):
+    """
+    Runs the benchmarks of the given modules, or of all of them, and returns
+    their results keyed on name, as ``(value, unit)`` pairs.
+    """
+    results = {}
+    for module, cls in discover(names):
+        methods = benchmarks(cls)
+        for args in parameters(cls):
+            instance = cls()
+            if hasattr(instance, "setup"):
+                instance.setup(*args)
+            for method in methods:
+                fn = getattr(instance, method)
+                key = "%s.%s.%s" % (module, cls.__name__, method)
+                if args:
+                    key += "(%s)" % ", ".join(repr(a) for a in args)
+                if method.startswith("track_"):
+                    value, unit = fn(*args), getattr(fn, "unit", "")
+                    print("%-60s %10.3f %s" % (key, value, unit))
+                else:
+                    value, unit = measure(partial(fn, *args)), "seconds"
+                    print("%-60s %10.3f us" % (key, value * 1e6))
+                results[key] = (value, unit)
+            if hasattr(instance, "teardown"):
+                instance.teardown(*args)
+    return results
+
+
+def save(results, path):
+    data = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {
+            key: {"value": value, "unit": unit}
+            for key, (value, unit) in results.items()
+        },
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs the benchmarks.")
+    parser.add_argument("--save", metavar="FILE", help="write results to FILE")
+    parser.add_argument("modules", nargs="*", help="eg. bench_predicates")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(HERE))
+    results = run(args.modules)
+    if args.save:
+        save(results, args.save)
@@ -1,10 +1,24 @@
-from .permissions import add_perm, has_perm, perm_exists, remove_perm, set_perm  # noqa
+from .permissions import (  # noqa
+    add_perm,
+    ahas_perm,
+    ahas_perms,
+    atest_perms,
+    capabilities,
+    has_perm,
+    has_perms,
+    perm_exists,
+    remove_perm,
+    set_perm,
+    test_perms,
+)
 from .predicates import (  # noqa
+    DeadlineExceeded,
     Predicate,
     always_allow,
     always_deny,
     always_false,
     always_true,
+    deadline,
     is_active,
     is_authenticated,
     is_group_member,
@@ -15,10 +29,13 @@ from .predicates import (  # noqa
 from .rulesets import (  # noqa
     RuleSet,
     add_rule,
+    atest_rule,
     remove_rule,
     rule_exists,
     set_rule,
     test_rule,
+    test_rule_many,
+    test_rules,
 )
 
 VERSION = (3, 5, 0, "final", 1)
@@ -5,11 +5,43 @@ class RulesConfig(AppConfig):
     name = "rules"
     default = True
 
+    def ready(self):
+        from django.conf import settings
+        from django.core.exceptions import ImproperlyConfigured
+
+        from . import permissions, predicates
+        from .cache import result_cache
+        from .groups import connect_signals, group_names_cache
+
+        group_names_cache.configure(
+            getattr(settings, "RULES_GROUP_NAMES_CACHE", None),
+            getattr(settings, "RULES_GROUP_NAMES_CACHE_TIMEOUT", 300),
+        )
+        result_cache.configure(
+            getattr(settings, "RULES_RESULT_CACHE", None),
+            getattr(settings, "RULES_RESULT_CACHE_SIZE", 10000),
+        )
+        connect_signals()
+        policy = getattr(settings, "RULES_TIMEOUT_POLICY", "deny")
+        if policy not in ("deny", "allow", "raise"):
+            raise ImproperlyConfigured(
+                "RULES_TIMEOUT_POLICY must be 'deny', 'allow' or 'raise'."
+            )
+        predicates.timeout_policy = policy
+        permissions.authoritative = bool(
+            getattr(settings, "RULES_AUTHORITATIVE", False)
+        )
+        permissions.any_module_perm = bool(
+            getattr(settings, "RULES_ANY_MODULE_PERM", False)
+        )
+
 
 class AutodiscoverRulesConfig(RulesConfig):
     default = False
 
     def ready(self):
+        super().ready()
+
         from django.utils.module_loading import autodiscover_modules
 
         autodiscover_modules("rules")
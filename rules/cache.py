@@ -0,0 +1,308 @@
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from inspect import isfunction
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from weakref import WeakValueDictionary
+
+# Stands for a result that isn't cached, since ``None`` is a valid result.
+MISSING: Any = object()
+
+
+def default_key(value: Any) -> Any:
+    """
+    Returns the part of the cache key of a result for one argument of a
+    predicate: the model label and primary key of model instances, the value
+    itself of strings, numbers and ``None``, and ``"anonymous"`` for
+    anonymous users. Raises ``TypeError`` for anything else, eg. unsaved
+    model instances, in which case the result is not cached.
+    """
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    meta = getattr(value, "_meta", None)
+    if meta is not None and getattr(value, "pk", None) is not None:
+        return "%s:%s" % (meta.label_lower, value.pk)
+    if getattr(value, "is_anonymous", False) is True:
+        return "anonymous"
+    raise TypeError("%s can't be part of a cache key" % type(value).__name__)
+
+
+def digest(value: Any) -> str:
+    return sha256(repr(value).encode()).hexdigest()
+
+
+def identify(pred: Any) -> str:
+    """
+    Returns what the results of a predicate are kept under in a Django
+    cache: the module and qualified name of its function, and its name.
+    """
+    fn = getattr(pred.fn, "func", pred.fn)  # of partials
+    qualname = getattr(fn, "__qualname__", None) or type(fn).__qualname__
+    return "%s.%s:%s" % (getattr(fn, "__module__", None), qualname, pred.name)
+
+
+class Lookup(object):
+    """
+    The keys of the result of a predicate for the given arguments.
+    """
+
+    __slots__ = ("predicate", "key", "user", "generation", "backend_key")
+
+    def __init__(self, predicate: Any, key: Any, user: Any, generation: int) -> None:
+        self.predicate = predicate
+        self.key = key
+        self.user = user
+        # the generation of the cache before the result was looked up
+        self.generation = generation
+        self.backend_key: Optional[str] = None
+
+
+class ResultCache(object):
+    """
+    The results of predicates created with ``cache=...``, kept for as many
+    seconds as given and shared by all threads of the process. Once there
+    are ``maxsize`` results, the least recently used ones are evicted.
+
+    Results are keyed on the predicate and its arguments, as returned by
+    the ``key`` function of the predicate, or ``default_key()`` of each of
+    them, and on the first argument, the user, so that they can be
+    invalidated per predicate and per user. In a Django cache, predicates
+    are identified by ``identify()``, which ``register()`` checks is unique.
+
+    Results can also be kept in a Django cache, eg. to share them between
+    processes, set with the ``RULES_RESULT_CACHE`` setting.
+    """
+
+    # Prefix of the keys of results kept in a Django cache, and of the
+    # generations of the predicates and users they are for, which are
+    # bumped to invalidate all of their results at once.
+    PREFIX = "rules:result"
+
+    def __init__(self, maxsize: int = 10000) -> None:
+        self.alias: Optional[str] = None
+        self.maxsize = maxsize
+        # (result, expires, user), keyed on (predicate, key), least recently
+        # used first
+        self.entries: "OrderedDict[Tuple[Any, Any], Tuple[Any, float, Any]]" = (
+            OrderedDict()
+        )
+        self.lock = threading.Lock()
+        # the cached predicates, keyed on their identity
+        self.predicates: "WeakValueDictionary[str, Any]" = WeakValueDictionary()
+        # Incremented on every invalidation, so that results computed
+        # before an invalidation are not stored after it.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def configure(self, alias: Optional[str] = None, maxsize: int = 10000) -> None:
+        with self.lock:
+            self.alias = alias
+            self.maxsize = maxsize
+            self.generation += 1
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def backend(self) -> Any:
+        from django.core.cache import caches
+
+        return caches[self.alias]
+
+    def register(self, pred: Any, named: bool = True) -> str:
+        """
+        Returns the identity of a predicate whose results are cached, see
+        ``identify()``. Raises ``ValueError`` if another one with a different
+        function has the same identity, eg. two lambdas that are not given
+        distinct names, since their results would be mixed up. For the same
+        reason, predicates whose function has state of its own, ie. closures,
+        partials, methods and callable objects, eg. those created by a
+        factory, must be ``named``.
+        """
+        identity = identify(pred)
+        fn = pred.fn
+        if not named and not (isfunction(fn) and fn.__closure__ is None):
+            raise ValueError(
+                "The results of the cached predicate %s may depend on the state "
+                "of its function, give it a name that identifies it." % identity
+            )
+        with self.lock:
+            other = self.predicates.get(identity)
+            if other is not None and other.fn != fn:
+                raise ValueError(
+                    "Another cached predicate is identified as %s, give them "
+                    "distinct names." % identity
+                )
+            self.predicates[identity] = pred
+        return identity
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of results in the cache of the process, and how
+        often results were found, not found, evicted and expired.
+        """
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def lookup(self, pred: Any, callargs: Tuple[Any, ...]) -> Lookup:
+        # Raises TypeError if the arguments can't be part of a key.
+        if pred.cache_key is not None:
+            key = pred.cache_key(*callargs)
+            hash(key)
+        else:
+            key = tuple(map(default_key, callargs))
+        try:
+            user = default_key(callargs[0]) if callargs else None
+        except TypeError:
+            user = None
+        return Lookup(pred, key, user, self.generation)
+
+    def generation_keys(self, identity: Optional[str], user: Any) -> Tuple[str, ...]:
+        # Keys of the generations of all results, of the results of the
+        # predicate with the given identity, of the given user, and of both.
+        return (
+            self.PREFIX,
+            "%s:predicate:%s" % (self.PREFIX, digest(identity)),
+            "%s:user:%s" % (self.PREFIX, digest(user)),
+            "%s:both:%s" % (self.PREFIX, digest((identity, user))),
+        )
+
+    def get(self, lookup: Lookup) -> Any:
+        entry_key = (lookup.predicate, lookup.key)
+        with self.lock:
+            entry = self.entries.get(entry_key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self.entries.move_to_end(entry_key)
+                    self.hits += 1
+                    return entry[0]
+                del self.entries[entry_key]
+                self.expirations += 1
+            if self.alias is None:
+                self.misses += 1
+                return MISSING
+
+        cache = self.backend()
+        keys = self.generation_keys(lookup.predicate.cache_id, lookup.user)
+        generations = cache.get_many(keys)
+        lookup.backend_key = "%s:%s:%s" % (
+            self.PREFIX,
+            ":".join(str(generations.get(key, 0)) for key in keys),
+            digest((lookup.predicate.cache_id, lookup.key)),
+        )
+        value = cache.get(lookup.backend_key)
+        if value is None:
+            with self.lock:
+                self.misses += 1
+            return MISSING
+        result, expires = value
+        with self.lock:
+            self.hits += 1
+            if lookup.generation == self.generation:
+                ttl = expires - time.time()
+                self.store(entry_key, (result, time.monotonic() + ttl, lookup.user))
+        return result
+
+    def set(self, lookup: Lookup, result: Optional[bool]) -> None:
+        ttl = lookup.predicate.cache_ttl
+        with self.lock:
+            if lookup.generation != self.generation:
+                return  # invalidated in the meantime
+            self.store(
+                (lookup.predicate, lookup.key),
+                (result, time.monotonic() + ttl, lookup.user),
+            )
+        if lookup.backend_key is not None:
+            # keyed on the generations from before it was computed
+            self.backend().set(lookup.backend_key, (result, time.time() + ttl), ttl)
+
+    def store(self, entry_key: Tuple[Any, Any], entry: Tuple[Any, float, Any]) -> None:
+        # Must be called with the lock held.
+        self.entries[entry_key] = entry
+        self.entries.move_to_end(entry_key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def call(
+        self,
+        pred: Any,
+        callargs: Tuple[Any, ...],
+        fn: Callable[[Tuple[Any, ...]], Optional[bool]],
+    ) -> Optional[bool]:
+        """
+        Returns the cached result of the predicate for the given arguments,
+        or the result of ``fn(callargs)``, which is cached.
+        """
+        try:
+            lookup = self.lookup(pred, callargs)
+        except TypeError:
+            return fn(callargs)
+        result = self.get(lookup)
+        if result is MISSING:
+            result = fn(callargs)
+            self.set(lookup, result)
+        return result
+
+    async def acall(
+        self,
+        pred: Any,
+        callargs: Tuple[Any, ...],
+        fn: Callable[[Tuple[Any, ...]], Awaitable[Optional[bool]]],
+    ) -> Optional[bool]:
+        # Like ``call()``, awaiting ``fn``.
+        try:
+            lookup = self.lookup(pred, callargs)
+        except TypeError:
+            return await fn(callargs)
+        result = self.get(lookup)
+        if result is MISSING:
+            result = await fn(callargs)
+            self.set(lookup, result)
+        return result
+
+    def invalidate(self, predicate: Any = None, user: Any = None) -> None:
+        """
+        Forgets the cached results of the given predicate, of the given user,
+        of the given predicate for the given user, or all of them.
+        """
+        user_key = None if user is None else default_key(user)
+        with self.lock:
+            self.generation += 1
+            if predicate is None and user is None:
+                self.entries.clear()
+            else:
+                stale = [
+                    entry_key
+                    for entry_key, entry in self.entries.items()
+                    if (predicate is None or entry_key[0] is predicate)
+                    and (user is None or entry[2] == user_key)
+                ]
+                for entry_key in stale:
+                    del self.entries[entry_key]
+        if self.alias is None:
+            return
+        everything, of_predicate, of_user, of_both = self.generation_keys(
+            None if predicate is None else predicate.cache_id, user_key
+        )
+        if predicate is None:
+            key = everything if user is None else of_user
+        else:
+            key = of_predicate if user is None else of_both
+        cache = self.backend()
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, None)  # no results were invalidated yet
+
+
+result_cache = ResultCache()
@@ -0,0 +1,176 @@
+from itertools import count
+from typing import Any, Dict, List
+
+from . import predicates
+from .predicates import And, Leaf, Node, Not, Or, Predicate, Xor, in_thread
+
+# The value that decides a n-ary AND/OR node when any operand produces it.
+SHORT_CIRCUIT = {
+    And: False,
+    Or: True,
+}
+
+# Operations nested deeper than this are evaluated by their nodes instead, as
+# Python limits how deeply the blocks of a function may be indented.
+MAX_DEPTH = 64
+
+
+class Compiler(object):
+    """
+    Generates the source of a single function that evaluates the expression
+    tree of a predicate with the same semantics as ``Predicate._apply``.
+
+    Every node of the tree stores its result in a local variable that is
+    either ``None`` (skipped), ``True`` or ``False``. Chains of the same
+    operator are flattened, since ``None`` is the identity element of
+    every operator and short-circuiting is left-to-right either way.
+
+    Predicates that must be awaited are awaited in turn, in which case the
+    generated function is a coroutine function, and the others are called
+    in a thread unless they are ``async_safe``.
+
+    While any deadline is set, the generated function evaluates the tree
+    node by node instead, so that every predicate is checked against it.
+    """
+
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+        self.namespace: Dict[str, Any] = {}
+        self.counter = count()
+        self.arity = 0
+        self.is_async = False
+
+    def var(self, prefix: str) -> str:
+        return "%s%d" % (prefix, next(self.counter))
+
+    def emit(self, depth: int, line: str) -> None:
+        self.lines.append("    " * depth + line)
+
+    def flatten(self, node: Node) -> List[Node]:
+        operands = []
+        for operand in node.operands:
+            if type(operand) is type(node):
+                operands.extend(self.flatten(operand))
+            else:
+                operands.append(operand)
+        return operands
+
+    def visit(self, node: Node, target: str, depth: int) -> None:
+        if isinstance(node, Leaf):
+            self.visit_leaf(node.predicate, target, depth)
+        elif isinstance(node, Not):
+            self.visit(node.operand, target, depth)
+            self.emit(depth, "if %s is not None:" % target)
+            self.emit(depth + 1, "%s = not %s" % (target, target))
+        elif isinstance(node, Xor):
+            first, *rest = self.flatten(node)
+            self.visit(first, target, depth)
+            for operand in rest:
+                result = self.var("r")
+                self.visit(operand, result, depth)
+                self.emit(depth, "if %s is not None:" % result)
+                self.emit(
+                    depth + 1,
+                    "%s = %s if %s is None else %s is not %s"
+                    % (target, result, target, target, result),
+                )
+        elif type(node) not in SHORT_CIRCUIT or depth > MAX_DEPTH:
+            # eg. parallel operations evaluate themselves
+            fn = self.var("n")
+            self.namespace[fn] = node
+            if node.is_async:
+                self.emit(depth, "%s = await %s.aevaluate(*args)" % (target, fn))
+            elif self.is_async and not node.async_safe:
+                self.emit(
+                    depth, "%s = await in_thread(%s.evaluate)(*args)" % (target, fn)
+                )
+            else:
+                self.emit(depth, "%s = %s.evaluate(*args)" % (target, fn))
+        else:
+            decided = SHORT_CIRCUIT[type(node)]
+            first, *rest = self.flatten(node)
+            self.visit(first, target, depth)
+            for operand in rest:
+                result = self.var("r")
+                self.emit(depth, "if %s is not %s:" % (target, decided))
+                self.visit(operand, result, depth + 1)
+                self.emit(depth + 1, "if %s is not None:" % result)
+                self.emit(depth + 2, "%s = %s" % (target, result))
+
+    def visit_leaf(self, pred: Predicate, target: str, depth: int) -> None:
+        if pred.constant is not None:
+            self.emit(depth, "%s = %s" % (target, pred.constant))
+            return
+
+        if pred.is_async:
+            fn = self.var("p")
+            self.namespace[fn] = pred
+            self.emit(depth, "%s = await %s._aapply(*args)" % (target, fn))
+            return
+
+        if self.is_async and not pred.async_safe:
+            fn = self.var("p")
+            self.namespace[fn] = pred
+            self.emit(depth, "%s = await in_thread(%s._apply)(*args)" % (target, fn))
+            return
+
+        if (
+            pred.memoize
+            or pred.timeout is not None
+            or pred.cache_ttl is not None
+            or type(pred)._apply is not Predicate._apply
+        ):
+            # Memoized predicates need the invocation context, predicates
+            # with a timeout must be timed, cached results looked up, and a
+            # custom subclass may evaluate itself in any way it likes
+            fn = self.var("p")
+            self.namespace[fn] = pred
+            self.emit(depth, "%s = %s._apply(*args)" % (target, fn))
+            return
+
+        fn = self.var("f")
+        self.namespace[fn] = pred.fn
+        if pred.var_args:
+            callargs = ["*args"]
+        else:
+            callargs = ["a0", "a1"][: pred.num_args]
+            self.arity = max(self.arity, pred.num_args)
+        if pred.bind:
+            self.namespace["p" + fn] = pred
+            callargs.insert(0, "p" + fn)
+        self.emit(depth, "%s = %s(%s)" % (target, fn, ", ".join(callargs)))
+        self.emit(depth, "if %s is not None:" % target)
+        self.emit(depth + 1, "%s = True if %s else False" % (target, target))
+
+    def compile(self, pred: Predicate) -> Predicate:
+        self.is_async = pred.node.is_async
+        self.namespace["in_thread"] = in_thread
+        self.visit(pred.node, "r", 1)
+        lines = ["%sdef compiled(*args):" % ("async " if self.is_async else "")]
+        self.namespace["predicates"] = predicates
+        self.namespace["tree"] = pred.node
+        lines.append("    if predicates._deadlines:")
+        if self.is_async:
+            lines.append("        return await tree.aevaluate(*args)")
+        else:
+            lines.append("        return tree.evaluate(*args)")
+        if self.arity:
+            lines.append("    n = len(args)")
+        for i in range(self.arity):
+            lines.append("    a%d = args[%d] if n > %d else None" % (i, i, i))
+        lines.extend(self.lines)
+        lines.append("    return r")
+        source = "\n".join(lines)
+
+        namespace = dict(self.namespace)
+        exec(compile(source, "<rules: %s>" % pred.name, "exec"), namespace)
+        fn = namespace["compiled"]
+        fn.__source__ = source
+
+        compiled = Predicate(fn, pred.name, async_safe=pred.node.async_safe)
+        compiled._node = pred.node
+        return compiled
+
+
+def compile_predicate(pred: Predicate) -> Predicate:
+    return Compiler().compile(pred)
@@ -0,0 +1,35 @@
+from django.utils.decorators import sync_and_async_middleware
+
+try:
+    from asgiref.sync import iscoroutinefunction
+except ImportError:  # pragma: no cover
+    # asgiref < 3.6, eg. with Django 3.2
+    from asyncio import iscoroutinefunction  # type: ignore[assignment]
+
+from ..permissions import permission_cache
+
+
+@sync_and_async_middleware
+def PermissionCacheMiddleware(get_response):
+    """
+    Caches the decisions of ``rules.permissions.ObjectPermissionBackend`` for
+    the duration of each request, so that checking the same permission for
+    the same user and object many times, eg. when rendering a list in the
+    Admin, evaluates the rule once.
+
+    Views that change data that rules depend on should call
+    ``rules.permissions.clear_permission_cache()`` before checking
+    permissions again.
+    """
+
+    def middleware(request):
+        with permission_cache():
+            return get_response(request)
+
+    async def async_middleware(request):
+        with permission_cache():
+            return await get_response(request)
+
+    if iscoroutinefunction(get_response):
+        return async_middleware
+    return middleware
@@ -1,8 +1,16 @@
-from django.core.exceptions import ImproperlyConfigured
+from collections.abc import Iterable
+
+from django.contrib import auth
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
 from django.db.models import Model
 from django.db.models.base import ModelBase
 
-from ..permissions import add_perm
+from ..permissions import (
+    ObjectPermissionBackend,
+    add_perm,
+    is_authoritative,
+    permissions,
+)
 
 
 class RulesModelBaseMixin:
@@ -88,3 +96,60 @@ class RulesModel(RulesModelMixin, Model, metaclass=RulesModelBase):
 
     class Meta:
         abstract = True
+
+
+class RulesPermissionsMixin:
+    """
+    A mixin for a custom user model, to be mixed in before Django's
+    PermissionsMixin, that checks many permissions at once.
+
+    Permissions that are rules are tested in a single invocation by
+    ObjectPermissionBackend, stopping at the first that is denied, and other
+    backends are only asked about the permissions that the rules didn't
+    grant, unless the rules are authoritative, or that are not rules.
+    """
+
+    def has_perms(self, perm_list, obj=None):
+        if not isinstance(perm_list, Iterable) or isinstance(perm_list, str):
+            raise ValueError("perm_list must be an iterable of permissions.")
+        if self.is_active and self.is_superuser:
+            return True
+        perm_list = list(perm_list)
+        backends = auth.get_backends()
+        rules_backend = next(
+            (b for b in backends if isinstance(b, ObjectPermissionBackend)), None
+        )
+        if rules_backend is None:
+            return super().has_perms(perm_list, obj)
+
+        rules = permissions.snapshot
+        decisions = rules_backend.test_perms(
+            self, [perm for perm in perm_list if perm in rules], obj
+        )
+        for perm in perm_list:
+            if decisions.get(perm):
+                continue
+            # denied by the rules, or not tested by them at all
+            if perm in decisions and is_authoritative(perm):
+                return False
+            others = (
+                backends
+                if perm not in decisions
+                else [backend for backend in backends if backend is not rules_backend]
+            )
+            if not _has_perm(others, self, perm, obj):
+                return False
+        return True
+
+
+def _has_perm(backends, user, perm, obj):
+    # Like Django's _user_has_perm(), with the given backends.
+    for backend in backends:
+        if not hasattr(backend, "has_perm"):
+            continue
+        try:
+            if backend.has_perm(user, perm, obj):
+                return True
+        except PermissionDenied:
+            return False
+    return False
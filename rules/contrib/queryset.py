@@ -0,0 +1,171 @@
+from typing import Any, List, Optional, Tuple, Union
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q, QuerySet
+
+from ..permissions import permissions
+from ..predicates import And, Leaf, Node, Not, Or, Predicate, _context
+
+# A condition on the rows of a queryset: a ``Q`` object, or ``True`` (all
+# rows) or ``False`` (no rows). Note that ``Q()`` can't stand for all rows,
+# since Django drops empty ``Q`` objects from ``|`` as well as ``&``.
+Condition = Union[bool, Q]
+
+
+def conjunction(a: Condition, b: Condition) -> Condition:
+    if a is False or b is False:
+        return False
+    if a is True:
+        return b
+    if b is True:
+        return a
+    return a & b  # type: ignore[operator]
+
+
+def disjunction(a: Condition, b: Condition) -> Condition:
+    if a is True or b is True:
+        return True
+    if a is False:
+        return b
+    if b is False:
+        return a
+    return a | b  # type: ignore[operator]
+
+
+def negation(a: Condition) -> Condition:
+    if isinstance(a, bool):
+        return not a
+    return ~a
+
+
+class QueryBuilder(object):
+    """
+    Translates the expression tree of a predicate into a condition on the
+    rows of a queryset, for a given user.
+
+    Every node is translated into a pair of conditions for the rows it
+    evaluates to ``True`` and ``False`` respectively, and is skipped for the
+    rows that match neither. The second condition is ``None`` when it is
+    just the negation of the first, ie. the node is never skipped, which is
+    the case for most predicates and keeps the generated query simple.
+
+    Predicates are translated using the ``q`` function they were declared
+    with, if any. Predicates that only depend on the user are evaluated
+    once. Any other predicate is evaluated for every row of the queryset if
+    ``fallback`` is true, otherwise ``ImproperlyConfigured`` is raised.
+    """
+
+    def __init__(self, user: Any, queryset: QuerySet, fallback: bool = False):
+        self.user = user
+        self.queryset = queryset
+        self.fallback = fallback
+        self._objects: Optional[List[Any]] = None
+
+    @property
+    def objects(self) -> List[Any]:
+        if self._objects is None:
+            self._objects = list(self.queryset)
+        return self._objects
+
+    def visit(self, node: Node) -> Tuple[Condition, Optional[Condition]]:
+        if isinstance(node, Leaf):
+            return self.visit_leaf(node)
+
+        if isinstance(node, Not):
+            true, false = self.visit(node.operand)
+            if false is None:
+                return negation(true), None
+            return false, true
+
+        operands = [self.visit(operand) for operand in node.operands]
+        true, false = operands[0]
+        for t, f in operands[1:]:
+            if false is None and f is None and isinstance(node, (And, Or)):
+                combine = conjunction if isinstance(node, And) else disjunction
+                true = combine(true, t)
+                continue
+            if false is None:
+                false = negation(true)
+            if f is None:
+                f = negation(t)
+            if isinstance(node, And):
+                false = disjunction(false, f)
+                true = conjunction(disjunction(true, t), negation(false))
+            elif isinstance(node, Or):
+                true = disjunction(true, t)
+                false = conjunction(disjunction(false, f), negation(true))
+            else:  # Xor
+                true, false = (
+                    disjunction(
+                        conjunction(true, negation(t)),
+                        conjunction(t, negation(true)),
+                    ),
+                    disjunction(
+                        conjunction(true, t),
+                        disjunction(
+                            conjunction(false, negation(t)),
+                            conjunction(f, negation(true)),
+                        ),
+                    ),
+                )
+        return true, false
+
+    def visit_leaf(self, node: Leaf) -> Tuple[Condition, Optional[Condition]]:
+        pred = node.predicate
+        if pred.constant is not None:
+            return pred.constant, None
+
+        if pred.q_fn is not None:
+            result = pred.q_fn(self.user)
+        elif pred._node is not None and type(pred)._apply is Predicate._apply:
+            return self.visit(pred._node)  # eg. memoized combined predicates
+        elif node.independent:
+            result = pred._apply(self.user)
+        elif self.fallback:
+            results = pred._apply_many(self.user, self.objects)
+            true = [obj.pk for obj, r in zip(self.objects, results) if r is True]
+            false = [obj.pk for obj, r in zip(self.objects, results) if r is False]
+            return Q(pk__in=true), Q(pk__in=false)
+        else:
+            raise ImproperlyConfigured(
+                "The predicate %s can't be translated into a query. Declare it "
+                "with @predicate(q=...) or pass fallback=True to evaluate it "
+                "for every object instead." % pred
+            )
+
+        if result is None:
+            return False, False  # skipped
+        return result, None
+
+    def filter(self, pred: Predicate) -> QuerySet:
+        true, _ = self.visit(pred.node)
+        if true is True:
+            return self.queryset.all()
+        if true is False:
+            return self.queryset.none()
+        return self.queryset.filter(true)
+
+
+def filter_queryset(
+    pred: Predicate, user: Any, queryset: QuerySet, fallback: bool = False
+) -> QuerySet:
+    """
+    Returns the objects of the queryset for which ``pred.test(user, obj)``
+    is true, filtered in the database.
+    """
+    stack = _context.stack
+    stack.append((user,))
+    try:
+        return QueryBuilder(user, queryset, fallback).filter(pred)
+    finally:
+        stack.pop()
+
+
+def permitted(
+    queryset: QuerySet, user: Any, perm: str, fallback: bool = False
+) -> QuerySet:
+    """
+    Returns the objects of the queryset the user has the given permission
+    for, according to the permissions rule set.
+    """
+    return permissions.filter_queryset(perm, user, queryset, fallback=fallback)
@@ -4,6 +4,7 @@ from django.conf import settings
 from django.contrib.auth import REDIRECT_FIELD_NAME, mixins
 from django.contrib.auth.views import redirect_to_login
 from django.core.exceptions import FieldError, ImproperlyConfigured, PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils.encoding import force_str
 from django.views.generic import CreateView, DeleteView, DetailView, UpdateView
@@ -12,6 +13,8 @@ from django.views.generic import CreateView, DeleteView, DetailView, UpdateView
 # versions before 1.9. For usage help see Django's docs for 1.9 or later.
 from django.views.generic.edit import BaseCreateView
 
+from ..stats import collector
+
 LoginRequiredMixin = mixins.LoginRequiredMixin
 UserPassesTestMixin = mixins.UserPassesTestMixin
 
@@ -235,6 +238,16 @@ def permission_required(
     return decorator
 
 
+def predicate_stats(request):
+    """
+    View that returns the statistics recorded by ``rules.stats.collector`` in
+    the Prometheus text format. Make sure it's only reachable by the scraper.
+    """
+    return HttpResponse(
+        collector.prometheus(), content_type="text/plain; version=0.0.4"
+    )
+
+
 def _redirect_to_login(request, view_name, login_url, redirect_field_name):
     redirect_url = login_url or settings.LOGIN_URL
     if not redirect_url:  # pragma: no cover
@@ -0,0 +1,211 @@
+import threading
+import time
+from functools import partial
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+
+class GroupNamesCache(object):
+    """
+    The names of the groups each user is a member of, keyed by the primary
+    key of the user and shared by all threads of the process, so that
+    ``is_group_member`` doesn't query the database on every request.
+
+    The cache is disabled unless the ``RULES_GROUP_NAMES_CACHE`` setting is
+    ``True``, or the alias of a Django cache to keep the names in instead,
+    eg. to share them between processes. It is invalidated by the signal
+    handlers that ``RulesConfig.ready()`` connects, whenever the groups of a
+    user, or groups themselves, change. Since those only reach the cache of
+    the process the change is made in, entries also expire after
+    ``RULES_GROUP_NAMES_CACHE_TIMEOUT`` seconds, 300 by default, or never if
+    it's ``None``.
+    """
+
+    # Key of the generation of the entries kept in a Django cache, which is
+    # bumped to invalidate all of them at once.
+    GENERATION_KEY = "rules:group_names"
+
+    def __init__(self, maxsize: int = 10000) -> None:
+        self.enabled = False
+        self.alias: Optional[str] = None
+        self.timeout: Optional[float] = 300
+        self.maxsize = maxsize
+        # the names and the time they expire at, as per ``time.monotonic()``
+        self.names: Dict[Any, Tuple[FrozenSet[str], float]] = {}
+        self.lock = threading.Lock()
+        # Incremented on every invalidation, so that names queried before an
+        # invalidation are not stored after it.
+        self.generation = 0
+
+    def configure(self, setting: Any, timeout: Optional[float] = 300) -> None:
+        with self.lock:
+            self.enabled = bool(setting)
+            self.alias = setting if isinstance(setting, str) else None
+            self.timeout = timeout
+            self.generation += 1
+            self.names.clear()
+
+    def backend(self) -> Any:
+        from django.core.cache import caches
+
+        return caches[self.alias]
+
+    def key(self, pk: Any, generation: int) -> str:
+        return "%s:%s:%s" % (self.GENERATION_KEY, generation, pk)
+
+    def get(self, pk: Any) -> Optional[FrozenSet[str]]:
+        if self.alias is None:
+            entry = self.names.get(pk)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            return entry[0]
+        cache = self.backend()
+        generation = cache.get_or_set(self.GENERATION_KEY, 0, None)
+        return cache.get(self.key(pk, generation))
+
+    def set(self, pk: Any, names: FrozenSet[str], generation: int) -> None:
+        with self.lock:
+            if generation != self.generation:
+                return  # invalidated in the meantime
+            if self.alias is None:
+                self.names.pop(pk, None)  # keeps the oldest first
+                if len(self.names) >= self.maxsize:
+                    del self.names[next(iter(self.names))]
+                if self.timeout is None:
+                    self.names[pk] = (names, float("inf"))
+                else:
+                    self.names[pk] = (names, time.monotonic() + self.timeout)
+                return
+        cache = self.backend()
+        generation = cache.get_or_set(self.GENERATION_KEY, 0, None)
+        cache.set(self.key(pk, generation), names, self.timeout)
+
+    def invalidate(self, pk: Any = None) -> None:
+        """
+        Forgets the group names of the user with the given primary key, or of
+        all users.
+        """
+        with self.lock:
+            self.generation += 1
+            if pk is None:
+                self.names.clear()
+            else:
+                self.names.pop(pk, None)
+        if self.alias is None:
+            return
+        cache = self.backend()
+        if pk is None:
+            try:
+                cache.incr(self.GENERATION_KEY)
+            except ValueError:
+                pass  # no entries to invalidate
+        else:
+            generation = cache.get_or_set(self.GENERATION_KEY, 0, None)
+            cache.delete(self.key(pk, generation))
+
+
+group_names_cache = GroupNamesCache()
+
+
+def get_group_names(user: Any) -> FrozenSet[str]:
+    """
+    Returns the names of the groups the given user is a member of, which are
+    cached on the user instance, and in ``group_names_cache`` if enabled.
+    """
+    try:
+        return user._group_names_cache
+    except AttributeError:
+        pass
+    cache = group_names_cache
+    pk = getattr(user, "pk", None)
+    names = cache.get(pk) if cache.enabled and pk is not None else None
+    if names is None:
+        generation = cache.generation
+        names = frozenset(user.groups.values_list("name", flat=True))
+        if cache.enabled and pk is not None:
+            cache.set(pk, names, generation)
+    user._group_names_cache = names
+    return names
+
+
+def prefetch_group_names(users: Iterable[Any]) -> None:
+    """
+    Loads the names of the groups of all the given users with a single query,
+    so that ``is_group_member`` doesn't query them for each user. Users
+    whose group names are already loaded are skipped.
+    """
+    pending = [
+        user
+        for user in users
+        if not hasattr(user, "_group_names_cache")
+        and getattr(user, "pk", None) is not None
+        and hasattr(user, "groups")
+    ]
+    if not pending:
+        return
+    field = type(pending[0]).groups.field
+    source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+    names: Dict[Any, Set[str]] = {user.pk: set() for user in pending}
+    rows = field.remote_field.through.objects.filter(
+        **{"%s__in" % source: list(names)}
+    ).values_list(source, "%s__name" % target)
+    for pk, name in rows:
+        names[pk].add(name)
+
+    cache = group_names_cache
+    generation = cache.generation
+    for user in pending:
+        user._group_names_cache = frozenset(names[user.pk])
+        if cache.enabled:
+            cache.set(user.pk, user._group_names_cache, generation)
+
+
+# Signal handlers
+
+
+def _invalidate(pk: Any = None) -> None:
+    from django.db import transaction
+
+    group_names_cache.invalidate(pk)
+    # again once committed, in case names were read in the meantime
+    transaction.on_commit(partial(group_names_cache.invalidate, pk))
+
+
+def user_groups_changed(
+    sender: Any, instance: Any, action: str, reverse: bool, pk_set: Any, **kwargs
+) -> None:
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        instance.__dict__.pop("_group_names_cache", None)
+        _invalidate(instance.pk)
+    elif pk_set is None:
+        _invalidate()  # eg. group.user_set.clear()
+    else:
+        for pk in pk_set:
+            _invalidate(pk)
+
+
+def group_changed(sender: Any, created: bool = False, **kwargs) -> None:
+    if not created:
+        _invalidate()  # eg. renamed or deleted
+
+
+def connect_signals() -> None:
+    """
+    Connects the handlers that invalidate cached group names when the groups
+    of a user, or groups themselves, change.
+    """
+    from django.apps import apps
+
+    if not apps.is_installed("django.contrib.auth"):
+        return
+
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import Group
+    from django.db.models.signals import m2m_changed, post_delete, post_save
+
+    groups = getattr(get_user_model(), "groups", None)
+    if groups is not None:  # not a swapped user model without groups
+        m2m_changed.connect(user_groups_changed, sender=groups.through)
+    post_save.connect(group_changed, sender=Group)
+    post_delete.connect(group_changed, sender=Group)
@@ -0,0 +1,178 @@
+import math
+from typing import List, NamedTuple, Optional
+from weakref import WeakKeyDictionary
+
+from .predicates import And, Leaf, Node, Not, Or, Predicate, Xor, observers
+from .rulesets import RuleSet
+
+# Assumed cost of predicates that neither declare a cost nor have been
+# observed often enough.
+DEFAULT_COST = 1.0
+
+
+class LeafStats(object):
+    """
+    The number of times a predicate was evaluated, how often it returned
+    ``True`` or ``False``, and the total time spent evaluating it.
+    """
+
+    __slots__ = ("calls", "true", "false", "elapsed")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.true = 0
+        self.false = 0
+        self.elapsed = 0.0
+
+
+class Estimate(NamedTuple):
+    cost: float
+    true: float
+    false: float
+
+    @property
+    def skipped(self) -> float:
+        return max(0.0, 1.0 - self.true - self.false)
+
+
+class CostOptimizer(object):
+    """
+    Records how long predicates take to evaluate and how often they return
+    ``True`` or ``False``, and reorders the operands of ``&`` and ``|`` so
+    that the ones most likely to decide the result cheaply are evaluated
+    first.
+
+    Only operations whose predicates are all declared ``pure=True`` are ever
+    reordered, since reordering changes which predicates get evaluated.
+    Observed latencies are used for operations whose predicates have all
+    been evaluated at least ``min_samples`` times, otherwise the cost
+    declared with ``cost=...`` is used.
+    """
+
+    def __init__(self, min_samples: int = 100) -> None:
+        self.min_samples = min_samples
+        self.stats: "WeakKeyDictionary[Predicate, LeafStats]" = WeakKeyDictionary()
+
+    def start(self) -> None:
+        if self.observe not in observers:
+            observers.append(self.observe)
+
+    def stop(self) -> None:
+        if self.observe in observers:
+            observers.remove(self.observe)
+
+    def observe(self, pred: Predicate, result: Optional[bool], elapsed: float) -> None:
+        if pred._node is not None:
+            return  # only leaves are interesting
+        stats = self.stats.get(pred)
+        if stats is None:
+            stats = self.stats[pred] = LeafStats()
+        stats.calls += 1
+        stats.elapsed += elapsed
+        if result is True:
+            stats.true += 1
+        elif result is False:
+            stats.false += 1
+
+    def is_measured(self, node: Node) -> bool:
+        for leaf in node.leaves():
+            if leaf.value is not None:
+                continue
+            stats = self.stats.get(leaf.predicate)
+            if stats is None or stats.calls < self.min_samples:
+                return False
+        return True
+
+    def estimate(self, node: Node, measured: bool) -> Estimate:
+        """
+        Estimates the cost of evaluating the node and the probability of
+        each outcome, assuming that predicates are independent.
+        """
+        if isinstance(node, Leaf):
+            return self.estimate_leaf(node, measured)
+
+        estimates = [self.estimate(operand, measured) for operand in node.operands]
+        if isinstance(node, Not):
+            cost, true, false = estimates[0]
+            return Estimate(cost, false, true)
+
+        if isinstance(node, Xor):
+            skipped, true, false = 1.0, 0.0, 0.0
+            for e in estimates:
+                same = e.skipped + e.false  # outcomes that keep the result
+                skipped, true, false = (
+                    skipped * e.skipped,
+                    skipped * e.true + true * same + false * e.true,
+                    skipped * e.false + false * same + true * e.true,
+                )
+            return Estimate(sum(e.cost for e in estimates), true, false)
+
+        # And, Or: evaluation stops at the first decisive result
+        cost, reached, skipped = 0.0, 1.0, 1.0
+        for e in estimates:
+            cost += reached * e.cost
+            reached *= 1.0 - self.decisive(node, e)
+            skipped *= e.skipped
+        decided = 1.0 - reached
+        rest = max(0.0, reached - skipped)
+        if isinstance(node, And):
+            return Estimate(cost, rest, decided)
+        return Estimate(cost, decided, rest)
+
+    def estimate_leaf(self, node: Leaf, measured: bool) -> Estimate:
+        if node.value is not None:
+            return Estimate(0.0, float(node.value), float(not node.value))
+        pred = node.predicate
+        stats = self.stats.get(pred)
+        if measured and stats is not None:
+            cost = stats.elapsed / stats.calls
+        elif pred.cost is not None:
+            cost = pred.cost
+        else:
+            cost = DEFAULT_COST
+        if stats is not None and stats.calls:
+            return Estimate(cost, stats.true / stats.calls, stats.false / stats.calls)
+        return Estimate(cost, 0.5, 0.5)
+
+    @staticmethod
+    def decisive(node: Node, estimate: Estimate) -> float:
+        return estimate.false if isinstance(node, And) else estimate.true
+
+    def reorder(self, node: Node) -> Node:
+        if isinstance(node, Leaf):
+            return node
+        operands: List[Node] = [self.reorder(operand) for operand in node.operands]
+        if isinstance(node, (And, Or)) and all(
+            leaf.predicate.pure for leaf in node.leaves()
+        ):
+            measured = self.is_measured(node)
+
+            def rank(operand: Node) -> float:
+                estimate = self.estimate(operand, measured)
+                decisive = self.decisive(node, estimate)
+                return estimate.cost / decisive if decisive else math.inf
+
+            operands.sort(key=rank)
+        return type(node)(operands)
+
+    def optimize(self, pred: Predicate) -> Predicate:
+        """
+        Returns an equivalent predicate with reordered operands, or the
+        predicate itself if its operands are already in the best order.
+        """
+        if isinstance(pred.node, Leaf):
+            return pred
+        node = self.reorder(pred.node)
+        if node == pred.node:
+            return pred
+        return pred._combined(node, pred.name, pred._generated_name)
+
+    def optimize_ruleset(self, ruleset: RuleSet) -> None:
+        """
+        Replaces the rules of the rule set with their optimized equivalents.
+        Call this periodically to adapt to the recorded statistics.
+        """
+        for name, pred in list(ruleset.items()):
+            optimized = self.optimize(pred)
+            if optimized is not pred:
+                ruleset[name] = optimized
@@ -0,0 +1,170 @@
+import asyncio
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from typing import Any, Dict, List, Optional, Tuple
+
+from .predicates import (
+    And,
+    Context,
+    Node,
+    Or,
+    Predicate,
+    _context,
+    _task_stack,
+    in_thread,
+    simplify,
+)
+
+# The executor that runs the operands of parallel operations that need no
+# awaiting. A thread pool with the default number of workers is created the
+# first time it's needed, unless one is set here.
+executor: Optional[Executor] = None
+
+# Whether the current thread is evaluating an operand of a parallel
+# operation, in which case nested parallel operations are evaluated
+# sequentially, so that they can't exhaust the executor and deadlock.
+_in_worker: ContextVar[bool] = ContextVar("_in_worker", default=False)
+
+
+def get_executor() -> Executor:
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(thread_name_prefix="rules")
+    return executor
+
+
+def _close_connections() -> None:
+    # Closes the database connections that an operand opened in a worker
+    # thread, as Django does for its own threads at the end of a request.
+    try:
+        from django.conf import settings
+        from django.db import close_old_connections
+    except ImportError:  # pragma: no cover
+        return
+    if settings.configured:
+        close_old_connections()
+
+
+def _run(node: Node, context: Optional[Context], args: Tuple[Any, ...]) -> Any:
+    # Runs in a copy of the caller's context vars, in a worker thread.
+    _in_worker.set(True)
+    _task_stack.set([] if context is None else [context])
+    try:
+        return node.evaluate(*args)
+    finally:
+        _close_connections()
+
+
+async def _arun(node: Node, context: Optional[Context], args: Tuple[Any, ...]) -> Any:
+    # Runs in a task, which gets a copy of the caller's context vars.
+    _task_stack.set([] if context is None else [context])
+    return await node.aevaluate(*args)
+
+
+class ParallelNode(Node):
+    """
+    An ``&`` or ``|`` operation that evaluates all of its operands at the
+    same time, rather than one after the other.
+
+    Results are still looked at in order, so the operation gives the same
+    result, or raises the same exception, as evaluating it sequentially
+    would: once it's decided, the results of the remaining operands are
+    ignored and those that haven't started yet are cancelled. Operands run
+    in the invocation context of the caller.
+    """
+
+    __slots__ = ()
+
+    # The result that decides the operation when any operand produces it.
+    decisive: bool
+
+    def evaluate(self, *args) -> Optional[bool]:
+        if _in_worker.get():
+            return super(ParallelNode, self).evaluate(*args)
+        context = _context.get()
+        first, *rest = self.operands
+        pool = get_executor()
+        futures: List[Future] = [
+            pool.submit(copy_context().run, _run, operand, context, args)
+            for operand in rest
+        ]
+        try:
+            result = None
+            for i in range(len(self.operands)):
+                value = first.evaluate(*args) if i == 0 else futures[i - 1].result()
+                if value is None:
+                    continue
+                if value is self.decisive:
+                    return value  # short-circuit evaluation
+                result = not self.decisive
+            return result
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def aevaluate(self, *args) -> Optional[bool]:
+        context = _context.get()
+        tasks: Dict[int, asyncio.Future] = {
+            i: asyncio.ensure_future(_arun(operand, context, args))
+            for i, operand in enumerate(self.operands)
+            if operand.is_async
+        }
+        try:
+            result = None
+            for i, operand in enumerate(self.operands):
+                if i in tasks:
+                    value = await tasks[i]
+                elif operand.async_safe:
+                    value = operand.evaluate(*args)
+                else:
+                    value = await in_thread(operand.evaluate)(*args)
+                if value is None:
+                    continue
+                if value is self.decisive:
+                    return value  # short-circuit evaluation
+                result = not self.decisive
+            return result
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # so that it's never logged as unretrieved
+
+
+class ParallelAnd(ParallelNode, And):
+    __slots__ = ()
+
+    decisive = False
+
+
+class ParallelOr(ParallelNode, Or):
+    __slots__ = ()
+
+    decisive = True
+
+
+def parallel(pred: Predicate) -> Predicate:
+    """
+    Returns an equivalent predicate that evaluates the operands of the
+    outermost ``&`` or ``|`` of the given predicate in parallel, or the
+    predicate itself if it's neither.
+
+    With ``test()``, operands run in the threads of ``executor``. With
+    ``atest()``, operands that must be awaited run in tasks of their own
+    and the others are called in turn, in a thread unless ``async_safe``.
+    Since operands that would have been skipped are evaluated anyway, they
+    should not have side effects. Operands that run in other threads query
+    the database with connections of their own, outside of the transaction
+    of the caller, if any.
+    """
+    node = simplify(pred.node)
+    if isinstance(node, ParallelNode):
+        return pred
+    if type(node) is And:
+        node = ParallelAnd(node.operands)
+    elif type(node) is Or:
+        node = ParallelOr(node.operands)
+    else:
+        return pred
+    return pred._combined(node, pred.name, pred._generated_name)
@@ -1,7 +1,26 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from .predicates import atest_all, test_all
 from .rulesets import RuleSet
 
 permissions = RuleSet()
 
+# Whether the rules of ``permissions`` alone decide the permissions they are
+# registered for, in which case ``ObjectPermissionBackend`` keeps the other
+# authentication backends from granting them. Set with the
+# ``RULES_AUTHORITATIVE`` setting.
+authoritative = False
+
+# Whether ``ObjectPermissionBackend.has_module_perms`` grants access to an app
+# when any of its permissions is granted, rather than only when a permission
+# named after the app is, and ``get_all_permissions`` tests all permissions.
+# Both test them without an object. Set with the ``RULES_ANY_MODULE_PERM``
+# setting.
+any_module_perm = False
+
 
 def add_perm(name, pred):
     permissions.add_rule(name, pred)
@@ -23,12 +42,384 @@ def has_perm(name, *args, **kwargs):
     return permissions.test_rule(name, *args, **kwargs)
 
 
+async def ahas_perm(name, *args, **kwargs):
+    return await permissions.atest_rule(name, *args, **kwargs)
+
+
+def is_authoritative(name):
+    """
+    Returns whether the rules alone decide the named permission.
+    """
+    return authoritative and name in permissions
+
+
+def has_perms(names, *args, **kwargs):
+    """
+    Returns whether all of the named permissions are granted. See
+    ``test_perms()``.
+    """
+    return all(test_perms(names, *args, **kwargs).values())
+
+
+async def ahas_perms(names, *args, **kwargs):
+    """
+    Like ``has_perms()``, awaiting any async predicates.
+    """
+    return all((await atest_perms(names, *args, **kwargs)).values())
+
+
+def test_perms(names, *args, **kwargs):
+    """
+    Tests each of the named permissions in a single invocation, like
+    ``RuleSet.test_rules()``, but stops at the first that is denied, or
+    doesn't exist, and returns the results up to it, keyed on name.
+    """
+    rules = permissions.snapshot
+    names, missing = _split_missing(rules, names)
+    results = test_all([rules[name] for name in names], *args, until=False, **kwargs)
+    return _decisions(names, results, missing)
+
+
+async def atest_perms(names, *args, **kwargs):
+    """
+    Like ``test_perms()``, awaiting any async predicates.
+    """
+    rules = permissions.snapshot
+    names, missing = _split_missing(rules, names)
+    results = await atest_all(
+        [rules[name] for name in names], *args, until=False, **kwargs
+    )
+    return _decisions(names, results, missing)
+
+
+def _split_missing(
+    rules: Mapping, names: Iterable[str]
+) -> Tuple[List[str], Optional[str]]:
+    # The names up to the first that is not in ``rules``, and that one.
+    names = list(names)
+    for i, name in enumerate(names):
+        if name not in rules:
+            return names[:i], name
+    return names, None
+
+
+def _decisions(
+    names: List[str], results: List[bool], missing: Optional[str]
+) -> Dict[str, bool]:
+    decisions = dict(zip(names, results))
+    if missing is not None and len(results) == len(names) and all(results):
+        decisions[missing] = False
+    return decisions
+
+
+# The names of the permissions in a snapshot of ``permissions``, keyed on app
+# label and then on model name, or on None for all of those of the app.
+_index: Optional[Tuple[Mapping, Dict[str, Dict[Optional[str], List[str]]]]] = None
+
+
+def _perm_index(rules: Mapping) -> Dict[str, Dict[Optional[str], List[str]]]:
+    global _index
+    index = _index
+    if index is None or index[0] is not rules:
+        apps: Dict[str, Dict[Optional[str], List[str]]] = {}
+        for name in sorted(rules):
+            app_label, dot, codename = name.partition(".")
+            if not (app_label and dot and codename):
+                continue
+            models = apps.setdefault(app_label, {})
+            models.setdefault(None, []).append(name)
+            action, _, model_name = codename.rpartition("_")
+            if action:
+                models.setdefault(model_name, []).append(name)
+        index = _index = (rules, apps)
+    return index[1]
+
+
+def perm_names(app_label: str, model_name: Optional[str] = None) -> List[str]:
+    """
+    Returns the sorted names of the permissions of the given app, or of the
+    given model of the app, assuming that they are named like Django's, ie.
+    ``"app_label.action_modelname"``.
+    """
+    return list(
+        _perm_index(permissions.snapshot).get(app_label, {}).get(model_name, [])
+    )
+
+
+def has_module_perms(app_label, *args, **kwargs):
+    """
+    Returns whether any of the permissions of the given app is granted,
+    testing them in a single invocation and stopping at the first that is,
+    or the result of the permission named after the app, if there is one.
+    Permissions are tested without an object, ie. their predicates are
+    passed ``None`` instead.
+    """
+    rules = permissions.snapshot
+    if app_label in rules:
+        return rules[app_label].test(*args, **kwargs)
+    names = _perm_index(rules).get(app_label, {}).get(None, [])
+    return any(test_all([rules[name] for name in names], *args, until=True, **kwargs))
+
+
+async def ahas_module_perms(app_label, *args, **kwargs):
+    """
+    Like ``has_module_perms()``, awaiting any async predicates.
+    """
+    rules = permissions.snapshot
+    if app_label in rules:
+        return await rules[app_label].atest(*args, **kwargs)
+    names = _perm_index(rules).get(app_label, {}).get(None, [])
+    results = await atest_all(
+        [rules[name] for name in names], *args, until=True, **kwargs
+    )
+    return any(results)
+
+
+def get_all_permissions(*args, **kwargs) -> Set[str]:
+    """
+    Returns the names of all the permissions that are granted, testing them
+    in a single invocation. Only rules named like Django's permissions, ie.
+    ``"app_label.codename"``, are tested.
+    """
+    rules = permissions.snapshot
+    names = [name for models in _perm_index(rules).values() for name in models[None]]
+    results = test_all([rules[name] for name in names], *args, **kwargs)
+    return {name for name, result in zip(names, results) if result}
+
+
+def capabilities(user, obj=None, prefix=""):
+    """
+    Returns whether the user has each of the permissions whose names start
+    with the given prefix, eg. ``"books."``, on the given object, keyed on
+    the name of the permission. See ``RuleSet.test_rules()``.
+    """
+    return permissions.test_rules(permissions.rule_names(prefix), user, obj)
+
+
+# Permission decision cache
+
+
+def cache_key(obj: Any) -> Any:
+    """
+    Returns the key for a user or object in the permission cache. Saved model
+    instances are identified by their model and primary key, anything else by
+    its identity.
+    """
+    if obj is None:
+        return None
+    meta = getattr(obj, "_meta", None)
+    pk = getattr(obj, "pk", None)
+    if meta is not None and pk is not None:
+        return (meta.label, pk)
+    return id(obj)
+
+
+class PermissionCache(dict):
+    """
+    Caches the decisions of ``ObjectPermissionBackend.has_perm``, keyed on the
+    permission, the user and the object. Entries hold on to the user and the
+    object, so that identity-based keys are not reused while the cache lives.
+    """
+
+    def __init__(self) -> None:
+        super(PermissionCache, self).__init__()
+        self.hits = 0
+        self.misses = 0
+
+    def has_perm(self, perm: str, user: Any, obj: Any = None) -> bool:
+        key = (perm, cache_key(user), cache_key(obj))
+        try:
+            result = self[key][0]
+        except KeyError:
+            self.misses += 1
+            result = has_perm(perm, user, obj)
+            self[key] = (result, user, obj)
+        else:
+            self.hits += 1
+        return result
+
+    async def ahas_perm(self, perm: str, user: Any, obj: Any = None) -> bool:
+        # Like ``has_perm()``, awaiting any async predicates.
+        key = (perm, cache_key(user), cache_key(obj))
+        try:
+            result = self[key][0]
+        except KeyError:
+            self.misses += 1
+            result = await ahas_perm(perm, user, obj)
+            self[key] = (result, user, obj)
+        else:
+            self.hits += 1
+        return result
+
+    def test_perms(
+        self, perms: Iterable[str], user: Any, obj: Any = None
+    ) -> Dict[str, bool]:
+        # Like ``test_perms()``, testing the permissions whose decisions are
+        # not cached yet together.
+        decisions, pending = self.lookup(perms, user, obj)
+        if pending:
+            decisions.update(self.store(test_perms(pending, user, obj), user, obj))
+        return decisions
+
+    async def atest_perms(
+        self, perms: Iterable[str], user: Any, obj: Any = None
+    ) -> Dict[str, bool]:
+        # Like ``test_perms()``, awaiting any async predicates.
+        decisions, pending = self.lookup(perms, user, obj)
+        if pending:
+            tested = await atest_perms(pending, user, obj)
+            decisions.update(self.store(tested, user, obj))
+        return decisions
+
+    def lookup(
+        self, perms: Iterable[str], user: Any, obj: Any
+    ) -> Tuple[Dict[str, bool], List[str]]:
+        # Returns the cached decisions up to the first denial, and the
+        # permissions whose decisions are not cached, unless one is denied.
+        user_key, obj_key = cache_key(user), cache_key(obj)
+        decisions: Dict[str, bool] = {}
+        pending = []
+        for perm in perms:
+            try:
+                result = self[(perm, user_key, obj_key)][0]
+            except KeyError:
+                pending.append(perm)
+                continue
+            self.hits += 1
+            decisions[perm] = result
+            if not result:
+                return decisions, []
+        return decisions, pending
+
+    def store(self, tested: Dict[str, bool], user: Any, obj: Any) -> Dict[str, bool]:
+        user_key, obj_key = cache_key(user), cache_key(obj)
+        self.misses += len(tested)
+        for perm, result in tested.items():
+            self[(perm, user_key, obj_key)] = (result, user, obj)
+        return tested
+
+
+_permission_cache: ContextVar[Optional[PermissionCache]] = ContextVar(
+    "rules_permission_cache", default=None
+)
+
+permission_cache_stats: Dict[str, int] = {"hits": 0, "misses": 0}
+# Caches of requests handled by different threads add to the totals at once.
+_stats_lock = threading.Lock()
+
+
+@contextmanager
+def permission_cache() -> Iterator[PermissionCache]:
+    """
+    Caches the decisions of ``ObjectPermissionBackend`` for the duration of
+    the block. ``rules.contrib.middleware.PermissionCacheMiddleware`` uses this
+    to cache decisions for the duration of a request.
+    """
+    cache = PermissionCache()
+    token = _permission_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _permission_cache.reset(token)
+        with _stats_lock:
+            permission_cache_stats["hits"] += cache.hits
+            permission_cache_stats["misses"] += cache.misses
+
+
+def get_permission_cache() -> Optional[PermissionCache]:
+    return _permission_cache.get()
+
+
+def clear_permission_cache() -> None:
+    """
+    Forgets the cached permission decisions, eg. after data that rules depend
+    on has changed.
+    """
+    cache = _permission_cache.get()
+    if cache is not None:
+        cache.clear()
+
+
 class ObjectPermissionBackend(object):
     def authenticate(self, *args, **kwargs):
         return None
 
     def has_perm(self, user, perm, *args, **kwargs):
-        return has_perm(perm, user, *args, **kwargs)
+        cache = _permission_cache.get()
+        if cache is not None and len(args) <= 1 and not kwargs:
+            result = cache.has_perm(perm, user, *args)
+        else:
+            result = has_perm(perm, user, *args, **kwargs)
+        if not result and is_authoritative(perm):
+            from django.core.exceptions import PermissionDenied
+
+            # so that Django doesn't ask the remaining backends
+            raise PermissionDenied
+        return result
+
+    async def ahas_perm(self, user, perm, *args, **kwargs):
+        """
+        Like ``has_perm()``, awaiting any async predicates, so that async
+        views don't need a thread for each check.
+        """
+        cache = _permission_cache.get()
+        if cache is not None and len(args) <= 1 and not kwargs:
+            result = await cache.ahas_perm(perm, user, *args)
+        else:
+            result = await ahas_perm(perm, user, *args, **kwargs)
+        if not result and is_authoritative(perm):
+            from django.core.exceptions import PermissionDenied
+
+            raise PermissionDenied
+        return result
+
+    def has_perms(self, user, perms, obj=None):
+        """
+        Returns whether the rules grant the user all of the given permissions
+        on the object. See ``test_perms()``.
+        """
+        return all(self.test_perms(user, perms, obj).values())
+
+    def test_perms(self, user, perms, obj=None):
+        """
+        Tests each of the given permissions in a single invocation, stopping
+        at the first that is denied, and returns the decisions up to it,
+        keyed on name.
+        """
+        cache = _permission_cache.get()
+        if cache is not None:
+            return cache.test_perms(perms, user, obj)
+        return test_perms(perms, user, obj)
+
+    async def ahas_perms(self, user, perms, obj=None):
+        return all((await self.atest_perms(user, perms, obj)).values())
+
+    async def atest_perms(self, user, perms, obj=None):
+        cache = _permission_cache.get()
+        if cache is not None:
+            return await cache.atest_perms(perms, user, obj)
+        return await atest_perms(perms, user, obj)
 
     def has_module_perms(self, user, app_label):
-        return has_perm(app_label, user)
+        """
+        Returns the result of the permission named after the app, or whether
+        any permission of the app is granted if ``any_module_perm`` is set.
+        See ``has_module_perms()``.
+        """
+        if not any_module_perm:
+            return has_perm(app_label, user)
+        return has_module_perms(app_label, user)
+
+    async def ahas_module_perms(self, user, app_label):
+        if not any_module_perm:
+            return await ahas_perm(app_label, user)
+        return await ahas_module_perms(app_label, user)
+
+    def get_all_permissions(self, user, obj=None):
+        """
+        Returns the names of all the permissions that are granted if
+        ``any_module_perm`` is set, or none. See ``get_all_permissions()``.
+        """
+        if not any_module_perm:
+            return set()
+        return get_all_permissions(user, obj)
@@ -1,15 +1,61 @@
+import asyncio
 import logging
-import operator
 import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
 from functools import partial, update_wrapper
-from inspect import getfullargspec, isfunction, ismethod
-from typing import Any, Callable, List, Optional, Tuple, Union
+from inspect import (
+    FullArgSpec,
+    getfullargspec,
+    iscoroutinefunction,
+    isfunction,
+    ismethod,
+)
+from types import CodeType
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from weakref import WeakKeyDictionary, ref
+
+from .cache import result_cache
+from .groups import get_group_names
 
 logger = logging.getLogger("rules")
 
+# Signatures of the functions predicates are created from, keyed on their
+# code, so that functions created by the same factory share them.
+_argspecs: "WeakKeyDictionary[CodeType, FullArgSpec]" = WeakKeyDictionary()
+
+
+def getargspec(fn: Callable[..., Any]) -> FullArgSpec:
+    """
+    Returns ``getfullargspec(fn)``, which is only computed once for all the
+    functions that share the same code. Only the names and number of
+    arguments are reliable, since default values may differ between them.
+    """
+    func = getattr(fn, "__func__", fn)
+    code = getattr(func, "__code__", None)
+    if code is None or hasattr(func, "__signature__"):
+        return getfullargspec(fn)
+    try:
+        return _argspecs[code]
+    except KeyError:
+        argspec = _argspecs[code] = getfullargspec(fn)
+        return argspec
+
 
 def assert_has_kwonlydefaults(fn: Callable[..., Any], msg: str) -> None:
-    argspec = getfullargspec(fn)
+    argspec = getargspec(fn)
     if hasattr(argspec, "kwonlyargs"):
         if not argspec.kwonlyargs:
             return
@@ -19,19 +65,185 @@ def assert_has_kwonlydefaults(fn: Callable[..., Any], msg: str) -> None:
             raise TypeError(msg)
 
 
+class Memo(dict):
+    """
+    Results of memoized predicates, keyed on the predicate and the arguments
+    it was called with, along with counters of how often it was used.
+    """
+
+    def __init__(self) -> None:
+        super(Memo, self).__init__()
+        self.hits = 0
+        self.misses = 0
+
+
 class Context(dict):
-    def __init__(self, args: Tuple[Any, ...]) -> None:
+    def __init__(self, args: Tuple[Any, ...], parent: Optional["Context"] = None):
         super(Context, self).__init__()
         self.args = args
+        self.parent = parent
+        self._memo: Optional[Memo] = None
+
+    @property
+    def memo(self) -> Memo:
+        """
+        The results of memoized predicates evaluated during the invocation.
+        Contexts of nested invocations share the memo of the outermost one.
+        """
+        if self.parent is not None:
+            return self.parent.memo
+        if self._memo is None:
+            self._memo = Memo()
+        return self._memo
+
+
+Stack = List[Union[Context, Tuple[Any, ...]]]
+
+# The invocation stack of the current task, while a predicate is awaited by
+# ``Predicate.atest()``, since tasks running in the same thread must not
+# share one, or of a thread that evaluates part of a parallel predicate.
+_task_stack: ContextVar[Optional[Stack]] = ContextVar("_task_stack", default=None)
 
 
 class localcontext(threading.local):
     def __init__(self) -> None:
-        self.stack: List[Context] = []
+        # Holds the arguments of each active invocation, which are replaced
+        # by a ``Context`` the first time the context is actually needed.
+        self._stack: Stack = []
+
+    @property
+    def stack(self) -> Stack:
+        return _task_stack.get() or self._stack
+
+    def get(self, index: int = -1) -> Optional[Context]:
+        stack = self.stack
+        try:
+            context = stack[index]
+        except IndexError:
+            return None
+        if type(context) is tuple:
+            parent = self.get(index - 1) if len(stack) + index > 0 else None
+            context = stack[index] = Context(context, parent)
+        return context  # type: ignore[return-value]
 
 
 _context = localcontext()
 
+# Whether the ``rules`` logger is enabled for debug messages, as last checked
+# by ``Predicate.test()``. Predicates are only logged if it is.
+_debug = False
+
+# Callables that are invoked as ``observer(predicate, result, elapsed)`` every
+# time a predicate is evaluated, eg. to collect statistics.
+observers: List[Callable[["Predicate", Optional[bool], float], Any]] = []
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a predicate is evaluated after the deadline of the current
+    permission check has passed, or takes longer than its own ``timeout``.
+    """
+
+    def __init__(self, predicate: "Predicate", overrun: float) -> None:
+        super(DeadlineExceeded, self).__init__(predicate, overrun)
+        # the predicate that was evaluated, or about to be, when time ran out
+        self.predicate = predicate
+        self.overrun = overrun
+
+    def __str__(self) -> str:
+        return "%s overran its deadline by %.3fs" % (self.predicate, self.overrun)
+
+
+# What ``test()`` does when the deadline of a check is exceeded: ``"deny"``
+# returns ``False``, ``"allow"`` returns ``True`` and ``"raise"`` raises
+# ``DeadlineExceeded``.
+timeout_policy = "deny"
+
+# Callables that are invoked as ``handler(predicate, exception)`` every time
+# testing a predicate exceeds its deadline, eg. to report the offending rule.
+overrun_handlers: List[Callable[["Predicate", DeadlineExceeded], Any]] = []
+
+# The time, as per ``time.monotonic()``, by which the current evaluation
+# must be done, if any.
+_deadline: ContextVar[Optional[float]] = ContextVar("_deadline", default=None)
+
+# The number of deadlines currently set in any thread or task. Predicates are
+# only checked against deadlines while there are any.
+_deadlines = 0
+_deadlines_lock = threading.Lock()
+
+
+def _set_deadline(timeout: float) -> Token:
+    global _deadlines
+    expires = time.monotonic() + timeout
+    current = _deadline.get()
+    with _deadlines_lock:
+        _deadlines += 1
+    return _deadline.set(expires if current is None else min(expires, current))
+
+
+def _reset_deadline(token: Token) -> None:
+    global _deadlines
+    _deadline.reset(token)
+    with _deadlines_lock:
+        _deadlines -= 1
+
+
+@contextmanager
+def deadline(timeout: float) -> Iterator[None]:
+    """
+    Context manager that limits the time that the predicates tested inside
+    it may take, in seconds, eg. all the permission checks of a request.
+    Nested deadlines can only shorten the time that is left.
+    """
+    token = _set_deadline(timeout)
+    try:
+        yield
+    finally:
+        _reset_deadline(token)
+
+
+def _timed_out(pred: "Predicate", exc: DeadlineExceeded) -> bool:
+    # Reports that testing ``pred`` exceeded its deadline and applies the
+    # timeout policy.
+    logger.warning("Testing %s exceeded its deadline: %s", pred, exc)
+    for handler in overrun_handlers:
+        handler(pred, exc)
+    if timeout_policy == "raise":
+        raise exc
+    return timeout_policy == "allow"
+
+
+def _call(fn: Callable[..., Any], *args) -> Any:
+    return fn(*args)
+
+
+async def _acall_inline(fn: Callable[..., Any], *args) -> Any:
+    return fn(*args)
+
+
+# ``_call()`` wrapped with ``sync_to_async``, once it's first needed.
+_call_in_thread: Optional[Callable[..., Awaitable[Any]]] = None
+
+
+def in_thread(fn: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    """
+    Returns a coroutine function that calls ``fn`` in the thread that Django
+    runs synchronous code in for async code, so that predicates that query
+    the database may be evaluated while testing rules with ``atest()``.
+    """
+    global _call_in_thread
+    if _call_in_thread is None:
+        try:
+            from asgiref.sync import sync_to_async
+        except ImportError:  # pragma: no cover
+            # without Django, there's no database access that must not
+            # happen in the thread of the event loop
+            _call_in_thread = _acall_inline
+        else:
+            _call_in_thread = sync_to_async(_call)
+    return partial(_call_in_thread, fn)
+
 
 class NoValueSentinel(object):
     def __bool__(self) -> bool:
@@ -45,24 +257,593 @@ NO_VALUE = NoValueSentinel()
 del NoValueSentinel
 
 
+class KeyRef(ref):
+    # A weak reference that knows its key, like ``weakref.KeyedRef`` without
+    # the overhead of its constructor written in Python.
+    __slots__ = ("key",)
+
+    key: Any
+
+
+class Interned(object):
+    """
+    The live objects of a hash-consing table, keyed on their structure, like
+    a ``WeakValueDictionary`` minus the overhead of raising and catching
+    ``KeyError`` on every miss, as most lookups are when rules are created.
+    """
+
+    def __init__(self) -> None:
+        self.refs: Dict[Any, KeyRef] = {}
+        # bound once, rather than for every entry
+        self.callback = self.remove
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+    def get(self, key: Any) -> Any:
+        current = self.refs.get(key)
+        return None if current is None else current()
+
+    def setdefault(self, key: Any, value: Any) -> Any:
+        """
+        Returns the live object for ``key``, storing ``value`` if there's
+        none, so that threads racing to create it agree on one.
+        """
+        new = KeyRef(value, self.callback)
+        new.key = key
+        current = self.refs.setdefault(key, new)
+        if current is not new:
+            existing = current()
+            if existing is not None:
+                return existing
+            self.refs[key] = new  # dead, about to be removed
+        return value
+
+    def remove(self, dead: KeyRef) -> None:
+        # a racing thread may have replaced the entry already
+        if self.refs.get(dead.key) is dead:
+            self.refs.pop(dead.key, None)
+
+
+# Nodes keyed on their type and the identity of their operands, or of their
+# predicate for leaves, so that structurally equal trees share their nodes.
+# Since nodes keep their operands alive, the identities of live nodes can't
+# be reused.
+_nodes = Interned()
+
+
+class Node(object):
+    """
+    A node in the expression tree of a predicate. Combined predicates keep
+    the tree they were built from, so that it can be inspected, simplified
+    and compiled. Nodes are immutable and compare equal by structure.
+
+    Nodes are hash-consed: creating a node that is structurally equal to a
+    live one returns that one instead, so that rules built from the same
+    expressions share them.
+    """
+
+    __slots__ = ("operands", "_hash", "is_async", "async_safe", "__weakref__")
+
+    symbol = ""
+
+    operands: Tuple["Node", ...]
+    _hash: int
+    # whether any predicate in the tree must be awaited
+    is_async: bool
+    # whether all the predicates in the tree may be evaluated in the thread
+    # of an event loop, see ``Predicate.async_safe``
+    async_safe: bool
+
+    def __new__(cls, operands: Iterable["Node"]) -> "Node":
+        operands = tuple(operands)
+        key = (cls, *map(id, operands))
+        node = _nodes.get(key)
+        if node is not None:
+            return node
+        node = super(Node, cls).__new__(cls)
+        node.operands = operands
+        node._hash = hash((cls, operands))
+        node.is_async, node.async_safe = False, True
+        for operand in operands:
+            node.is_async = node.is_async or operand.is_async
+            node.async_safe = node.async_safe and operand.async_safe
+        return _nodes.setdefault(key, node)
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            type(self) is type(other)
+            and self._hash == other._hash  # type: ignore[attr-defined]
+            and self.operands == other.operands  # type: ignore[attr-defined]
+        )
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __copy__(self) -> "Node":
+        # nodes are immutable, and shared by the trees they are part of
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "Node":
+        return self
+
+    def __repr__(self) -> str:
+        return "<%s:%s>" % (type(self).__name__, self)
+
+    def __str__(self) -> str:
+        # Formats the tree bottom up, without recursing, so that the names of
+        # deep trees can be built.
+        names: Dict[int, str] = {}
+        stack: List[Node] = [self]
+        while stack:
+            node = stack[-1]
+            pending = [o for o in node.operands if id(o) not in names]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            names[id(node)] = node._format([names[id(o)] for o in node.operands])
+        return names[id(self)]
+
+    def _format(self, operands: List[str]) -> str:
+        # Returns the name of this node, given those of its operands.
+        return "(%s)" % (" %s " % self.symbol).join(operands)
+
+    @property
+    def value(self) -> Optional[bool]:
+        """
+        The result this node always evaluates to, or ``None`` if it is not
+        known in advance.
+        """
+        return None
+
+    def leaves(self) -> Iterator["Leaf"]:
+        for operand in self.operands:
+            yield from operand.leaves()
+
+    def evaluate(self, *args) -> Optional[bool]:
+        raise NotImplementedError
+
+    async def aevaluate(self, *args) -> Optional[bool]:
+        """
+        Like ``evaluate()``, awaiting the predicates that must be awaited.
+        Subtrees that contain none are evaluated with ``evaluate()``.
+        """
+        raise NotImplementedError
+
+    @property
+    def independent(self) -> bool:
+        """
+        Whether the result of this node depends only on the first argument,
+        ie. the same for every target when testing a batch of targets.
+        """
+        return all(leaf.independent for leaf in self.leaves())
+
+    def evaluate_many(
+        self, context: Context, obj: Any, targets: List[Any]
+    ) -> List[Optional[bool]]:
+        """
+        Evaluates the node for ``obj`` and each of ``targets``, in the
+        given invocation context. See ``Predicate.test_many()``.
+        """
+        if self.independent:
+            return [self.evaluate(obj)] * len(targets)
+        return self._evaluate_many(context, obj, targets)
+
+    def _evaluate_many(
+        self, context: Context, obj: Any, targets: List[Any]
+    ) -> List[Optional[bool]]:
+        raise NotImplementedError
+
+
+class Leaf(Node):
+    __slots__ = ("predicate",)
+
+    predicate: "Predicate"
+
+    def __new__(cls, predicate: "Predicate") -> "Leaf":  # type: ignore[misc]
+        key = (cls, id(predicate))
+        leaf = _nodes.get(key)
+        if leaf is not None:
+            return leaf
+        node = object.__new__(cls)
+        node.predicate = predicate
+        node.operands = ()
+        node._hash = hash(id(predicate))
+        node.is_async = predicate.is_async
+        node.async_safe = predicate.async_safe
+        return _nodes.setdefault(key, node)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Leaf) and self.predicate is other.predicate
+
+    __hash__ = Node.__hash__
+
+    def __str__(self) -> str:
+        return self.predicate.name
+
+    def _format(self, operands: List[str]) -> str:
+        return self.predicate.name
+
+    @property
+    def value(self) -> Optional[bool]:
+        return self.predicate.constant
+
+    def leaves(self) -> Iterator["Leaf"]:
+        yield self
+
+    def evaluate(self, *args) -> Optional[bool]:
+        return self.predicate._apply(*args)
+
+    async def aevaluate(self, *args) -> Optional[bool]:
+        return await self.predicate._aapply(*args)
+
+    @property
+    def independent(self) -> bool:
+        pred = self.predicate
+        return (
+            pred.num_args <= 1
+            and not pred.var_args
+            and not pred.bind  # may look at ``context.args``
+            and type(pred)._apply is Predicate._apply
+        )
+
+    def _evaluate_many(
+        self, context: Context, obj: Any, targets: List[Any]
+    ) -> List[Optional[bool]]:
+        pred = self.predicate
+        if pred.batch_fn is not None:
+            context.args = (obj,)
+            return [
+                None if result is None else bool(result)
+                for result in pred.batch_fn(obj, targets)
+            ]
+        results = []
+        for target in targets:
+            context.args = (obj, target)
+            results.append(pred._apply(obj, target))
+        return results
+
+
+class Not(Node):
+    __slots__ = ()
+
+    @property
+    def operand(self) -> Node:
+        return self.operands[0]
+
+    def _format(self, operands: List[str]) -> str:
+        name = operands[0]
+        return name[1:] if name.startswith("~") else "~" + name
+
+    def evaluate(self, *args) -> Optional[bool]:
+        result = self.operand.evaluate(*args)
+        return None if result is None else not result
+
+    async def aevaluate(self, *args) -> Optional[bool]:
+        result = await self.operand.aevaluate(*args)
+        return None if result is None else not result
+
+    def _evaluate_many(
+        self, context: Context, obj: Any, targets: List[Any]
+    ) -> List[Optional[bool]]:
+        return [
+            None if result is None else not result
+            for result in self.operand.evaluate_many(context, obj, targets)
+        ]
+
+
+class And(Node):
+    __slots__ = ()
+
+    symbol = "&"
+
+    def evaluate(self, *args) -> Optional[bool]:
+        result = None
+        for operand in self.operands:
+            value = operand.evaluate(*args)
+            if value is None:
+                continue
+            if not value:
+                return False  # short-circuit evaluation
+            result = True
+        return result
+
+    async def aevaluate(self, *args) -> Optional[bool]:
+        result = None
+        for operand in self.operands:
+            if operand.is_async:
+                value = await operand.aevaluate(*args)
+            elif operand.async_safe:
+                value = operand.evaluate(*args)
+            else:
+                value = await in_thread(operand.evaluate)(*args)
+            if value is None:
+                continue
+            if not value:
+                return False  # short-circuit evaluation
+            result = True
+        return result
+
+    def _evaluate_many(
+        self, context: Context, obj: Any, targets: List[Any]
+    ) -> List[Optional[bool]]:
+        return _short_circuit_many(self, False, context, obj, targets)
+
+
+class Or(Node):
+    __slots__ = ()
+
+    symbol = "|"
+
+    def evaluate(self, *args) -> Optional[bool]:
+        result = None
+        for operand in self.operands:
+            value = operand.evaluate(*args)
+            if value is None:
+                continue
+            if value:
+                return True  # short-circuit evaluation
+            result = False
+        return result
+
+    async def aevaluate(self, *args) -> Optional[bool]:
+        result = None
+        for operand in self.operands:
+            if operand.is_async:
+                value = await operand.aevaluate(*args)
+            elif operand.async_safe:
+                value = operand.evaluate(*args)
+            else:
+                value = await in_thread(operand.evaluate)(*args)
+            if value is None:
+                continue
+            if value:
+                return True  # short-circuit evaluation
+            result = False
+        return result
+
+    def _evaluate_many(
+        self, context: Context, obj: Any, targets: List[Any]
+    ) -> List[Optional[bool]]:
+        return _short_circuit_many(self, True, context, obj, targets)
+
+
+class Xor(Node):
+    __slots__ = ()
+
+    symbol = "^"
+
+    def evaluate(self, *args) -> Optional[bool]:
+        result = None
+        for operand in self.operands:
+            value = operand.evaluate(*args)
+            if value is None:
+                continue
+            result = value if result is None else result is not value
+        return result
+
+    async def aevaluate(self, *args) -> Optional[bool]:
+        result = None
+        for operand in self.operands:
+            if operand.is_async:
+                value = await operand.aevaluate(*args)
+            elif operand.async_safe:
+                value = operand.evaluate(*args)
+            else:
+                value = await in_thread(operand.evaluate)(*args)
+            if value is None:
+                continue
+            result = value if result is None else result is not value
+        return result
+
+    def _evaluate_many(
+        self, context: Context, obj: Any, targets: List[Any]
+    ) -> List[Optional[bool]]:
+        results: List[Optional[bool]] = [None] * len(targets)
+        for operand in self.operands:
+            values = operand.evaluate_many(context, obj, targets)
+            for i, value in enumerate(values):
+                if value is None:
+                    continue
+                result = results[i]
+                results[i] = value if result is None else result is not value
+        return results
+
+
+def _short_circuit_many(
+    node: Node, decisive: bool, context: Context, obj: Any, targets: List[Any]
+) -> List[Optional[bool]]:
+    # Evaluates the operands of ``&`` (or ``|``) one at a time for all the
+    # targets, each time only for those targets whose result is not decided
+    # yet, so that every target gets the same evaluations as with ``test()``.
+    results: List[Optional[bool]] = [None] * len(targets)
+    pending = list(range(len(targets)))
+    for operand in node.operands:
+        if not pending:
+            break
+        values = operand.evaluate_many(context, obj, [targets[i] for i in pending])
+        undecided = []
+        for i, value in zip(pending, values):
+            if value is not None:
+                results[i] = value
+                if value is decisive:
+                    continue
+            undecided.append(i)
+        pending = undecided
+    return results
+
+
+def simplify(node: Node) -> Node:
+    """
+    Returns an equivalent, normalized expression tree: nested operations
+    of the same kind are flattened, constants are folded, duplicate
+    operands of ``&`` and ``|`` are removed and double negation cancels
+    out. Assumes predicates give the same result when evaluated twice with
+    the same arguments.
+    """
+    if isinstance(node, Leaf):
+        return node
+
+    if isinstance(node, Not):
+        operand = simplify(node.operand)
+        if isinstance(operand, Not):
+            return operand.operand
+        if operand.value is not None:
+            return CONSTANTS[not operand.value]
+        if operand is node.operand:
+            return node
+        return Not((operand,))
+
+    cls = type(node)
+    operands: List[Node] = []
+    for operand in node.operands:
+        if not isinstance(operand, Leaf):
+            operand = simplify(operand)
+        if type(operand) is cls:
+            operands.extend(operand.operands)
+        else:
+            operands.append(operand)
+
+    if cls is Xor:
+        if all(operand.value is not None for operand in operands):
+            return CONSTANTS[Xor(operands).evaluate()]  # type: ignore[index]
+        return _rebuilt(node, operands)
+
+    # ``x & False`` and ``x | True`` always give the same result, and any
+    # number of ``True`` operands in ``&`` (or ``False`` in ``|``) behaves
+    # like one, which however remains significant when others are skipped.
+    decisive = issubclass(cls, Or)
+    unique: List[Node] = []
+    constant = False  # whether one of ``unique`` is a constant
+    for operand in operands:
+        value = operand.value
+        if value is not None:
+            if value is decisive:
+                return operand
+            if constant:
+                continue
+            constant = True
+        if operand not in unique:
+            unique.append(operand)
+
+    if len(unique) == 1:
+        return unique[0]
+    return _rebuilt(node, unique)
+
+
+def _rebuilt(node: Node, operands: List[Node]) -> Node:
+    # The node itself if its operands didn't change, which saves looking up
+    # the same node again when most trees are already simple.
+    new = tuple(operands)
+    if new == node.operands:
+        return node
+    return type(node)(new)
+
+
+def specialize(node: Node, obj: Any) -> Optional[Node]:
+    """
+    Returns the expression tree that remains once the predicates that only
+    depend on the first argument are evaluated for ``obj``, in the current
+    invocation context, and replaced by their results, or ``None`` if all
+    of it would be skipped. Predicates that would never be evaluated, since
+    a preceding operand decides the operation, are dropped.
+    """
+    if isinstance(node, Leaf):
+        if node.value is not None or node.is_async or not node.independent:
+            return node
+        result = node.predicate._apply(obj)
+        return None if result is None else CONSTANTS[result]
+
+    if isinstance(node, Not):
+        operand = specialize(node.operand, obj)
+        return None if operand is None else Not((operand,))
+
+    decisive = isinstance(node, Or) if isinstance(node, (And, Or)) else None
+    operands: List[Node] = []
+    for operand in node.operands:
+        residual = specialize(operand, obj)
+        if residual is None:
+            continue  # skipped
+        operands.append(residual)
+        if decisive is not None and residual.value is decisive:
+            break  # short-circuit evaluation
+    if not operands:
+        return None
+    if len(operands) == 1:
+        return operands[0]
+    return type(node)(operands)
+
+
 class Predicate(object):
     fn: Callable[..., Any]
     num_args: int
     var_args: bool
     name: str
+    is_async: bool
+
+    # Whether the predicate may be evaluated in the thread of an event loop,
+    # ie. doesn't query the database or block otherwise. Predicates that
+    # must be awaited are, as are combinations of such predicates only. The
+    # others are evaluated in a thread of their own by ``atest()``.
+    async_safe: bool
+
+    # The result of predicates that are known to always give the same result,
+    # such as ``always_true``, that can be folded when simplifying rules.
+    constant: Optional[bool] = None
+
+    # The expression tree of combined predicates, as built by ``&``, ``|``,
+    # ``^`` and ``~``. Leaf predicates have none.
+    _node: Optional[Node] = None
+
+    # Whether the name of a combined predicate was made up from its operands
+    # rather than given, in which case ``simplify()`` names the simplified
+    # predicate after its own tree.
+    _generated_name = False
+
+    # Evaluates the predicate for many targets at once, as
+    # ``batch_fn(obj, targets)``. See ``batch()``.
+    batch_fn: Optional[Callable[[Any, List[Any]], Iterable[Any]]] = None
+
+    # Returns the condition on the rows of a queryset that this predicate
+    # holds for, as ``q_fn(user)``. See ``rules.contrib.queryset``.
+    q_fn: Optional[Callable[[Any], Any]] = None
+
+    # The time the predicate may take, in seconds, if limited.
+    timeout: Optional[float] = None
+
+    # The number of seconds results are kept in ``rules.cache.result_cache``
+    # for, if cached, the function that returns the key they are kept
+    # under, given the arguments of the predicate, and what identifies the
+    # predicate in a Django cache, see ``rules.cache.identify()``.
+    cache_ttl: Optional[float] = None
+    cache_key: Optional[Callable[..., Any]] = None
+    cache_id: Optional[str] = None
 
     def __init__(
         self,
         fn: Union["Predicate", Callable[..., Any]],
         name: Optional[str] = None,
         bind: bool = False,
+        memoize: bool = False,
+        pure: bool = False,
+        cost: Optional[float] = None,
+        batch: Optional[Callable[[Any, List[Any]], Iterable[Any]]] = None,
+        q: Optional[Callable[[Any], Any]] = None,
+        timeout: Optional[float] = None,
+        cache: Optional[float] = None,
+        key: Optional[Callable[..., Any]] = None,
+        async_safe: bool = False,
     ) -> None:
         # fn can be a callable with any of the following signatures:
         #   - fn(obj=None, target=None)
         #   - fn(obj=None)
         #   - fn()
         assert callable(fn), "The given predicate is not callable."
+        named = name is not None
         innerfn = fn
+        # known for the expression trees of combined predicates
+        is_async: Optional[bool] = None
         if isinstance(fn, Predicate):
             innerfn, num_args, var_args, name = (
                 fn.fn,
@@ -70,26 +851,39 @@ class Predicate(object):
                 fn.var_args,
                 name or fn.name,
             )
+            if timeout is None:
+                # with a timeout of its own, the tree is evaluated as a whole
+                self._node = fn._node
+            self.batch_fn = fn.batch_fn
+            self.q_fn = fn.q_fn
+            if not named:
+                self._generated_name = fn._generated_name
+            async_safe = async_safe or fn.async_safe
             fn = innerfn
         elif isinstance(fn, partial):
             innerfn = fn.func
-            argspec = getfullargspec(innerfn)
+            argspec = getargspec(innerfn)
             var_args = argspec.varargs is not None
             num_args = len(argspec.args) - len(fn.args)
             if ismethod(innerfn):
                 num_args -= 1  # skip `self`
-            name = fn.func.__name__
+            name = name or fn.func.__name__
+        elif ismethod(fn) and isinstance(fn.__self__, Node):
+            # ``evaluate`` of the expression tree of a combined predicate
+            num_args, var_args = 0, True
+            is_async = fn.__func__ is type(fn.__self__).aevaluate
+            async_safe = async_safe or fn.__self__.async_safe
         elif ismethod(fn):
-            argspec = getfullargspec(fn)
+            argspec = getargspec(fn)
             var_args = argspec.varargs is not None
             num_args = len(argspec.args) - 1  # skip `self`
         elif isfunction(fn):
-            argspec = getfullargspec(fn)
+            argspec = getargspec(fn)
             var_args = argspec.varargs is not None
             num_args = len(argspec.args)
         elif isinstance(fn, object):
             innerfn = getattr(fn, "__call__")  # noqa
-            argspec = getfullargspec(innerfn)
+            argspec = getargspec(innerfn)
             var_args = argspec.varargs is not None
             num_args = len(argspec.args) - 1  # skip `self`
             name = name or type(fn).__name__
@@ -98,16 +892,41 @@ class Predicate(object):
             raise TypeError("Incompatible predicate.")
         if bind:
             num_args -= 1
-        assert_has_kwonlydefaults(
-            innerfn,
-            "The given predicate is missing defaults for keyword-only arguments",
-        )
+        if is_async is None:
+            assert_has_kwonlydefaults(
+                innerfn,
+                "The given predicate is missing defaults for keyword-only arguments",
+            )
+            is_async = iscoroutinefunction(innerfn)
         assert num_args <= 2, "Incompatible predicate."
+        assert key is None or cache is not None, "A key needs a cache timeout."
         self.fn = fn
         self.num_args = num_args
         self.var_args = var_args
         self.name = name or fn.__name__
         self.bind = bind
+        self.memoize = memoize
+        self.pure = pure
+        self.cost = cost
+        self.is_async = is_async
+        # predicates that must be awaited evaluate the others in a thread
+        self.async_safe = self.is_async or async_safe
+        if batch is not None:
+            self.batch_fn = batch
+        if q is not None:
+            self.q_fn = q
+        if timeout is not None:
+            self.timeout = timeout
+        if cache is not None:
+            self.cache_ttl = cache
+            self.cache_key = key
+            # combinations are identified by the tree their name describes
+            named = named or (ismethod(fn) and isinstance(fn.__self__, Node))
+            self.cache_id = result_cache.register(self, named)
+        if type(self)._apply is Predicate._apply and not (
+            memoize or self.is_async or timeout is not None or cache is not None
+        ):
+            self._apply = _make_apply(self)  # type: ignore[method-assign]
 
     def __repr__(self) -> str:
         return "<%s:%s object at %s>" % (type(self).__name__, str(self), hex(id(self)))
@@ -156,88 +975,642 @@ class Predicate(object):
             ...
 
         """
-        try:
-            return _context.stack[-1]
-        except IndexError:
-            return None
+        return _context.get()
 
-    def test(self, obj: Any = NO_VALUE, target: Any = NO_VALUE) -> bool:
+    def test(
+        self,
+        obj: Any = NO_VALUE,
+        target: Any = NO_VALUE,
+        timeout: Optional[float] = None,
+    ) -> bool:
         """
         The canonical method to invoke predicates.
+
+        With a ``timeout``, in seconds, the predicates of the tree are not
+        evaluated once the time is up, and the result is decided by
+        ``timeout_policy`` instead. See ``deadline()``.
+        """
+        global _debug
+        _debug = logger.isEnabledFor(logging.DEBUG)
+        args: Tuple[Any, ...]
+        if target is NO_VALUE:
+            args = () if obj is NO_VALUE else (obj,)
+        elif obj is NO_VALUE:
+            args = (target,)
+        else:
+            args = (obj, target)
+        stack = _task_stack.get() or _context._stack  # ie. _context.stack
+        stack.append(args)
+        if _debug:
+            logger.debug("Testing %s", self)
+        token = None if timeout is None else _set_deadline(timeout)
+        try:
+            return True if self._apply(*args) else False
+        except DeadlineExceeded as exc:
+            if len(stack) > 1:
+                raise  # the outermost test decides
+            return _timed_out(self, exc)
+        finally:
+            if token is not None:
+                _reset_deadline(token)
+            context = stack.pop()
+            if _debug and type(context) is Context and context._memo is not None:
+                logger.debug(
+                    "Memo hits: %d, misses: %d",
+                    context._memo.hits,
+                    context._memo.misses,
+                )
+
+    async def atest(
+        self,
+        obj: Any = NO_VALUE,
+        target: Any = NO_VALUE,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Like ``test()``, for predicates that combine ``async def`` predicates,
+        which are awaited in turn. Other predicates are called as usual, and
+        predicates that need no awaiting at all are simply tested.
+
+        Predicates that are not ``async_safe``, eg. that query the database,
+        are evaluated in a thread with ``in_thread()``: the whole predicate,
+        if it needs no awaiting, or else each of its subtrees that does not.
+
+        Predicates that are awaited are cancelled once the ``timeout``, or
+        their own, runs out.
         """
-        args = tuple(arg for arg in (obj, target) if arg is not NO_VALUE)
-        _context.stack.append(Context(args))
-        logger.debug("Testing %s", self)
+        if not self.is_async:
+            if self.async_safe:
+                return self.test(obj, target, timeout)
+            return await in_thread(self.test)(obj, target, timeout)
+        global _debug
+        _debug = logger.isEnabledFor(logging.DEBUG)
+        args: Tuple[Any, ...]
+        if target is NO_VALUE:
+            args = () if obj is NO_VALUE else (obj,)
+        elif obj is NO_VALUE:
+            args = (target,)
+        else:
+            args = (obj, target)
+        # the current task gets a stack of its own, sharing the contexts of
+        # any invocations it is nested in
+        parent = _context.get()
+        token = _task_stack.set([args] if parent is None else [parent, args])
+        if _debug:
+            logger.debug("Testing %s", self)
+        deadline = None if timeout is None else _set_deadline(timeout)
         try:
-            return bool(self._apply(*args))
+            return True if await self._aapply(*args) else False
+        except DeadlineExceeded as exc:
+            if parent is not None:
+                raise  # the outermost test decides
+            return _timed_out(self, exc)
         finally:
-            _context.stack.pop()
+            if deadline is not None:
+                _reset_deadline(deadline)
+            _task_stack.reset(token)
 
-    def __and__(self, other) -> "Predicate":
-        def AND(*args):
-            return self._combine(other, operator.and_, args)
+    def test_many(self, obj: Any, targets: Iterable[Any]) -> List[bool]:
+        """
+        Tests the predicate against each of ``targets``, eg. a user against
+        a list of objects, and returns a list of results in the same order.
+
+        Gives the same results as calling ``test(obj, target)`` for each
+        target, but predicates that only depend on ``obj`` are evaluated
+        once for the whole batch, and predicates with a batch implementation
+        are called once for all the targets that need them. The targets
+        share a single invocation context, whose ``args`` are updated for
+        each target.
+        """
+        global _debug
+        _debug = logger.isEnabledFor(logging.DEBUG)
+        targets = list(targets)
+        if _debug:
+            logger.debug("Testing %s against %d targets", self, len(targets))
+        try:
+            results = self._apply_many(obj, targets)
+        except DeadlineExceeded as exc:
+            if _context.stack:
+                raise  # the outermost test decides
+            return [_timed_out(self, exc)] * len(targets)
+        return [True if result else False for result in results]
+
+    def invalidate(self, user: Any = None) -> None:
+        """
+        Forgets the cached results of a predicate created with ``cache=...``,
+        or only those for the given user.
+        """
+        result_cache.invalidate(self, user)
 
-        return type(self)(AND, "(%s & %s)" % (self.name, other.name))
+    def batch(
+        self, fn: Callable[[Any, List[Any]], Iterable[Any]]
+    ) -> Callable[[Any, List[Any]], Iterable[Any]]:
+        """
+        Decorator that registers a function that evaluates the predicate for
+        many targets at once, eg. with a single query, to be used by
+        ``test_many()``. It is called with the first argument and the list
+        of targets, and returns a result for each target::
+
+            >>> @is_book_author.batch
+            ... def is_book_author_many(user, books):
+            ...     authored = set(user.books.values_list('pk', flat=True))
+            ...     return [book.pk in authored for book in books]
+            ...
+        """
+        self.batch_fn = fn
+        return fn
 
-    def __or__(self, other) -> "Predicate":
-        def OR(*args):
-            return self._combine(other, operator.or_, args)
+    @property
+    def node(self) -> Node:
+        """
+        The expression tree this predicate evaluates. This is a ``Leaf``
+        node for predicates that are not a combination of other predicates,
+        or that are evaluated as a whole.
+        """
+        if (
+            self._node is None
+            or self.memoize
+            or self.cache_ttl is not None
+            or self.q_fn is not None
+            or self.batch_fn is not None
+            or type(self)._apply is not Predicate._apply
+        ):
+            # a subclass that evaluates itself differently must not be
+            # taken apart, nor a memoized or cached predicate, whose result
+            # is shared by all the trees it's part of, nor a predicate with
+            # a query or batch function of its own, that would be bypassed
+            return Leaf(self)
+        return self._node
 
-        return type(self)(OR, "(%s | %s)" % (self.name, other.name))
+    def __and__(self, other) -> "Predicate":
+        node = And((self.node, other.node))
+        name = "(%s & %s)" % (self.name, other.name)
+        return self._combined(node, name, generated=True)
 
-    def __xor__(self, other) -> "Predicate":
-        def XOR(*args):
-            return self._combine(other, operator.xor, args)
+    def __or__(self, other) -> "Predicate":
+        node = Or((self.node, other.node))
+        name = "(%s | %s)" % (self.name, other.name)
+        return self._combined(node, name, generated=True)
 
-        return type(self)(XOR, "(%s ^ %s)" % (self.name, other.name))
+    def __xor__(self, other) -> "Predicate":
+        node = Xor((self.node, other.node))
+        name = "(%s ^ %s)" % (self.name, other.name)
+        return self._combined(node, name, generated=True)
 
     def __invert__(self) -> "Predicate":
-        def INVERT(*args):
-            result = self._apply(*args)
-            return None if result is None else not result
-
         if self.name.startswith("~"):
             name = self.name[1:]
         else:
             name = "~" + self.name
-        return type(self)(INVERT, name)
+        return self._combined(Not((self.node,)), name, generated=True)
+
+    def _combined(
+        self, node: Node, name: Optional[str] = None, generated: bool = False
+    ) -> "Predicate":
+        if isinstance(node, Leaf) and name in (None, node.predicate.name):
+            return node.predicate
+        if name is None:
+            name, generated = str(node), True
+        fn = node.aevaluate if node.is_async else node.evaluate
+        # a combination of memoized predicates is memoized as well
+        memoize = bool(node.operands) and all(
+            isinstance(operand, Leaf) and operand.predicate.memoize
+            for operand in node.operands
+        )
+        p = type(self)(fn, name, memoize=memoize)
+        p._node = node
+        p._generated_name = generated
+        return p
 
-    def _combine(self, other, op, args):
-        self_result = self._apply(*args)
-        if self_result is None:
-            return other._apply(*args)
+    def simplify(self) -> "Predicate":
+        """
+        Returns an equivalent predicate with a normalized expression tree, or
+        the predicate itself if there's nothing to simplify. See ``simplify``.
+        A name given to the predicate is kept. Predicates that are evaluated
+        as a whole, or that are declared ``pure`` or with a ``cost``, are not
+        simplified, so that they keep their options.
+        """
+        node = self.node
+        if isinstance(node, Leaf) or self.pure or self.cost is not None:
+            return self
+        simplified = simplify(node)
+        if simplified == node:
+            return self
+        return self._combined(simplified, None if self._generated_name else self.name)
+
+    def specialize(self, obj: Any) -> "Predicate":
+        """
+        Returns a predicate of the target alone that gives the same result as
+        this predicate does for ``obj`` and that target, ie. with
+        ``residual.test(target) == self.test(obj, target)``, eg. for a user
+        whose permissions are checked for many objects.
+
+        Predicates that only depend on ``obj`` are evaluated once, here, and
+        the results folded into the expression tree. If that decides it,
+        ``always_allow`` or ``always_deny`` is returned.
+        """
+        global _debug
+        _debug = logger.isEnabledFor(logging.DEBUG)
+        stack = _context.stack
+        stack.append((obj,))
+        try:
+            node = specialize(self.node, obj)
+        finally:
+            stack.pop()
+        if node is not None:
+            node = simplify(node)
+        if node is None or node.value is False:
+            return always_deny  # skipped predicates deny as well
+        if node.value is True:
+            return always_allow
+        tree = self._combined(node)
+
+        def residual(target=None):
+            stack = _context.stack
+            stack.append((obj, target))
+            try:
+                return tree._apply(obj, target)
+            finally:
+                stack.pop()
+
+        async def aresidual(target=None):
+            stack = _context.stack
+            stack.append((obj, target))
+            try:
+                return await tree._aapply(obj, target)
+            finally:
+                stack.pop()
+
+        return Predicate(
+            aresidual if tree.is_async else residual,
+            name=tree.name,
+            async_safe=tree.async_safe,
+        )
+
+    def compile(self) -> "Predicate":
+        """
+        Returns an equivalent predicate that evaluates the whole tree of
+        combined predicates in a single generated function, instead of
+        going through one closure per ``&``, ``|``, ``^`` and ``~``.
 
-        # short-circuit evaluation
-        if op is operator.and_ and not self_result:
-            return False
-        elif op is operator.or_ and self_result:
-            return True
+        Short-circuiting and skipping of predicates that return ``None``
+        are preserved. Individual predicates are not logged.
+        """
+        from .compiler import compile_predicate
+
+        return compile_predicate(self)
 
-        other_result = other._apply(*args)
-        if other_result is None:
-            return self_result
+    def parallel(self) -> "Predicate":
+        """
+        Returns an equivalent predicate that evaluates the operands of its
+        outermost ``&`` or ``|`` at the same time. See ``rules.parallel``.
+        """
+        from .parallel import parallel
 
-        return op(self_result, other_result)
+        return parallel(self)
 
     def _apply(self, *args) -> Optional[bool]:
         # Internal method that is used to invoke the predicate with the
         # proper number of positional arguments, inside the current
         # invocation context.
+        # NOTE: Unless overridden by a subclass, most predicates use a faster
+        # equivalent that is set up by ``_make_apply()`` and falls back to
+        # this method when predicates are logged or observed.
         if self.var_args:
             callargs = args
         elif self.num_args > len(args):
             callargs = args + (None,) * (self.num_args - len(args))
         else:
             callargs = args[: self.num_args]
+
+        if observers:
+            start = time.perf_counter()
+            result = self._evaluate(callargs)
+            elapsed = time.perf_counter() - start
+            for observer in observers:
+                observer(self, result, elapsed)
+        else:
+            result = self._evaluate(callargs)
+
+        if _debug:
+            logger.debug("  %s = %s", self, "skipped" if result is None else result)
+        return result
+
+    def _apply_many(self, obj: Any, targets: List[Any]) -> List[Optional[bool]]:
+        # Like ``_apply()`` for each of the targets, in a new invocation
+        # context that is shared by all of them.
+        stack = _context.stack
+        context = Context((obj,), _context.get())
+        stack.append(context)
+        try:
+            return self.node.evaluate_many(context, obj, targets)
+        finally:
+            stack.pop()
+
+    def _evaluate(self, callargs: Tuple[Any, ...]) -> Optional[bool]:
+        if _deadlines or self.timeout is not None:
+            start, token = self._enter_deadline()
+            try:
+                result = self._evaluate_now(callargs)
+            finally:
+                if token is not None:
+                    _reset_deadline(token)
+            self._exit_deadline(start)
+            return result
+        return self._evaluate_now(callargs)
+
+    def _evaluate_now(self, callargs: Tuple[Any, ...]) -> Optional[bool]:
+        if self.memoize:
+            context = _context.get()
+            if context is not None:
+                return self._memoized(context.memo, callargs)
+        return self._call(callargs)
+
+    def _call(self, callargs: Tuple[Any, ...]) -> Optional[bool]:
+        if self.is_async:
+            raise TypeError(
+                "The predicate %s must be awaited, use atest() instead." % self
+            )
+        if self.cache_ttl is not None:
+            return result_cache.call(self, callargs, self._call_uncached)
+        return self._call_uncached(callargs)
+
+    def _call_uncached(self, callargs: Tuple[Any, ...]) -> Optional[bool]:
         if self.bind:
             callargs = (self,) + callargs
-
         result = self.fn(*callargs)
-        result = None if result is None else bool(result)
+        return None if result is None else bool(result)
 
-        logger.debug("  %s = %s", self, "skipped" if result is None else result)
+    def _memoized(self, memo: Memo, callargs: Tuple[Any, ...]) -> Optional[bool]:
+        # Combinations are keyed on their tree, which is shared by all the
+        # combinations of the same predicates.
+        key = (self._node or self, callargs)
+        try:
+            result = memo[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable arguments, eg. unsaved model instances
+            return self._call(callargs)
+        else:
+            memo.hits += 1
+            return result
+        memo.misses += 1
+        result = memo[key] = self._call(callargs)
         return result
 
+    async def _aapply(self, *args) -> Optional[bool]:
+        # Like ``_apply()``, awaiting the predicate if it must be awaited.
+        if not self.is_async:
+            if self.async_safe:
+                return self._apply(*args)
+            return await in_thread(self._apply)(*args)
+        if self.var_args:
+            callargs = args
+        elif self.num_args > len(args):
+            callargs = args + (None,) * (self.num_args - len(args))
+        else:
+            callargs = args[: self.num_args]
+
+        if observers:
+            start = time.perf_counter()
+            result = await self._aevaluate(callargs)
+            elapsed = time.perf_counter() - start
+            for observer in observers:
+                observer(self, result, elapsed)
+        else:
+            result = await self._aevaluate(callargs)
+
+        if _debug:
+            logger.debug("  %s = %s", self, "skipped" if result is None else result)
+        return result
+
+    def _enter_deadline(self) -> Tuple[float, Optional[Token]]:
+        # Checks that the deadline hasn't passed before the predicate is
+        # evaluated, and sets the deadline of its own timeout, if any.
+        now = time.monotonic()
+        expires = _deadline.get()
+        if expires is not None and now >= expires:
+            raise DeadlineExceeded(self, now - expires)
+        if self.timeout is None:
+            return now, None
+        return now, _set_deadline(self.timeout)
+
+    def _exit_deadline(self, start: float) -> None:
+        # Checks that neither the deadline nor the timeout of the predicate
+        # passed while it was evaluated, in which case its result is void.
+        now = time.monotonic()
+        expires = _deadline.get()
+        if expires is not None and now > expires:
+            raise DeadlineExceeded(self, now - expires)
+        if self.timeout is not None and now - start > self.timeout:
+            raise DeadlineExceeded(self, now - start - self.timeout)
+
+    async def _aevaluate(self, callargs: Tuple[Any, ...]) -> Optional[bool]:
+        if _deadlines or self.timeout is not None:
+            start, token = self._enter_deadline()
+            try:
+                expires = _deadline.get()
+                if expires is None or self._node is not None:
+                    # combined predicates leave it to their operands
+                    result = await self._aevaluate_now(callargs)
+                else:
+                    result = await asyncio.wait_for(
+                        self._aevaluate_now(callargs), expires - time.monotonic()
+                    )
+            except asyncio.TimeoutError:
+                overrun = time.monotonic() - _deadline.get()  # type: ignore[operator]
+                raise DeadlineExceeded(self, max(overrun, 0.0)) from None
+            finally:
+                if token is not None:
+                    _reset_deadline(token)
+            self._exit_deadline(start)
+            return result
+        return await self._aevaluate_now(callargs)
+
+    async def _aevaluate_now(self, callargs: Tuple[Any, ...]) -> Optional[bool]:
+        if self.memoize:
+            context = _context.get()
+            if context is not None:
+                memo = context.memo
+                key = (self._node or self, callargs)
+                try:
+                    result = memo[key]
+                except KeyError:
+                    pass
+                except TypeError:
+                    return await self._acall(callargs)
+                else:
+                    memo.hits += 1
+                    return result
+                memo.misses += 1
+                result = memo[key] = await self._acall(callargs)
+                return result
+        return await self._acall(callargs)
+
+    async def _acall(self, callargs: Tuple[Any, ...]) -> Optional[bool]:
+        if self.cache_ttl is not None:
+            return await result_cache.acall(self, callargs, self._acall_uncached)
+        return await self._acall_uncached(callargs)
+
+    async def _acall_uncached(self, callargs: Tuple[Any, ...]) -> Optional[bool]:
+        if self.bind:
+            callargs = (self,) + callargs
+        result = await self.fn(*callargs)
+        return None if result is None else bool(result)
+
+
+def _make_apply(pred: Predicate) -> Callable[..., Optional[bool]]:
+    """
+    Returns a function equivalent to ``pred._apply`` that is specialized for
+    the number of arguments the predicate accepts.
+    """
+    fn = pred.fn
+    if pred.bind:
+        fn = partial(fn, pred)
+    apply = Predicate._apply
+
+    if pred.var_args:
+
+        def _apply(*args):
+            if _debug or observers or _deadlines:
+                return apply(pred, *args)
+            result = fn(*args)
+            return None if result is None else True if result else False
+
+    elif pred.num_args <= 0:
+
+        def _apply(*args):
+            if _debug or observers or _deadlines:
+                return apply(pred, *args)
+            result = fn()
+            return None if result is None else True if result else False
+
+    elif pred.num_args == 1:
+
+        def _apply(a=None, *args):
+            if _debug or observers or _deadlines:
+                return apply(pred, a)
+            result = fn(a)
+            return None if result is None else True if result else False
+
+    else:
+
+        def _apply(a=None, b=None, *args):
+            if _debug or observers or _deadlines:
+                return apply(pred, a, b)
+            result = fn(a, b)
+            return None if result is None else True if result else False
+
+    return _apply
+
+
+def test_all(
+    preds: Iterable[Predicate],
+    obj: Any = NO_VALUE,
+    target: Any = NO_VALUE,
+    timeout: Optional[float] = None,
+    until: Optional[bool] = None,
+) -> List[bool]:
+    """
+    Tests each of the given predicates, eg. the rules for all the actions on
+    an object, and returns a list of results in the same order.
+
+    Gives the same results as calling ``test(obj, target)`` on each of them,
+    but they share a single invocation context, so that memoized predicates
+    that several of them are built from are evaluated once. The ``timeout``
+    limits the time all of them may take together. If ``until`` is given,
+    the remaining predicates are not tested once one of them returns it.
+    """
+    global _debug
+    _debug = logger.isEnabledFor(logging.DEBUG)
+    args: Tuple[Any, ...]
+    if target is NO_VALUE:
+        args = () if obj is NO_VALUE else (obj,)
+    elif obj is NO_VALUE:
+        args = (target,)
+    else:
+        args = (obj, target)
+    stack = _task_stack.get() or _context._stack  # ie. _context.stack
+    stack.append(args)
+    token = None if timeout is None else _set_deadline(timeout)
+    try:
+        results = []
+        for pred in preds:
+            if _debug:
+                logger.debug("Testing %s", pred)
+            try:
+                result = True if pred._apply(*args) else False
+            except DeadlineExceeded as exc:
+                if len(stack) > 1:
+                    raise  # the outermost test decides
+                result = _timed_out(pred, exc)
+            results.append(result)
+            if result is until:
+                break
+        return results
+    finally:
+        if token is not None:
+            _reset_deadline(token)
+        context = stack.pop()
+        if _debug and type(context) is Context and context._memo is not None:
+            logger.debug(
+                "Memo hits: %d, misses: %d",
+                context._memo.hits,
+                context._memo.misses,
+            )
+
+
+async def atest_all(
+    preds: Iterable[Predicate],
+    obj: Any = NO_VALUE,
+    target: Any = NO_VALUE,
+    timeout: Optional[float] = None,
+    until: Optional[bool] = None,
+) -> List[bool]:
+    """
+    Like ``test_all()``, awaiting the predicates that combine ``async def``
+    predicates in turn. If none of them needs awaiting, they are all tested
+    with ``test_all()``, in a single thread unless they are ``async_safe``.
+    """
+    preds = list(preds)
+    if not any(pred.is_async for pred in preds):
+        if all(pred.async_safe for pred in preds):
+            return test_all(preds, obj, target, timeout, until)
+        return await in_thread(test_all)(preds, obj, target, timeout, until)
+    global _debug
+    _debug = logger.isEnabledFor(logging.DEBUG)
+    args: Tuple[Any, ...]
+    if target is NO_VALUE:
+        args = () if obj is NO_VALUE else (obj,)
+    elif obj is NO_VALUE:
+        args = (target,)
+    else:
+        args = (obj, target)
+    # as in ``atest()``, the current task gets a stack of its own
+    parent = _context.get()
+    token = _task_stack.set([args] if parent is None else [parent, args])
+    deadline = None if timeout is None else _set_deadline(timeout)
+    try:
+        results = []
+        for pred in preds:
+            if _debug:
+                logger.debug("Testing %s", pred)
+            try:
+                result = True if await pred._aapply(*args) else False
+            except DeadlineExceeded as exc:
+                if parent is not None:
+                    raise  # the outermost test decides
+                result = _timed_out(pred, exc)
+            results.append(result)
+            if result is until:
+                break
+        return results
+    finally:
+        if deadline is not None:
+            _reset_deadline(deadline)
+        _task_stack.reset(token)
+
 
 def predicate(fn=None, name=None, **options):
     """
@@ -272,18 +1645,31 @@ def predicate(fn=None, name=None, **options):
 
 # Predefined predicates
 
-always_true = predicate(lambda: True, name="always_true")
-always_false = predicate(lambda: False, name="always_false")
+always_true = predicate(
+    lambda: True, name="always_true", pure=True, cost=0, async_safe=True
+)
+always_false = predicate(
+    lambda: False, name="always_false", pure=True, cost=0, async_safe=True
+)
+
+always_allow = predicate(
+    lambda: True, name="always_allow", pure=True, cost=0, async_safe=True
+)
+always_deny = predicate(
+    lambda: False, name="always_deny", pure=True, cost=0, async_safe=True
+)
 
-always_allow = predicate(lambda: True, name="always_allow")
-always_deny = predicate(lambda: False, name="always_deny")
+always_true.constant = always_allow.constant = True
+always_false.constant = always_deny.constant = False
+
+CONSTANTS = {True: Leaf(always_true), False: Leaf(always_false)}
 
 
 def is_bool_like(obj) -> bool:
     return hasattr(obj, "__bool__") or hasattr(obj, "__nonzero__")
 
 
-@predicate
+@predicate(pure=True, async_safe=True)
 def is_authenticated(user) -> bool:
     if not hasattr(user, "is_authenticated"):
         return False  # not a user model
@@ -293,43 +1679,52 @@ def is_authenticated(user) -> bool:
     return user.is_authenticated
 
 
-@predicate
+@predicate(pure=True, async_safe=True)
 def is_superuser(user) -> bool:
     if not hasattr(user, "is_superuser"):
         return False  # swapped user model, doesn't support is_superuser
     return user.is_superuser
 
 
-@predicate
+@predicate(pure=True, async_safe=True)
 def is_staff(user) -> bool:
     if not hasattr(user, "is_staff"):
         return False  # swapped user model, doesn't support is_staff
     return user.is_staff
 
 
-@predicate
+@predicate(pure=True, async_safe=True)
 def is_active(user) -> bool:
     if not hasattr(user, "is_active"):
         return False  # swapped user model, doesn't support is_active
     return user.is_active
 
 
-def is_group_member(*groups) -> Callable[..., Any]:
+def is_group_member(*groups, mode: str = "all") -> Callable[..., Any]:
     assert len(groups) > 0, "You must provide at least one group name"
+    assert mode in ("all", "any"), "The mode must be either 'all' or 'any'"
 
     if len(groups) > 3:
         g = groups[:3] + ("...",)
     else:
         g = groups
 
-    name = "is_group_member:%s" % ",".join(g)
+    if mode == "all":
+        name = "is_group_member:%s" % ",".join(g)
+    else:
+        name = "is_group_member:any:%s" % ",".join(g)
+
+    required = frozenset(groups)
 
-    @predicate(name)
+    # not ``async_safe``, since the group names may have to be queried, which
+    # ``atest()`` then does in a thread
+    @predicate(name, pure=True)
     def fn(user) -> bool:
         if not hasattr(user, "groups"):
             return False  # swapped user model, doesn't support groups
-        if not hasattr(user, "_group_names_cache"):  # pragma: no cover
-            user._group_names_cache = set(user.groups.values_list("name", flat=True))
-        return set(groups).issubset(user._group_names_cache)
+        names = get_group_names(user)
+        if mode == "all":
+            return required <= names
+        return not required.isdisjoint(names)
 
     return fn
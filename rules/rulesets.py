@@ -1,17 +1,109 @@
-from .predicates import predicate
+import threading
+from bisect import bisect_left
+from types import MappingProxyType
+
+from .predicates import predicate, test_all
 
 
 class RuleSet(dict):
+    """
+    A dict of predicates, keyed on the name of the rule they decide.
+
+    Changes to a rule set are serialized by a lock, and each of them bumps
+    ``version``, eg. so that anything derived from the rules can tell that
+    they changed. Rules are tested against ``snapshot``, an immutable copy
+    of the rule set that is taken the first time it's needed after a
+    change, so that testing rules needs no lock and never sees a rule set
+    that is being changed by another thread.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(RuleSet, self).__init__()
+        self._lock = threading.RLock()
+        self._snapshot = None
+        # the sorted names of the rules in a snapshot, see ``rule_names()``
+        self._index = None
+        self.version = 0
+        # whether rules are compiled as they are set, see ``compile()``
+        self.compiled = False
+        self.update(*args, **kwargs)
+
+    @property
+    def snapshot(self):
+        """
+        An immutable mapping of the rules as they currently are, which is
+        replaced, rather than changed, when the rule set changes.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None:
+                    snapshot = self._snapshot = MappingProxyType(dict(self))
+        return snapshot
+
+    def _changed(self):
+        # Must be called with the lock held.
+        self.version += 1
+        self._snapshot = None
+
     def test_rule(self, name, *args, **kwargs):
-        return name in self and self[name].test(*args, **kwargs)
+        pred = self.snapshot.get(name)
+        return pred is not None and pred.test(*args, **kwargs)
+
+    async def atest_rule(self, name, *args, **kwargs):
+        pred = self.snapshot.get(name)
+        return pred is not None and await pred.atest(*args, **kwargs)
+
+    def test_rules(self, names, *args, **kwargs):
+        """
+        Tests each of the named rules with the same arguments, evaluating
+        predicates that several of them share once if memoized, and returns
+        the results keyed on the names of the rules.
+        """
+        rules = self.snapshot
+        names = list(names)
+        preds = [rules[name] for name in names if name in rules]
+        results = iter(test_all(preds, *args, **kwargs))
+        return {name: name in rules and next(results) for name in names}
+
+    def rule_names(self, prefix=""):
+        """
+        Returns the names of the rules that start with the given prefix, eg.
+        an app label followed by a dot, in order.
+        """
+        rules = self.snapshot
+        index = self._index
+        if index is None or index[0] is not rules:
+            index = self._index = (rules, sorted(rules))
+        names = index[1]
+        start = end = bisect_left(names, prefix)
+        while end < len(names) and names[end].startswith(prefix):
+            end += 1
+        return names[start:end]
+
+    def test_rule_many(self, name, obj, targets):
+        pred = self.snapshot.get(name)
+        if pred is None:
+            return [False for target in targets]
+        return pred.test_many(obj, targets)
+
+    def filter_queryset(self, name, user, queryset, fallback=False):
+        pred = self.snapshot.get(name)
+        if pred is None:
+            return queryset.none()
+        from .contrib.queryset import filter_queryset
+
+        return filter_queryset(pred, user, queryset, fallback=fallback)
 
     def rule_exists(self, name):
         return name in self
 
     def add_rule(self, name, pred):
-        if name in self:
-            raise KeyError("A rule with name `%s` already exists" % name)
-        self[name] = pred
+        with self._lock:
+            if name in self:
+                raise KeyError("A rule with name `%s` already exists" % name)
+            self[name] = pred
 
     def set_rule(self, name, pred):
         self[name] = pred
@@ -19,9 +111,65 @@ class RuleSet(dict):
     def remove_rule(self, name):
         del self[name]
 
+    def compile(self):
+        """
+        Replaces every rule with its compiled equivalent, and compiles rules
+        that are set from now on as well.
+        """
+        with self._lock:
+            for name, pred in list(self.items()):
+                super(RuleSet, self).__setitem__(name, pred.compile())
+            self.compiled = True
+            self._changed()
+
     def __setitem__(self, name, pred):
-        fn = predicate(pred)
-        super(RuleSet, self).__setitem__(name, fn)
+        fn = predicate(pred).simplify()
+        if self.compiled:
+            fn = fn.compile()
+        with self._lock:
+            super(RuleSet, self).__setitem__(name, fn)
+            self._changed()
+
+    def __delitem__(self, name):
+        with self._lock:
+            super(RuleSet, self).__delitem__(name)
+            self._changed()
+
+    def pop(self, name, *default):
+        with self._lock:
+            pred = super(RuleSet, self).pop(name, *default)
+            self._changed()
+            return pred
+
+    def popitem(self):
+        with self._lock:
+            item = super(RuleSet, self).popitem()
+            self._changed()
+            return item
+
+    def clear(self):
+        with self._lock:
+            super(RuleSet, self).clear()
+            self._changed()
+
+    def setdefault(self, name, pred=None):
+        with self._lock:
+            if name not in self:
+                self[name] = pred
+            return self[name]
+
+    def update(self, *args, **kwargs):
+        with self._lock:
+            for name, pred in dict(*args, **kwargs).items():
+                self[name] = pred
+
+    def __ior__(self, other):  # type: ignore[misc]
+        self.update(other)
+        return self
+
+    def __reduce__(self):
+        # the lock can't be copied
+        return (type(self), (dict(self),))
 
 
 # Shared rule set
@@ -47,3 +195,15 @@ def rule_exists(name):
 
 def test_rule(name, *args, **kwargs):
     return default_rules.test_rule(name, *args, **kwargs)
+
+
+async def atest_rule(name, *args, **kwargs):
+    return await default_rules.atest_rule(name, *args, **kwargs)
+
+
+def test_rules(names, *args, **kwargs):
+    return default_rules.test_rules(names, *args, **kwargs)
+
+
+def test_rule_many(name, obj, targets):
+    return default_rules.test_rule_many(name, obj, targets)
@@ -0,0 +1,140 @@
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+from .predicates import Predicate, observers
+
+# Upper bounds of the latency histogram buckets, in seconds.
+DEFAULT_BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0)
+
+
+class PredicateStats(object):
+    """
+    The number of times a predicate was evaluated, by result, and a histogram
+    of how long it took.
+    """
+
+    __slots__ = ("true", "false", "skipped", "elapsed", "buckets")
+
+    def __init__(self, num_buckets: int) -> None:
+        self.true = 0
+        self.false = 0
+        self.skipped = 0
+        self.elapsed = 0.0
+        # the last bucket counts calls that took longer than any bound
+        self.buckets = [0] * (num_buckets + 1)
+
+
+class StatsCollector(object):
+    """
+    Records how often each predicate is evaluated, what it returns and how
+    long it takes, keyed on the name of the predicate. Combined predicates
+    are recorded as well, so that the rules themselves show up under their
+    own names.
+
+    Nothing is recorded until ``start()`` is called. While started, every
+    predicate is evaluated through the slower, instrumented code path.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.bounds = tuple(sorted(buckets))
+        self.stats: Dict[str, PredicateStats] = {}
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        if self.observe not in observers:
+            observers.append(self.observe)
+
+    def stop(self) -> None:
+        if self.observe in observers:
+            observers.remove(self.observe)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stats.clear()
+
+    def observe(self, pred: Predicate, result: Optional[bool], elapsed: float) -> None:
+        bucket = bisect_left(self.bounds, elapsed)
+        with self.lock:
+            stats = self.stats.get(pred.name)
+            if stats is None:
+                stats = self.stats[pred.name] = PredicateStats(len(self.bounds))
+            if result is None:
+                stats.skipped += 1
+            elif result:
+                stats.true += 1
+            else:
+                stats.false += 1
+            stats.elapsed += elapsed
+            stats.buckets[bucket] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns a copy of the recorded statistics, keyed on predicate name.
+        Histogram buckets are keyed on their upper bound and are cumulative,
+        as in Prometheus, so the ``inf`` bucket counts all calls.
+        """
+        with self.lock:
+            items = [
+                (name, s.true, s.false, s.skipped, s.elapsed, list(s.buckets))
+                for name, s in self.stats.items()
+            ]
+        snapshot = {}
+        for name, true, false, skipped, elapsed, buckets in items:
+            cumulative: List[int] = []
+            for count in buckets:
+                cumulative.append(count + (cumulative[-1] if cumulative else 0))
+            snapshot[name] = {
+                "calls": true + false + skipped,
+                "true": true,
+                "false": false,
+                "skipped": skipped,
+                "elapsed": elapsed,
+                "buckets": dict(zip(self.bounds + (float("inf"),), cumulative)),
+            }
+        return snapshot
+
+    def prometheus(self, prefix: str = "rules_predicate") -> str:
+        """
+        Returns the recorded statistics in the Prometheus text format.
+        """
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP %s_calls_total Number of times a predicate was evaluated." % prefix,
+            "# TYPE %s_calls_total counter" % prefix,
+        ]
+        for name, stats in sorted(snapshot.items()):
+            for result in ("true", "false", "skipped"):
+                lines.append(
+                    '%s_calls_total{predicate="%s",result="%s"} %d'
+                    % (prefix, escape(name), result, stats[result])
+                )
+        lines += [
+            "# HELP %s_duration_seconds Time spent evaluating a predicate." % prefix,
+            "# TYPE %s_duration_seconds histogram" % prefix,
+        ]
+        for name, stats in sorted(snapshot.items()):
+            label = escape(name)
+            for bound, count in stats["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    '%s_duration_seconds_bucket{predicate="%s",le="%s"} %d'
+                    % (prefix, label, le, count)
+                )
+            lines.append(
+                '%s_duration_seconds_sum{predicate="%s"} %r'
+                % (prefix, label, stats["elapsed"])
+            )
+            lines.append(
+                '%s_duration_seconds_count{predicate="%s"} %d'
+                % (prefix, label, stats["calls"])
+            )
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Shared collector, eg. for ``rules.contrib.views.predicate_stats``.
+collector = StatsCollector()
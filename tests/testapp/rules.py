@@ -1,11 +1,13 @@
 from __future__ import absolute_import
 
+from django.db.models import Q
+
 import rules
 
 # Predicates
 
 
-@rules.predicate
+@rules.predicate(q=lambda user: Q(author=user))
 def is_book_author(user, book):
     if not book:
         return False
@@ -0,0 +1,228 @@
+import asyncio
+from functools import partial
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import TestCase
+
+from testapp.models import Book
+
+from rules.cache import default_key, result_cache
+from rules.predicates import Predicate, always_false, always_true, predicate
+
+from . import TestData
+
+
+def counting(results, **options):
+    # A predicate that counts its calls and whose results are set in
+    # ``results``, keyed on the title of the book.
+    calls = []
+
+    def fn(user, book):
+        calls.append((user, book))
+        return results.get(book.title if book else None)
+
+    return predicate(fn, name="counting%d" % id(calls), **options), calls
+
+
+class ResultCacheTests(TestData, TestCase):
+    alias = None
+
+    def setUp(self):
+        result_cache.configure(self.alias, maxsize=100)
+        self.addCleanup(result_cache.configure)
+        self.adrian = User.objects.get(username="adrian")
+        self.martin = User.objects.get(username="martin")
+        self.book = Book.objects.get()
+
+    def test_cached(self):
+        pred, calls = counting({self.book.title: True}, cache=60)
+        for _ in range(3):
+            assert pred.test(self.adrian, self.book)
+            assert pred.test(self.martin, self.book)
+            assert pred.test(self.martin) is False  # skipped
+        assert len(calls) == 3
+        stats = result_cache.stats()
+        assert stats["size"] == 3
+        assert (stats["hits"], stats["misses"]) == (6, 3)
+
+        # a fresh instance of the same objects
+        assert pred.test(User.objects.get(pk=self.adrian.pk), Book.objects.get())
+        assert len(calls) == 3
+
+    def test_combined(self):
+        pred, calls = counting({self.book.title: False}, cache=60)
+        rule = (pred | pred) & pred
+        assert not rule.test(self.adrian, self.book)
+        assert not rule.compile().test(self.adrian, self.book)
+        assert len(calls) == 1
+
+    def test_combined_cached(self):
+        pred, calls = counting({self.book.title: True})
+        cached = Predicate(pred & ~always_false, cache=60)
+        rule = cached & always_true
+        for _ in range(3):
+            assert rule.test(self.adrian, self.book)
+            assert rule.compile().test(self.adrian, self.book)
+        assert len(calls) == 1
+
+    def test_invalidate(self):
+        pred, calls = counting({self.book.title: True}, cache=60)
+        other, other_calls = counting({self.book.title: True}, cache=60)
+
+        def test_all():
+            for p in (pred, other):
+                for user in (self.adrian, self.martin):
+                    p.test(user, self.book)
+
+        test_all()
+        assert (len(calls), len(other_calls)) == (2, 2)
+
+        pred.invalidate()
+        test_all()
+        assert (len(calls), len(other_calls)) == (4, 2)
+
+        result_cache.invalidate(user=self.martin)
+        test_all()
+        assert (len(calls), len(other_calls)) == (5, 3)
+
+        pred.invalidate(self.adrian)
+        test_all()
+        assert (len(calls), len(other_calls)) == (6, 3)
+
+        result_cache.invalidate()
+        test_all()
+        assert (len(calls), len(other_calls)) == (8, 5)
+
+    def test_expired(self):
+        pred, calls = counting({}, cache=0)
+        pred.test(self.adrian, self.book)
+        pred.test(self.adrian, self.book)
+        assert len(calls) == 2
+        assert result_cache.stats()["expirations"] >= 1
+
+    def test_not_keyed(self):
+        pred, calls = counting({}, cache=60)
+        unsaved = User(username="unsaved")
+        pred.test(unsaved, self.book)
+        pred.test(unsaved, self.book)
+        pred.test(object(), None)
+        assert len(calls) == 3
+        assert result_cache.stats()["size"] == 0
+
+        pred.test(AnonymousUser(), self.book)
+        pred.test(AnonymousUser(), self.book)
+        assert len(calls) == 4
+
+    def test_custom_key(self):
+        pred, calls = counting({}, cache=60, key=lambda user, book: user.username)
+        pred.test(self.adrian, self.book)
+        pred.test(self.adrian, None)
+        pred.test(User(username="adrian"), None)
+        assert len(calls) == 1
+
+        with self.assertRaises(AssertionError):
+            predicate(lambda user: True, key=lambda user: user.pk)
+
+    def test_identity(self):
+        pred, _ = counting({}, cache=60)
+        assert pred.cache_id == (
+            "testsuite.contrib.test_cache.counting.<locals>.fn:%s" % pred.name
+        )
+        is_member = predicate(lambda user: True, cache=60)
+        with self.assertRaises(ValueError):
+            predicate(lambda user: False, cache=60)
+        is_premium = predicate(lambda user: False, name="is_premium", cache=60)
+        assert is_member.cache_id != is_premium.cache_id
+
+        def is_tenant(tenant, user):
+            return user.username.startswith(tenant)
+
+        def make(tenant):
+            return lambda user: user.username.startswith(tenant)
+
+        # the functions of factories are told apart by name only
+        with self.assertRaises(ValueError):
+            predicate(make("a"), cache=60)
+        is_a = predicate(make("a"), name="is_tenant_a", cache=60)
+        with self.assertRaises(ValueError):
+            predicate(make("b"), name="is_tenant_a", cache=60)
+        assert predicate(is_a.fn, name="is_tenant_a", cache=60).cache_id == (
+            is_a.cache_id
+        )
+        with self.assertRaises(ValueError):
+            predicate(partial(is_tenant, "b"), cache=60)
+        is_b = predicate(partial(is_tenant, "b"), name="is_tenant_b", cache=60)
+        assert is_b.cache_id.endswith("is_tenant:is_tenant_b")
+
+    def test_async(self):
+        calls = []
+
+        @predicate(name="is_author", cache=60)
+        async def is_author(user, book):
+            calls.append(user)
+            await asyncio.sleep(0)
+            return book.author_id == user.pk
+
+        for _ in range(2):
+            assert asyncio.run(is_author.atest(self.adrian, self.book))
+            assert not asyncio.run(is_author.atest(self.martin, self.book))
+        assert len(calls) == 2
+
+    def test_default_key(self):
+        assert default_key(self.adrian) == "auth.user:%d" % self.adrian.pk
+        assert default_key(AnonymousUser()) == "anonymous"
+        for value in (None, 1, 1.5, "a"):
+            assert default_key(value) == value
+        for value in (User(), object(), [1]):
+            with self.assertRaises(TypeError):
+                default_key(value)
+
+
+class DjangoResultCacheTests(ResultCacheTests):
+    alias = "default"
+
+    def setUp(self):
+        super(DjangoResultCacheTests, self).setUp()
+        result_cache.backend().clear()
+
+    def test_shared(self):
+        pred, calls = counting({self.book.title: True}, cache=60)
+        assert pred.test(self.adrian, self.book)
+        # as if in another process
+        result_cache.entries.clear()
+        assert pred.test(self.adrian, self.book)
+        assert len(calls) == 1
+
+        pred.invalidate(self.adrian)
+        result_cache.entries.clear()
+        assert pred.test(self.adrian, self.book)
+        assert len(calls) == 2
+
+    def test_shared_identity(self):
+        is_member = predicate(lambda user: True, name="is_member", cache=60)
+        is_premium = predicate(lambda user: False, name="is_premium", cache=60)
+        assert is_member.test(self.adrian)
+        result_cache.entries.clear()
+        assert not is_premium.test(self.adrian)
+        is_member.invalidate()
+        result_cache.entries.clear()
+        assert not is_premium.test(self.adrian)
+        assert result_cache.stats()["hits"] == 1
+
+
+class ResultCacheSizeTests(TestData, TestCase):
+    def test_maxsize(self):
+        result_cache.configure(maxsize=2)
+        self.addCleanup(result_cache.configure)
+        pred, calls = counting({}, cache=60)
+        User.objects.create_user("jacob")
+        a, b, c = User.objects.order_by("pk")
+        for user in (a, b, c, c, a):
+            pred.test(user)
+        assert len(calls) == 4
+        stats = result_cache.stats()
+        assert (stats["size"], stats["evictions"]) == (2, 2)
+        assert list(result_cache.entries) == [
+            (pred, (default_key(c), None)),
+            (pred, (default_key(a), None)),
+        ]
@@ -0,0 +1,133 @@
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+
+from rules.groups import get_group_names, group_names_cache, prefetch_group_names
+from rules.predicates import is_group_member
+
+from . import TestData
+
+
+class GroupNamesCacheTests(TestData, TestCase):
+    setting = True
+
+    def setUp(self):
+        group_names_cache.configure(self.setting)
+
+    def tearDown(self):
+        group_names_cache.configure(None)
+
+    def get_group_names(self, username, num_queries):
+        with self.assertNumQueries(num_queries):
+            return get_group_names(User.objects.only("pk").get(username=username))
+
+    def test_cached(self):
+        assert self.get_group_names("martin", 2) == frozenset(["editors"])
+        assert self.get_group_names("martin", 1) == frozenset(["editors"])
+        assert self.get_group_names("adrian", 2) == frozenset()
+        assert self.get_group_names("adrian", 1) == frozenset()
+
+        martin = User.objects.get(username="martin")
+        with self.assertNumQueries(0):
+            assert is_group_member("editors").test(martin)
+            assert is_group_member("editors", "staff", mode="any").test(martin)
+
+    def test_timeout(self):
+        group_names_cache.configure(self.setting, timeout=0)
+        assert self.get_group_names("martin", 2) == frozenset(["editors"])
+        assert self.get_group_names("martin", 2) == frozenset(["editors"])
+        group_names_cache.configure(self.setting, timeout=None)
+        assert self.get_group_names("martin", 2) == frozenset(["editors"])
+        assert self.get_group_names("martin", 1) == frozenset(["editors"])
+
+    def test_user_groups_changed(self):
+        martin = User.objects.get(username="martin")
+        staff = Group.objects.create(name="staff")
+        assert self.get_group_names("martin", 2) == frozenset(["editors"])
+
+        assert not is_group_member("staff").test(martin)
+        martin.groups.add(staff)
+        assert is_group_member("staff").test(martin)
+        assert self.get_group_names("martin", 1) == frozenset(["editors", "staff"])
+
+        martin.groups.remove(staff)
+        assert self.get_group_names("martin", 2) == frozenset(["editors"])
+
+        staff.user_set.add(martin)
+        assert self.get_group_names("martin", 2) == frozenset(["editors", "staff"])
+
+        staff.user_set.clear()
+        assert self.get_group_names("martin", 2) == frozenset(["editors"])
+
+        martin.groups.clear()
+        assert self.get_group_names("martin", 2) == frozenset()
+
+    def test_group_changed(self):
+        assert self.get_group_names("martin", 2) == frozenset(["editors"])
+        Group.objects.create(name="staff")
+        assert self.get_group_names("martin", 1) == frozenset(["editors"])
+
+        editors = Group.objects.get(name="editors")
+        editors.name = "writers"
+        editors.save()
+        assert self.get_group_names("martin", 2) == frozenset(["writers"])
+
+        editors.delete()
+        assert self.get_group_names("martin", 2) == frozenset()
+
+
+class DjangoGroupNamesCacheTests(GroupNamesCacheTests):
+    setting = "default"
+
+    def setUp(self):
+        super(DjangoGroupNamesCacheTests, self).setUp()
+        group_names_cache.backend().clear()
+
+
+class DisabledGroupNamesCacheTests(TestData, TestCase):
+    def test_disabled(self):
+        for _ in range(2):
+            with self.assertNumQueries(2):
+                get_group_names(User.objects.only("pk").get(username="martin"))
+
+    def test_maxsize(self):
+        maxsize = group_names_cache.maxsize
+        group_names_cache.configure(True)
+        group_names_cache.maxsize = 1
+        try:
+            for username in ("martin", "adrian"):
+                get_group_names(User.objects.get(username=username))
+            assert list(group_names_cache.names) == [
+                User.objects.get(username="adrian").pk
+            ]
+        finally:
+            group_names_cache.maxsize = maxsize
+            group_names_cache.configure(None)
+
+
+class PrefetchGroupNamesTests(TestData, TestCase):
+    def test_prefetch(self):
+        staff = Group.objects.create(name="staff")
+        for i in range(10):
+            User.objects.create_user("user%d" % i).groups.add(staff)
+        users = list(User.objects.order_by("pk"))
+        with self.assertNumQueries(1):
+            prefetch_group_names(users)
+        with self.assertNumQueries(0):
+            prefetch_group_names(users)
+            decisions = [is_group_member("staff").test(user) for user in users]
+            assert decisions == [user.username.startswith("user") for user in users]
+            assert get_group_names(users[1]) == frozenset(["editors"])  # martin
+
+    def test_cached(self):
+        group_names_cache.configure(True)
+        try:
+            prefetch_group_names(User.objects.all())
+            with self.assertNumQueries(1):
+                martin = User.objects.get(username="martin")
+                assert get_group_names(martin) == frozenset(["editors"])
+        finally:
+            group_names_cache.configure(None)
+
+    def test_unsaved(self):
+        with self.assertNumQueries(0):
+            prefetch_group_names([User(username="unsaved"), object()])
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from asgiref.sync import async_to_sync
+
+from rules.contrib.middleware import PermissionCacheMiddleware
+from rules.permissions import get_permission_cache, permission_cache_stats
+
+from . import TestData
+
+
+class PermissionCacheMiddlewareTests(SimpleTestCase):
+    def test_sync(self):
+        caches = []
+
+        def view(request):
+            caches.append(get_permission_cache())
+            return HttpResponse("OK")
+
+        middleware = PermissionCacheMiddleware(view)
+        request = RequestFactory().get("/")
+        assert middleware(request).status_code == 200
+        assert middleware(request).status_code == 200
+        assert caches[0] is not None and caches[1] is not None
+        assert caches[0] is not caches[1]
+        assert get_permission_cache() is None
+
+    def test_async(self):
+        caches = []
+
+        async def view(request):
+            caches.append(get_permission_cache())
+            return HttpResponse("OK")
+
+        middleware = PermissionCacheMiddleware(view)
+        request = RequestFactory().get("/")
+        assert async_to_sync(middleware)(request).status_code == 200
+        assert caches[0] is not None
+        assert get_permission_cache() is None
+
+
+@override_settings(
+    MIDDLEWARE=settings.MIDDLEWARE
+    + ["rules.contrib.middleware.PermissionCacheMiddleware"]
+)
+class PermissionCacheMiddlewareRequestTests(TestData, TestCase):
+    def test_request(self):
+        self.assertTrue(self.client.login(username="martin", password="secr3t"))
+        misses = permission_cache_stats["misses"]
+        response = self.client.get(reverse("change_book", args=(1,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(permission_cache_stats["misses"], misses + 1)
+        assert get_permission_cache() is None
@@ -1,9 +1,27 @@
 from __future__ import absolute_import
 
+from unittest import mock
+
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Permission, User
 from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from testapp.models import Book
 
 import rules
+import rules.permissions
+from rules.contrib.models import RulesPermissionsMixin
+
+from . import TestData
+
+
+class RulesUser(RulesPermissionsMixin, User):
+    class Meta:
+        app_label = "testapp"
+        proxy = True
 
 
 class RulesModelTests(TestCase):
@@ -20,3 +38,102 @@ class RulesModelTests(TestCase):
                 class Meta:
                     app_label = "testapp"
                     rules_permissions = "invalid"
+
+
+class RulesPermissionsMixinTests(TestData, TestCase):
+    def test_has_perms(self):
+        book = Book.objects.get()
+        other = Book.objects.create(
+            isbn="other",
+            title="Another Book",
+            author=User.objects.get(username="martin"),
+        )
+        martin = RulesUser.objects.get(username="martin")
+        perm_lists = (
+            [],
+            ["testapp.change_book"],
+            ["testapp.change_book", "testapp.delete_book"],
+            ["testapp.delete_book", "testapp.change_book"],
+            ["testapp.change_book", "testapp.view_book"],
+        )
+        for obj in (None, book, other):
+            for perms in perm_lists:
+                self.assertEqual(
+                    martin.has_perms(perms, obj),
+                    User.has_perms(martin, perms, obj),
+                )
+
+        # granted by the database, but not by the rules
+        martin.user_permissions.add(Permission.objects.get(codename="delete_book"))
+        martin = RulesUser.objects.get(username="martin")
+        assert martin.has_perms(["testapp.change_book", "testapp.delete_book"])
+        assert not martin.has_perms(["testapp.delete_book"], book)
+
+        # other backends aren't asked when the rules grant everything
+        with mock.patch.object(
+            ModelBackend, "has_perm", return_value=False
+        ) as has_perm:
+            assert martin.has_perms(["testapp.change_book"], book)
+            assert martin.has_perms(
+                ["testapp.change_book", "testapp.delete_book"], other
+            )
+            assert not martin.has_perms(["testapp.delete_book"], book)
+            assert has_perm.call_count == 1
+
+        adrian = RulesUser.objects.get(username="adrian")  # a superuser
+        assert adrian.has_perms(["testapp.nonexistent"], book)
+
+        # like Django, a single permission isn't taken for a list
+        for user in (martin, adrian):
+            for perm_list in ("testapp.change_book", None):
+                with self.assertRaises(ValueError):
+                    user.has_perms(perm_list)
+
+    def test_no_rules_backend(self):
+        martin = RulesUser.objects.get(username="martin")
+        martin.user_permissions.add(Permission.objects.get(codename="delete_book"))
+        martin = RulesUser.objects.get(username="martin")
+        with self.settings(
+            AUTHENTICATION_BACKENDS=["django.contrib.auth.backends.ModelBackend"]
+        ):
+            assert martin.has_perms(["testapp.delete_book"])
+            assert not martin.has_perms(["testapp.change_book"])
+
+    def test_module_perms(self):
+        martin = User.objects.get(username="martin")
+        assert not martin.has_module_perms("testapp")
+        book = Book.objects.get()
+        assert martin.get_all_permissions(book) == set()
+        with mock.patch.object(rules.permissions, "any_module_perm", True):
+            assert martin.has_module_perms("testapp")  # an editor
+            assert not martin.has_module_perms("auth")
+            assert {"testapp.change_book", "testapp.add_testmodel"} <= (
+                martin.get_all_permissions(book)
+            )
+            assert "testapp.delete_book" not in martin.get_all_permissions(book)
+
+    def test_authoritative(self):
+        martin = User.objects.get(username="martin")
+        martin.user_permissions.add(
+            Permission.objects.get(codename="delete_book"),
+            Permission.objects.get(codename="view_user"),
+        )
+        book = Book.objects.get()
+        perms = ["testapp.change_book", "testapp.delete_book"]
+        assert RulesUser.objects.get(username="martin").has_perms(perms)
+
+        with mock.patch.object(rules.permissions, "authoritative", True):
+            martin = RulesUser.objects.get(username="martin")
+            with CaptureQueriesContext(connection) as queries:
+                assert not martin.has_perm("testapp.delete_book")
+                assert not martin.has_perms(perms)
+                assert not User.has_perms(martin, perms)
+                assert martin.has_perm("testapp.change_book", book)
+            # only those of the rules, not those of ModelBackend
+            assert not [q for q in queries if "auth_permission" in q["sql"]]
+            # not a rule
+            assert martin.has_perm("auth.view_user")
+            assert martin.has_perms(["testapp.change_book", "auth.view_user"])
+            # still a superuser
+            adrian = RulesUser.objects.get(username="adrian")
+            assert adrian.has_perms(perms, book)
@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.db import close_old_connections
+from django.test import TransactionTestCase
+
+from testapp.models import Book
+
+import rules.parallel
+from rules.predicates import is_group_member, predicate
+
+from . import ISBN
+
+
+@predicate
+def is_book_author(user, book):
+    return Book.objects.filter(pk=book.pk, author=user).exists()
+
+
+@predicate
+def has_books(user):
+    return Book.objects.filter(author=user).exists()
+
+
+class ParallelQueryTests(TransactionTestCase):
+    # operands run in other threads, which can only see committed data
+
+    def setUp(self):
+        adrian = User.objects.create_user("adrian")
+        martin = User.objects.create_user("martin")
+        martin.groups.add(Group.objects.create(name="editors"))
+        Book.objects.create(isbn=ISBN, title="Guide", author=adrian)
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        patcher = mock.patch.object(rules.parallel, "executor", executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_queries(self):
+        threads = []
+
+        def close():
+            threads.append(threading.get_ident())
+            close_old_connections()
+
+        pred = (has_books | is_group_member("editors") | is_book_author).parallel()
+        jacob = User.objects.create_user("jacob")
+        book = Book.objects.get()
+        with mock.patch("django.db.close_old_connections", close):
+            assert not pred.test(jacob, book)
+        # the connections of the worker thread are closed after each operand
+        assert len(threads) == 2
+        assert threading.get_ident() not in threads
+        assert pred.test(User.objects.get(username="adrian"), book)
+        assert pred.test(User.objects.get(username="martin"), book)
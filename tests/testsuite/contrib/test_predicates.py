@@ -1,6 +1,12 @@
+from unittest import mock
+
 from django.contrib.auth.models import User
 from django.test import TestCase
 
+from testapp.models import Book
+
+import rules.permissions
+from rules.permissions import ObjectPermissionBackend
 from rules.predicates import (
     is_active,
     is_authenticated,
@@ -48,3 +54,23 @@ class PredicateTests(TestData, TestCase):
         p = is_group_member("editors", "staff")
         assert not p(User.objects.get(username="martin"))
         assert not p(SwappedUser())
+
+        p = is_group_member("editors", "staff", mode="any")
+        assert p.name == "is_group_member:any:editors,staff"
+        assert p(User.objects.get(username="martin"))
+        assert not p(User.objects.get(username="adrian"))
+        assert not p(SwappedUser())
+
+    async def test_atest(self):
+        # sync predicates that query the database, for the groups of the user
+        # and the author of the book, are tested in a thread
+        martin = await User.objects.aget(username="martin")
+        book = await Book.objects.aget()
+        assert await is_group_member("editors").atest(martin)
+        assert not await (is_group_member("staff") & is_staff).atest(martin)
+        assert await martin.ahas_perm("testapp.change_book", book)
+        assert not await martin.ahas_perm("testapp.delete_book", book)
+        backend = ObjectPermissionBackend()
+        assert await backend.ahas_perms(martin, ["testapp.change_book"], book)
+        with mock.patch.object(rules.permissions, "any_module_perm", True):
+            assert await backend.ahas_module_perms(martin, "testapp")
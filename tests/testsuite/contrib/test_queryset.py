@@ -0,0 +1,130 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from django.test import TestCase
+
+from testapp.models import Book
+
+from rules.contrib.queryset import filter_queryset, permitted
+from rules.predicates import Predicate, always_deny, predicate
+from rules.rulesets import RuleSet
+
+from . import TestData
+
+
+def constant(result):
+    return predicate(lambda user, book: result, q=lambda user: result)
+
+
+class QuerysetTests(TestData, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super(QuerysetTests, cls).setUpTestData()
+        martin = User.objects.get(username="martin")
+        for i, title in enumerate(("A Book", "Another Book", "Some Book")):
+            Book.objects.create(isbn="isbn-%d" % i, title=title, author=martin)
+
+    def assertFiltered(self, pred, user, fallback=False):
+        expected = [book for book in Book.objects.all() if pred.test(user, book)]
+        filtered = filter_queryset(pred, user, Book.objects.all(), fallback=fallback)
+        self.assertEqual(list(filtered.order_by("pk")), expected)
+
+    def test_permitted(self):
+        adrian = User.objects.get(username="adrian")
+        martin = User.objects.get(username="martin")
+        books = Book.objects.order_by("pk")
+
+        self.assertEqual(
+            list(permitted(books, adrian, "testapp.delete_book")),
+            list(books.filter(author=adrian)),
+        )
+        self.assertEqual(
+            list(permitted(books, martin, "testapp.delete_book")),
+            list(books.filter(author=martin)),
+        )
+        # martin is an editor
+        self.assertEqual(
+            list(permitted(books, martin, "testapp.change_book")), list(books)
+        )
+        self.assertFalse(permitted(books, martin, "testapp.nonexistent_perm").exists())
+
+    def test_equivalent(self):
+        is_author = predicate(
+            lambda user, book: book.author == user, q=lambda user: Q(author=user)
+        )
+        is_a_book = predicate(
+            lambda user, book: book.title.startswith("A"),
+            q=lambda user: Q(title__startswith="A"),
+        )
+        is_staff = predicate(lambda user: user.is_staff)
+        is_skipped = predicate(lambda user: None)
+        maybe = predicate(lambda user, book: None if book.pk % 2 else book.pk > 2)
+
+        shapes = (
+            lambda a, b: a & b,
+            lambda a, b: a | ~b,
+            lambda a, b: a ^ b,
+            lambda a, b: ~(a & b) ^ (b | a),
+        )
+        for user in User.objects.all():
+            for shape in shapes:
+                for a in (is_author, is_staff, is_skipped, maybe):
+                    for b in (is_a_book, is_skipped, maybe, always_deny):
+                        self.assertFiltered(shape(a, b), user, fallback=True)
+
+    def test_memoized(self):
+        martin = User.objects.get(username="martin")
+        is_author = predicate(
+            lambda user, book: book.author == user,
+            q=lambda user: Q(author=user),
+            memoize=True,
+        )
+        is_a_book = predicate(
+            lambda user, book: book.title.startswith("A"),
+            q=lambda user: Q(title__startswith="A"),
+            memoize=True,
+        )
+        self.assertFiltered((is_author & is_a_book) | always_deny, martin)
+
+    def test_combined_q(self):
+        martin = User.objects.get(username="martin")
+        calls = []
+
+        def q(user):
+            calls.append(user)
+            return Q(author=user)
+
+        is_author = predicate(lambda user, book: book.author == user)
+        pred = Predicate(is_author & ~always_deny, q=q)
+        self.assertFiltered(pred | always_deny, martin)
+        assert calls == [martin]
+
+    def test_q_results(self):
+        martin = User.objects.get(username="martin")
+        for result in (True, False, None):
+            pred = constant(result)
+            self.assertFiltered(pred, martin)
+            self.assertFiltered(~pred, martin)
+
+    def test_no_query(self):
+        martin = User.objects.get(username="martin")
+        pred = predicate(lambda user, book: True)
+        with self.assertRaises(ImproperlyConfigured):
+            filter_queryset(pred, martin, Book.objects.all())
+        self.assertFiltered(pred, martin, fallback=True)
+
+    def test_ruleset(self):
+        martin = User.objects.get(username="martin")
+        ruleset = RuleSet()
+        ruleset.add_rule(
+            "is_author",
+            predicate(
+                lambda user, book: book.author == user, q=lambda user: Q(author=user)
+            ),
+        )
+        self.assertEqual(
+            ruleset.filter_queryset("is_author", martin, Book.objects.all()).count(), 3
+        )
+        self.assertFalse(
+            ruleset.filter_queryset("nonexistent", martin, Book.objects.all()).exists()
+        )
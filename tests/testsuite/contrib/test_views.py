@@ -1,6 +1,6 @@
 from __future__ import absolute_import
 
-from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.models import AnonymousUser, User
 from django.core.exceptions import ImproperlyConfigured, PermissionDenied
 from django.http import Http404, HttpRequest
 from django.test import RequestFactory, TestCase
@@ -11,7 +11,12 @@ from django.views.generic import CreateView, View
 from testapp.models import Book
 
 import rules  # noqa
-from rules.contrib.views import AutoPermissionRequiredMixin, objectgetter
+from rules.contrib.views import (
+    AutoPermissionRequiredMixin,
+    objectgetter,
+    predicate_stats,
+)
+from rules.stats import collector
 
 from . import TestData
 
@@ -213,3 +218,20 @@ class AutoPermissionRequiredMixinTests(TestCase):
 
         with self.assertRaises(PermissionDenied):
             TestView.as_view()(self.req)
+
+
+class PredicateStatsViewTests(TestData, TestCase):
+    def test_predicate_stats(self):
+        collector.start()
+        self.addCleanup(collector.reset)
+        self.addCleanup(collector.stop)
+        adrian = User.objects.get(username="adrian")
+        rules.test_rule("create_book", adrian)
+
+        response = predicate_stats(RequestFactory().get("/metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            'rules_predicate_calls_total{predicate="is_boss",result="true"} 1',
+            force_str(response.content),
+        )
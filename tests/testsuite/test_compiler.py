@@ -0,0 +1,183 @@
+import asyncio
+import itertools
+import re
+from unittest import TestCase
+
+from rules.predicates import (
+    Predicate,
+    always_allow,
+    always_deny,
+    always_false,
+    always_true,
+    predicate,
+)
+from rules.rulesets import RuleSet
+
+
+def constant(name, value):
+    return predicate(lambda: value, name=name)
+
+
+class CompilerTests(TestCase):
+    def assertEquivalent(self, pred, *args):
+        compiled = pred.compile()
+        assert compiled.name == pred.name
+        assert compiled.test(*args) is pred.test(*args)
+        # tells apart False and skipped (None) results
+        assert (~compiled).test(*args) is (~pred).test(*args)
+        assert (~pred).compile().test(*args) is (~pred).test(*args)
+
+    def test_exhaustive(self):
+        values = (True, False, None)
+        shapes = (
+            lambda a, b, c: a & b & c,
+            lambda a, b, c: a | b | c,
+            lambda a, b, c: a ^ b ^ c,
+            lambda a, b, c: (a & b) | c,
+            lambda a, b, c: a & (b | ~c),
+            lambda a, b, c: ~(a ^ b) & c,
+            lambda a, b, c: ~~a | (b ^ ~c),
+        )
+        for shape in shapes:
+            for a, b, c in itertools.product(values, repeat=3):
+                pred = shape(
+                    constant("a", a),
+                    constant("b", b),
+                    constant("c", c),
+                )
+                self.assertEquivalent(pred)
+
+    def test_constants(self):
+        for pred in (always_true, always_false, always_allow, always_deny):
+            self.assertEquivalent(pred)
+            self.assertEquivalent(~pred & always_true)
+
+    def test_short_circuit(self):
+        @predicate
+        def skipped_predicate():
+            return None
+
+        @predicate
+        def shorted_predicate():
+            raise ValueError("this predicate should not be evaluated")
+
+        assert (always_false & shorted_predicate).compile().test() is False
+        assert (always_true | shorted_predicate).compile().test() is True
+        assert (
+            always_false & always_true & shorted_predicate
+        ).compile().test() is False
+        assert (always_true | always_false | shorted_predicate).compile().test() is True
+
+        for pred in (
+            always_true & shorted_predicate,
+            always_false | shorted_predicate,
+            skipped_predicate & shorted_predicate,
+            skipped_predicate | shorted_predicate,
+            always_true ^ shorted_predicate,
+        ):
+            with self.assertRaises(ValueError):
+                pred.compile().test()
+
+    def test_arguments(self):
+        @predicate
+        def no_args():
+            return True
+
+        @predicate
+        def one_arg(a):
+            return a == "a"
+
+        @predicate
+        def two_args(a, b):
+            return b is None or b == "b"
+
+        @predicate
+        def var_args(*args):
+            return len(args) < 2
+
+        pred = no_args & one_arg & two_args & var_args
+        self.assertEquivalent(pred)
+        self.assertEquivalent(pred, "a")
+        self.assertEquivalent(pred, "x")
+        self.assertEquivalent(pred, "a", "b")
+        self.assertEquivalent(pred, "a", "x")
+
+    def test_bind(self):
+        @predicate(bind=True)
+        def requires_two_args(self, a, b):
+            return a == b if len(self.context.args) > 1 else None
+
+        @predicate
+        def passthrough(a):
+            return a
+
+        for pred in (
+            requires_two_args & passthrough,
+            requires_two_args | passthrough,
+            ~requires_two_args ^ passthrough,
+        ):
+            for args in ((True,), (False,), (True, True), (True, False)):
+                self.assertEquivalent(pred, *args)
+
+    def test_invocation_context(self):
+        @predicate
+        def p1(a):
+            p1.context["p1.a"] = a
+            return True
+
+        @predicate
+        def p2(a):
+            return p2.context["p1.a"] == a
+
+        assert (p1 & p2).compile().test("a")
+
+    def test_custom_apply(self):
+        class Negated(Predicate):
+            def _apply(self, *args):
+                return not super(Negated, self)._apply(*args)
+
+        p = Negated(lambda a: a)
+        for pred in (p, p & always_true, always_true & p, ~p):
+            assert pred.compile().test(True) is pred.test(True)
+            assert pred.compile().test(False) is pred.test(False)
+
+    def test_recompose(self):
+        compiled = (always_true & always_false).compile()
+        pred = compiled | always_true
+        assert pred.test()
+        self.assertEquivalent(pred)
+        assert pred.compile().node == pred.node
+        assert pred.node.operands[0] == compiled.node
+
+    def test_deep_tree(self):
+        pred = constant("p0", None)
+        for i in range(1, 300):
+            leaf = constant("p%d" % i, None if i < 299 else True)
+            pred = leaf | pred if i % 2 else leaf & pred
+        self.assertEquivalent(pred)
+        # operations nested deeper than MAX_DEPTH are left to their nodes
+        assert re.search(r"n\d+\.evaluate\(", pred.compile().fn.__source__)
+
+    def test_deep_async_tree(self):
+        @predicate
+        async def deepest():
+            return True
+
+        pred = deepest
+        for i in range(1, 300):
+            leaf = constant("p%d" % i, None)
+            pred = leaf | pred if i % 2 else leaf & pred
+        compiled = pred.compile()
+        assert re.search(r"await n\d+\.aevaluate\(", compiled.fn.__source__)
+        assert asyncio.run(compiled.atest()) is asyncio.run(pred.atest()) is True
+
+    def test_ruleset(self):
+        ruleset = RuleSet()
+        ruleset.add_rule("somerule", always_true & always_false)
+        ruleset.add_rule("otherrule", always_true | always_false)
+        original = ruleset["somerule"]
+        ruleset.compile()
+        assert ruleset["somerule"] is not original
+        assert ruleset["somerule"].name == original.name
+        assert not ruleset.test_rule("somerule")
+        assert ruleset.test_rule("otherrule")
@@ -0,0 +1,154 @@
+import itertools
+import time
+from unittest import TestCase
+
+from rules.optimizer import CostOptimizer
+from rules.predicates import (
+    And,
+    Leaf,
+    Or,
+    always_false,
+    always_true,
+    observers,
+    predicate,
+)
+from rules.rulesets import RuleSet
+
+
+class CostOptimizerTests(TestCase):
+    def setUp(self):
+        self.optimizer = CostOptimizer(min_samples=10)
+
+    def tearDown(self):
+        self.optimizer.stop()
+
+    def test_observe(self):
+        @predicate
+        def p1(a):
+            return a
+
+        @predicate
+        def p2(a):
+            return None
+
+        self.optimizer.start()
+        self.optimizer.start()
+        assert observers.count(self.optimizer.observe) == 1
+        for value in (True, True, False):
+            (p1 & p2).test(value)
+        self.optimizer.stop()
+        (p1 & p2).test(True)
+
+        stats = self.optimizer.stats[p1]
+        assert (stats.calls, stats.true, stats.false) == (3, 2, 1)
+        assert stats.elapsed > 0
+        stats = self.optimizer.stats[p2]
+        assert (stats.calls, stats.true, stats.false) == (2, 0, 0)
+        assert len(self.optimizer.stats) == 2  # no combined predicates
+
+    def test_declared_cost(self):
+        cheap = predicate(lambda: True, name="cheap", pure=True, cost=1)
+        expensive = predicate(lambda: True, name="expensive", pure=True, cost=100)
+        impure = predicate(lambda: True, name="impure", cost=1)
+
+        p = expensive & cheap
+        optimized = self.optimizer.optimize(p)
+        assert optimized.node == And((cheap.node, expensive.node))
+        assert optimized.name == p.name
+
+        p = expensive | cheap
+        assert self.optimizer.optimize(p).node == Or((cheap.node, expensive.node))
+
+        p = cheap & expensive
+        assert self.optimizer.optimize(p) is p
+
+        # never reordered unless all predicates are pure
+        p = expensive & impure
+        assert self.optimizer.optimize(p) is p
+        p = (expensive & impure) | (expensive & cheap)
+        assert self.optimizer.optimize(p).node == Or(
+            ((expensive & impure).node, (cheap & expensive).node)
+        )
+        assert self.optimizer.optimize(cheap) is cheap
+
+    def test_observed_rates(self):
+        values = {"a": 0, "b": 0}
+
+        @predicate(pure=True)
+        def mostly_true(a):
+            values["a"] += 1
+            return values["a"] % 10 != 0
+
+        @predicate(pure=True)
+        def mostly_false(a):
+            values["b"] += 1
+            return values["b"] % 10 == 0
+
+        self.optimizer.start()
+        for i in range(20):
+            mostly_true.test(i)
+            mostly_false.test(i)
+
+        p = mostly_true & mostly_false
+        assert self.optimizer.optimize(p).node == And(
+            (mostly_false.node, mostly_true.node)
+        )
+        p = mostly_false | mostly_true
+        assert self.optimizer.optimize(p).node == Or(
+            (mostly_true.node, mostly_false.node)
+        )
+
+    def test_observed_latency(self):
+        @predicate(pure=True, cost=1)
+        def slow():
+            time.sleep(0.002)
+            return False
+
+        @predicate(pure=True, cost=100)
+        def fast():
+            return False
+
+        p = slow & fast
+        assert self.optimizer.optimize(p) is p
+
+        self.optimizer.start()
+        for _ in range(10):
+            slow.test()
+            fast.test()
+        assert self.optimizer.optimize(p).node == And((fast.node, slow.node))
+
+    def test_estimate(self):
+        a = predicate(lambda: None, name="a", pure=True)
+        b = predicate(lambda: None, name="b", pure=True)
+        for shape in (a & b, a | b, a ^ b, ~a & b, (a | b) & ~(a ^ b)):
+            estimate = self.optimizer.estimate(shape.node, False)
+            assert abs(estimate.true + estimate.false + estimate.skipped - 1) < 1e-9
+        estimate = self.optimizer.estimate((a & b).node, False)
+        assert estimate.cost == 1.5
+        assert estimate.false == 0.75
+        estimate = self.optimizer.estimate(Leaf(always_true), False)
+        assert estimate == (0, 1, 0)
+
+    def test_equivalent(self):
+        values = (True, False, None)
+        for x, y, z in itertools.product(values, repeat=3):
+            a = predicate(lambda x=x: x, name="a", pure=True, cost=3)
+            b = predicate(lambda y=y: y, name="b", pure=True, cost=2)
+            c = predicate(lambda z=z: z, name="c", pure=True, cost=1)
+            for p in (a & b & c, a | b | c, (a & b) | c, a & (b | ~c)):
+                optimized = self.optimizer.optimize(p)
+                assert optimized.test() is p.test()
+                assert (~optimized).test() is (~p).test()
+
+    def test_optimize_ruleset(self):
+        cheap = predicate(lambda: False, name="cheap", pure=True, cost=1)
+        expensive = predicate(lambda: False, name="expensive", pure=True, cost=10)
+        ruleset = RuleSet()
+        ruleset.add_rule("somerule", expensive & cheap & always_true)
+        ruleset.add_rule("otherrule", always_false)
+        self.optimizer.optimize_ruleset(ruleset)
+        assert ruleset["somerule"].node == And(
+            (cheap.node, expensive.node, always_true.node)
+        )
+        assert ruleset["otherrule"] is always_false
+        assert not ruleset.test_rule("somerule")
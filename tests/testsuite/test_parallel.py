@@ -0,0 +1,145 @@
+import asyncio
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+import rules.parallel
+from rules.parallel import ParallelAnd, ParallelOr
+from rules.predicates import always_false, always_true, predicate
+from rules.rulesets import RuleSet
+
+
+def constant(name, value):
+    return predicate(lambda: value, name=name)
+
+
+def async_constant(name, value):
+    async def fn():
+        await asyncio.sleep(0)
+        return value
+
+    return predicate(fn, name=name)
+
+
+@predicate
+def raises():
+    raise ValueError("this predicate should not be decisive")
+
+
+@predicate
+async def araises():
+    raise ValueError("this predicate should not be decisive")
+
+
+class ParallelTests(TestCase):
+    def test_parallel(self):
+        a, b = constant("a", True), constant("b", False)
+        pred = (a | b).parallel()
+        assert isinstance(pred.node, ParallelOr)
+        assert pred.name == "(a | b)"
+        assert isinstance((a & b & a).parallel().node, ParallelAnd)
+        assert pred.parallel() is pred
+        assert a.parallel() is a
+        assert (a ^ b).parallel().node == (a ^ b).node
+
+        ruleset = RuleSet()
+        ruleset.add_rule("otherrule", pred)
+        assert ruleset["otherrule"].node == pred.node
+
+    def test_equivalent(self):
+        values = (True, False, None)
+        shapes = (
+            lambda a, b, c: a & b & c,
+            lambda a, b, c: a | b | c,
+            lambda a, b, c: (a & b) | ~c,
+            lambda a, b, c: ~(a | b) & c,
+        )
+        for shape in shapes:
+            for a, b, c in itertools.product(values, repeat=3):
+                pred = shape(constant("a", a), constant("b", b), constant("c", c))
+                parallel = pred.parallel()
+                assert parallel.test() is pred.test()
+                assert (~parallel).test() is (~pred).test()
+                assert parallel.compile().test() is pred.test()
+
+                pred = shape(
+                    async_constant("a", a), constant("b", b), async_constant("c", c)
+                )
+                parallel = pred.parallel()
+                assert asyncio.run(parallel.atest()) is asyncio.run(pred.atest())
+                assert asyncio.run((~parallel).atest()) is asyncio.run((~pred).atest())
+                assert asyncio.run(parallel.compile().atest()) is asyncio.run(
+                    pred.atest()
+                )
+
+    def test_exceptions(self):
+        assert not (always_false & raises).parallel().test()
+        assert (always_true | raises).parallel().test()
+        for pred in (always_true & raises, raises | always_true):
+            with self.assertRaises(ValueError):
+                pred.parallel().test()
+
+        assert not asyncio.run((always_false & araises).parallel().atest())
+        assert asyncio.run((async_constant("a", True) | araises).parallel().atest())
+        for pred in (always_true & araises, araises | always_true):
+            with self.assertRaises(ValueError):
+                asyncio.run(pred.parallel().atest())
+
+    def test_concurrent(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def wait():
+            barrier.wait()
+            return None
+
+        a, b, c = predicate(wait), predicate(wait), predicate(wait)
+        assert not (a | b | c).parallel().test()
+        assert barrier.n_waiting == 0
+
+        async def main():
+            event = asyncio.Event()
+
+            @predicate
+            async def wait():
+                await asyncio.wait_for(event.wait(), timeout=5)
+                return True
+
+            @predicate
+            async def notify():
+                event.set()
+                return None
+
+            return await (wait & notify).parallel().atest()
+
+        assert asyncio.run(main())
+
+    def test_nested(self):
+        executor = rules.parallel.executor
+        rules.parallel.executor = ThreadPoolExecutor(1)
+        try:
+            a, b = constant("a", None), constant("b", True)
+            inner = (a | b).parallel()
+            assert (a | inner).parallel().test()
+            assert (inner | a).parallel().test()
+        finally:
+            rules.parallel.executor.shutdown()
+            rules.parallel.executor = executor
+
+    def test_invocation_context(self):
+        @predicate(bind=True)
+        def store(self, a):
+            self.context["a"] = a
+            return None
+
+        @predicate(bind=True)
+        def check(self, a):
+            return self.context.args == (a,)
+
+        @predicate(bind=True)
+        async def acheck(self, a):
+            await asyncio.sleep(0)
+            return self.context.args == (a,)
+
+        assert (store | check).parallel().test("a")
+        assert asyncio.run((store | check | acheck).parallel().atest("a"))
@@ -1,15 +1,33 @@
-from unittest import TestCase
+import asyncio
+import threading
+import time
+from unittest import TestCase, mock
 
 from rules.permissions import (
     ObjectPermissionBackend,
     add_perm,
+    ahas_module_perms,
+    ahas_perm,
+    ahas_perms,
+    atest_perms,
+    cache_key,
+    capabilities,
+    clear_permission_cache,
+    get_all_permissions,
+    get_permission_cache,
+    has_module_perms,
     has_perm,
+    has_perms,
     perm_exists,
+    perm_names,
+    permission_cache,
+    permission_cache_stats,
     permissions,
     remove_perm,
     set_perm,
+    test_perms,
 )
-from rules.predicates import always_false, always_true
+from rules.predicates import always_false, always_true, deadline, predicate
 
 
 class PermissionsTests(TestCase):
@@ -36,6 +54,232 @@ class PermissionsTests(TestCase):
         remove_perm("can_edit_book")
         assert not perm_exists("can_edit_book")
 
+    def test_ahas_perm(self):
+        add_perm("can_edit_book", always_true)
+        assert asyncio.run(ahas_perm("can_edit_book"))
+        remove_perm("can_edit_book")
+        assert not asyncio.run(ahas_perm("can_edit_book"))
+
+    def test_capabilities(self):
+        is_author = predicate(lambda user, book: book.startswith(user))
+        add_perm("books.view_book", always_true)
+        add_perm("books.change_book", is_author)
+        add_perm("books.delete_book", always_false)
+        add_perm("shelves.view_shelf", always_true)
+        assert capabilities("adrian", "adrian's book", prefix="books.") == {
+            "books.change_book": True,
+            "books.delete_book": False,
+            "books.view_book": True,
+        }
+        assert capabilities("martin", "adrian's book")["books.change_book"] is False
+        assert len(capabilities("martin", "adrian's book")) == 4
+
+    def test_has_perms(self):
+        calls = []
+
+        @predicate(memoize=True)
+        def is_author(user, book):
+            calls.append((user, book))
+            return book.startswith(user)
+
+        add_perm("books.view_book", always_true)
+        add_perm("books.change_book", is_author)
+        add_perm("books.delete_book", is_author & always_false)
+        add_perm("books.share_book", is_author)
+
+        assert has_perms(["books.view_book", "books.change_book"], "adrian", "adrian's")
+        assert calls == [("adrian", "adrian's")]
+        assert has_perms([], "adrian")
+        assert test_perms(
+            ["books.change_book", "books.delete_book", "books.share_book"],
+            "adrian",
+            "adrian's",
+        ) == {"books.change_book": True, "books.delete_book": False}
+        assert len(calls) == 2
+
+        assert test_perms(["books.view_book", "books.nonexistent"], "adrian") == {
+            "books.view_book": True,
+            "books.nonexistent": False,
+        }
+        assert test_perms(["books.change_book", "books.nonexistent"], "a", "b") == {
+            "books.change_book": False
+        }
+        assert not has_perms(["books.nonexistent", "books.view_book"], "adrian")
+
+        backend = ObjectPermissionBackend()
+        perms = ["books.view_book", "books.change_book", "books.share_book"]
+        assert backend.has_perms("martin", perms, "martin's")
+        assert not backend.has_perms("martin", perms, "adrian's")
+        with permission_cache() as cache:
+            assert backend.test_perms("martin", perms, "adrian's") == {
+                "books.view_book": True,
+                "books.change_book": False,
+            }
+            assert not backend.has_perm("martin", "books.change_book", "adrian's")
+            assert backend.has_perm("martin", "books.view_book", "adrian's")
+            assert (cache.hits, cache.misses) == (2, 2)
+            # decided by the cached denial, without testing the others
+            assert backend.test_perms("martin", perms[::-1], "adrian's") == {
+                "books.change_book": False
+            }
+            assert backend.has_perms("martin", perms, "martin's")
+            assert (cache.hits, cache.misses) == (3, 5)
+
+    def test_module_perms(self):
+        import rules.permissions
+
+        calls = []
+
+        def make(result):
+            def fn(user):
+                calls.append(result)
+                return result
+
+            return predicate(fn)
+
+        add_perm("books.add_book", make(False))
+        add_perm("books.change_book", make(None))
+        add_perm("books.view_book", make(True))
+        add_perm("books.view_author", make(True))
+        add_perm("books.publish", make(True))
+        add_perm("shelves.view_shelf", make(False))
+        add_perm("can_edit_book", make(True))
+
+        assert perm_names("books") == [
+            "books.add_book",
+            "books.change_book",
+            "books.publish",
+            "books.view_author",
+            "books.view_book",
+        ]
+        assert perm_names("books", "book") == [
+            "books.add_book",
+            "books.change_book",
+            "books.view_book",
+        ]
+        assert perm_names("books", "author") == ["books.view_author"]
+        assert perm_names("nonexistent") == []
+        remove_perm("books.view_author")
+        assert perm_names("books", "author") == []
+
+        assert has_module_perms("books", "adrian")
+        assert calls == [False, None, True]
+        assert not has_module_perms("shelves", "adrian")
+        assert not has_module_perms("nonexistent", "adrian")
+        # a permission named after the app decides
+        add_perm("shelves", always_true)
+        backend = ObjectPermissionBackend()
+        assert backend.has_module_perms("adrian", "shelves")
+        # only that one, unless any permission of the app is enough
+        assert not backend.has_module_perms("adrian", "books")
+        with mock.patch.object(rules.permissions, "any_module_perm", True):
+            assert backend.has_module_perms("adrian", "books")
+            assert backend.has_module_perms("adrian", "shelves")
+
+        del calls[:]
+        # only rules named like permissions
+        assert get_all_permissions("adrian") == {"books.view_book", "books.publish"}
+        assert backend.get_all_permissions("adrian", None) == set()
+        assert len(calls) == 5
+        with mock.patch.object(rules.permissions, "any_module_perm", True):
+            assert backend.get_all_permissions("adrian", None) == (
+                get_all_permissions("adrian")
+            )
+        assert len(calls) == 15  # five each
+
+    def test_authoritative(self):
+        from django.core.exceptions import PermissionDenied
+
+        import rules.permissions
+
+        backend = ObjectPermissionBackend()
+        add_perm("can_edit_book", always_false)
+        add_perm("can_read_book", always_true)
+        assert not backend.has_perm("adrian", "can_edit_book")
+        with mock.patch.object(rules.permissions, "authoritative", True):
+            with self.assertRaises(PermissionDenied):
+                backend.has_perm("adrian", "can_edit_book")
+            with permission_cache(), self.assertRaises(PermissionDenied):
+                backend.has_perm("adrian", "can_edit_book", None)
+            assert backend.has_perm("adrian", "can_read_book")
+            assert not backend.has_perm("adrian", "nonexistent")
+
+    def test_async_backend(self):
+        from django.core.exceptions import PermissionDenied
+
+        import rules.permissions
+
+        calls = []
+        threads = []
+
+        @predicate(memoize=True)
+        async def is_author(user, book):
+            calls.append((user, book))
+            await asyncio.sleep(0)
+            return book is not None and book.startswith(user)
+
+        @predicate(async_safe=True)
+        def is_viewer(user):
+            threads.append(threading.get_ident())
+            return True
+
+        add_perm("books.view_book", is_viewer)
+        add_perm("books.change_book", is_author)
+        add_perm("books.delete_book", is_author & always_false)
+        add_perm("books.share_book", is_author)
+
+        backend = ObjectPermissionBackend()
+        perms = ["books.view_book", "books.change_book", "books.share_book"]
+
+        async def main():
+            assert await backend.ahas_perm("adrian", "books.change_book", "adrian's")
+            assert not await backend.ahas_perm(
+                "adrian", "books.delete_book", "adrian's"
+            )
+            assert await backend.ahas_perm("adrian", "books.view_book")
+            assert await backend.ahas_perms("adrian", perms, "adrian's")
+            assert await backend.atest_perms("martin", perms, "adrian's") == {
+                "books.view_book": True,
+                "books.change_book": False,
+            }
+            assert await ahas_perms(perms, "adrian", "adrian's")
+            assert await atest_perms(["books.nonexistent"], "adrian") == {
+                "books.nonexistent": False
+            }
+            assert not await backend.ahas_module_perms("adrian", "books")
+            with mock.patch.object(rules.permissions, "any_module_perm", True):
+                assert await backend.ahas_module_perms("adrian", "books")
+            assert not await ahas_module_perms("shelves", "adrian")
+            with permission_cache() as cache:
+                assert await backend.ahas_perms("martin", perms, "martin's")
+                assert await backend.ahas_perm("martin", "books.share_book", "martin's")
+                assert (cache.hits, cache.misses) == (1, 3)
+            with mock.patch.object(rules.permissions, "authoritative", True):
+                with self.assertRaises(PermissionDenied):
+                    await backend.ahas_perm("adrian", "books.delete_book", "adrian's")
+
+        asyncio.run(main())
+        # shared by the permissions tested together
+        assert len(calls) == 6
+        # async-safe predicates are tested in the thread of the event loop
+        assert set(threads) == {threading.get_ident()}
+
+    def test_has_perm_timeout(self):
+        @predicate
+        def is_slow(user):
+            time.sleep(0.02)
+            return True
+
+        add_perm("can_edit_book", is_slow)
+        with mock.patch("rules.predicates.logger"):
+            assert not has_perm("can_edit_book", "user", timeout=0.01)
+            assert not ObjectPermissionBackend().has_perm(
+                "user", "can_edit_book", timeout=0.01
+            )
+            with deadline(0.01):
+                assert not ObjectPermissionBackend().has_perm("user", "can_edit_book")
+        assert has_perm("can_edit_book", "user")
+
     def test_backend(self):
         backend = ObjectPermissionBackend()
         assert backend.authenticate("someuser", "password") is None
@@ -50,3 +294,62 @@ class PermissionsTests(TestCase):
         assert not backend.has_perm(None, "can_edit_book")
         remove_perm("can_edit_book")
         assert not perm_exists("can_edit_book")
+
+    def test_backend_cache(self):
+        calls = []
+
+        @predicate
+        def is_author(user, book):
+            calls.append((user, book))
+            return book is not None and book.author == user
+
+        class Book(object):
+            def __init__(self, author):
+                self.author = author
+
+        backend = ObjectPermissionBackend()
+        add_perm("can_edit_book", is_author)
+        book = Book("adrian")
+
+        assert get_permission_cache() is None
+        assert backend.has_perm("adrian", "can_edit_book", book)
+        assert backend.has_perm("adrian", "can_edit_book", book)
+        assert len(calls) == 2
+
+        hits = permission_cache_stats["hits"]
+        with permission_cache() as cache:
+            assert get_permission_cache() is cache
+            assert backend.has_perm("adrian", "can_edit_book", book)
+            assert backend.has_perm("adrian", "can_edit_book", book)
+            assert not backend.has_perm("martin", "can_edit_book", book)
+            assert not backend.has_perm("adrian", "can_edit_book", Book("martin"))
+            assert not backend.has_perm("adrian", "can_edit_book")
+            assert not backend.has_perm("adrian", "can_edit_book")
+            assert len(calls) == 6
+            assert (cache.hits, cache.misses) == (2, 4)
+
+            book.author = "martin"
+            assert backend.has_perm("adrian", "can_edit_book", book)
+            clear_permission_cache()
+            assert not backend.has_perm("adrian", "can_edit_book", book)
+            assert len(calls) == 7
+
+        assert get_permission_cache() is None
+        assert permission_cache_stats["hits"] == hits + 3
+        clear_permission_cache()  # no-op
+
+    def test_cache_key(self):
+        class Model(object):
+            class _meta:
+                label = "app.Model"
+
+            def __init__(self, pk):
+                self.pk = pk
+
+        obj = object()
+        assert cache_key(None) is None
+        assert cache_key(obj) == id(obj)
+        assert cache_key(Model(1)) == ("app.Model", 1)
+        assert cache_key(Model(1)) == cache_key(Model(1))
+        unsaved = Model(None)
+        assert cache_key(unsaved) == id(unsaved)
@@ -1,14 +1,34 @@
+import asyncio
+import copy
 import functools
-from unittest import TestCase
-
+import gc
+import itertools
+import threading
+import time
+import weakref
+from unittest import TestCase, mock
+
+from rules import predicates
 from rules.predicates import (
     NO_VALUE,
+    And,
+    Context,
+    DeadlineExceeded,
+    Leaf,
+    Not,
+    Or,
     Predicate,
+    Xor,
+    _context,
     always_allow,
     always_deny,
     always_false,
     always_true,
+    atest_all,
+    deadline,
+    getargspec,
     predicate,
+    test_all,
 )
 
 
@@ -33,6 +53,25 @@ class PredicateKwonlyTests(TestCase):
         predicate(p3)
 
 
+class PredicateIntrospectionTests(TestCase):
+    def test_cached(self):
+        def make_predicate(value):
+            def fn(a, b=None):
+                return a == value
+
+            return fn
+
+        p1, p2 = make_predicate(1), make_predicate(2)
+        assert getargspec(p1) is getargspec(p2)
+        with mock.patch("rules.predicates.getfullargspec") as getfullargspec:
+            pred = predicate(p2)
+            assert pred.num_args == 2
+            assert not pred.var_args
+            # combined predicates are never introspected
+            pred = ~(pred & always_true) | always_false
+            assert getfullargspec.call_count == 0
+
+
 class PredicateTests(TestCase):
     def test_always_true(self):
         assert always_true()
@@ -311,6 +350,19 @@ class PredicateTests(TestCase):
 
         p("a", b="b", c="c")
 
+    def test_custom_apply(self):
+        class Counted(Predicate):
+            def _apply(self, *args):
+                return len(args)  # truthy, not True
+
+        p = Counted(lambda: None)
+        assert p.test("a") is True
+        assert p.test() is False
+        assert asyncio.run(p.atest("a")) is True
+        assert p.test_many("a", [1, 2]) == [True, True]
+        assert test_all([p, p], "a") == [True, True]
+        assert asyncio.run(atest_all([p], "a")) == [True]
+
     def test_no_value_marker(self):
         @predicate
         def p(a, b=None):
@@ -438,3 +490,758 @@ class PredicateTests(TestCase):
 
         p = p1 & p2
         assert p.test("a")
+
+    def test_invocation_context_lazy(self):
+        @predicate
+        def p1(a):
+            # no context is created unless a predicate asks for it
+            assert _context.stack[-1] == ("a",)
+            return True
+
+        @predicate(bind=True)
+        def p2(self, a):
+            context = self.context
+            assert isinstance(context, Context)
+            assert _context.stack[-1] is context
+            return self.context is context
+
+        @predicate
+        def p3(a):
+            return p2.test("b")
+
+        assert (p1 & p2).test("a")
+        assert p3.test("a")
+        assert p1.context is None
+        assert _context.stack == []
+
+    def test_arguments_padding(self):
+        args = []
+
+        @predicate
+        def p0():
+            args.append(())
+            return True
+
+        @predicate
+        def p1(a):
+            args.append((a,))
+            return True
+
+        @predicate
+        def p2(a, b):
+            args.append((a, b))
+            return True
+
+        p = p0 & p1 & p2
+        for callargs in ((), ("a",), ("a", "b")):
+            p._apply(*callargs)
+        assert args == [(), (None,), (None, None), (), ("a",), ("a", None)] + [
+            (),
+            ("a",),
+            ("a", "b"),
+        ]
+
+    def test_logging(self):
+        @predicate
+        def p1(a):
+            return True
+
+        @predicate
+        def p2(a):
+            return None
+
+        with self.assertLogs("rules", "DEBUG") as logs:
+            assert (p1 & p2).test("a")
+        assert logs.output == [
+            "DEBUG:rules:Testing (p1 & p2)",
+            "DEBUG:rules:  p1 = True",
+            "DEBUG:rules:  p2 = skipped",
+            "DEBUG:rules:  (p1 & p2) = True",
+        ]
+
+    def test_memoize(self):
+        calls = []
+
+        @predicate(memoize=True)
+        def is_author(user, book):
+            calls.append((user, book))
+            return user == book
+
+        @predicate(bind=True)
+        def memo_hits(self):
+            return self.context.memo.hits
+
+        p = (is_author | is_author) & ~is_author | is_author & memo_hits
+        assert p.test("a", "a")
+        assert calls == [("a", "a")]
+        assert not p.test("a", "b")
+        assert calls == [("a", "a"), ("a", "b")]
+        assert p.compile().test("a", "a")
+        assert len(calls) == 3
+        assert is_author.memoize and not memo_hits.memoize
+
+    def test_memoize_arguments(self):
+        calls = []
+
+        @predicate(memoize=True)
+        def is_editor(user):
+            calls.append(user)
+            return user == "editor"
+
+        @predicate
+        def is_author(user, book):
+            return is_editor.test(user) and is_editor.test(user)
+
+        p = is_editor | is_author
+        assert not p.test("author", "book1")
+        assert calls == ["author"]
+
+        # unhashable arguments are not memoized
+        assert not p.test(["author"], "book1")
+        assert calls == ["author", ["author"], ["author"]]
+
+    def test_memoize_nested(self):
+        @predicate(memoize=True)
+        def p1(a):
+            return True
+
+        @predicate(bind=True)
+        def p2(self, a):
+            outer = self.context
+            assert p1.test(a) and p1.test(a)
+            assert outer.memo.hits == 2 and outer.memo.misses == 1
+            return True
+
+        assert (p1 & p2).test("a")
+        assert p2.context is None
+
+
+class ExpressionTreeTests(TestCase):
+    def setUp(self):
+        self.a = predicate(lambda: True, name="a")
+        self.b = predicate(lambda: None, name="b")
+        self.c = predicate(lambda: False, name="c")
+
+    def test_leaf(self):
+        a = self.a
+        assert a.node == Leaf(a)
+        assert a.node != Leaf(self.b)
+        assert str(a.node) == "a"
+        assert a.node.value is None
+        assert always_true.node.value is True
+        assert always_deny.node.value is False
+        assert list(a.node.leaves()) == [Leaf(a)]
+
+    def test_combined(self):
+        a, b, c = self.a, self.b, self.c
+        p = (a & b) | ~c ^ a
+        assert p.node == Or((And((a.node, b.node)), Xor((Not((c.node,)), a.node))))
+        assert str(p.node) == p.name == "((a & b) | (~c ^ a))"
+        assert list(p.node.leaves()) == [a.node, b.node, c.node, a.node]
+        assert hash(p.node) == hash(((a & b) | ~c ^ a).node)
+        assert p.node != ((a & b) | ~c ^ b).node
+        assert p.node.evaluate() is True
+
+    def test_named_combined(self):
+        a, b = self.a, self.b
+        p = Predicate(a & b, name="a_and_b")
+        assert p.name == "a_and_b"
+        assert p.node == (a & b).node
+        assert (p | a).node == Or((And((a.node, b.node)), a.node))
+
+    def test_hash_consing(self):
+        a, b, c = self.a, self.b, self.c
+        p = (a & b) | c
+        assert p.node is ((a & b) | c).node
+        assert p.node.operands[0] is (a & b).node
+        assert p.node is not ((a & b) | a).node
+        assert Leaf(a) is a.node
+        # only nodes are shared, so that combined predicates can be changed
+        # on their own
+        ab = a & b
+        assert ab is not (a & b) and ab.node is (a & b).node
+        ab.batch(lambda obj, targets: [True] * len(targets))
+        ab.name = "a_and_b"
+        assert (a & b).batch_fn is None and (a & b).name == "(a & b)"
+        assert ((a | b) | c).simplify().node is Or((a.node, b.node, c.node))
+        # nodes are immutable, so copies share them
+        assert copy.copy(p.node) is copy.deepcopy(p.node) is p.node
+        assert copy.deepcopy(p).node is p.node
+
+        leaves = (b.node, c.node, a.node)
+        gc.collect()
+        size = len(predicates._nodes)
+        node = And(leaves)
+        assert len(predicates._nodes) == size + 1
+        ref = weakref.ref(node)
+        del node
+        gc.collect()
+        assert ref() is None
+        # dead nodes don't stay in the table
+        assert len(predicates._nodes) == size
+        assert predicates._nodes.get((And, *map(id, leaves))) is None
+
+    def test_memoize_shared(self):
+        calls = []
+
+        @predicate(memoize=True)
+        def is_editor(user):
+            calls.append(user)
+            return True
+
+        is_active = predicate(lambda user: True, memoize=True)
+        shared = is_editor & is_active
+        assert shared.memoize
+        assert not (is_editor & self.a).memoize
+
+        rule1 = shared & self.c
+        # built again, as in another module
+        rule2 = self.a & (is_editor & is_active)
+        assert rule1.node.operands[0] is Leaf(shared)
+
+        @predicate(bind=True)
+        def both(self, user):
+            result = rule1.test(user) or rule2.test(user)
+            # is_editor and is_active are not evaluated again, not even
+            # looked up in the memo
+            assert self.context.memo.hits == 1
+            return result
+
+        assert both.test("user")
+        assert calls == ["user"]
+
+    def test_simplify_flatten(self):
+        a, b, c = self.a, self.b, self.c
+        p = (a & (b & c)) & (a & b)
+        assert p.simplify().node == And((a.node, b.node, c.node))
+        assert p.simplify().name == "(a & b & c)"
+        p = (a | b) | (c | (a ^ b))
+        assert p.simplify().node == Or((a.node, b.node, c.node, Xor((a.node, b.node))))
+        p = (a ^ b) ^ (a ^ b)
+        assert p.simplify().node == Xor((a.node, b.node, a.node, b.node))
+
+    def test_simplify_keeps_options(self):
+        a, b = self.a, self.b
+        p = Predicate(a & b & a, name="can_edit")
+        assert p.simplify().node == And((a.node, b.node))
+        assert p.simplify().name == "can_edit"
+        p = Predicate(a & (b | b), cost=10)
+        assert p.simplify() is p
+        p = Predicate(a & (b | b), pure=True)
+        assert p.simplify() is p
+        p = Predicate(a & (b | b), memoize=True)
+        assert p.simplify() is p
+        p = Predicate(a & (b | b), q=lambda user: None)
+        assert p.simplify() is p
+
+    def test_simplify_constants(self):
+        a, b = self.a, self.b
+        assert (a & always_false & b).simplify() is always_false
+        assert (a & b & always_deny).simplify() is always_deny
+        assert (a | always_allow | b).simplify() is always_allow
+        assert (always_true & always_allow & a).simplify().node == And(
+            (always_true.node, a.node)
+        )
+        assert (a | always_false | always_deny).simplify().node == Or(
+            (a.node, always_false.node)
+        )
+        assert (always_true & always_true).simplify() is always_true
+        assert (~always_true).simplify().node.value is False
+        assert (~always_deny).simplify().node.value is True
+        assert (always_true ^ always_true).simplify().node.value is False
+        assert (always_true ^ a).simplify().node == Xor((always_true.node, a.node))
+
+    def test_simplify_double_negation(self):
+        a, b = self.a, self.b
+        assert (~~a).simplify() is a
+        assert (~~~a).simplify().node == Not((a.node,))
+        assert (~~(a & b)).simplify().node == And((a.node, b.node))
+
+    def test_simplify_noop(self):
+        a, b = self.a, self.b
+        assert a.simplify() is a
+        p = a & b
+        assert p.simplify() is p
+
+    def test_simplify_equivalent(self):
+        values = (True, False, None)
+        for x, y in itertools.product(values, repeat=2):
+            a = predicate(lambda x=x: x, name="a")
+            b = predicate(lambda y=y: y, name="b")
+            for p in (
+                a & a & b,
+                a & always_true & b,
+                a | always_false | a,
+                (a & always_true) | (b & always_false),
+                ~~a ^ (b | b),
+                (a ^ always_false) & ~~b,
+            ):
+                assert p.simplify().test() is p.test()
+                assert (~p.simplify()).test() is (~p).test()
+
+
+class BatchTests(TestCase):
+    def test_equivalent(self):
+        values = (True, False, None)
+        targets = list(itertools.product(values, repeat=3))
+
+        def operand(i):
+            return predicate(lambda a, b: b[i], name="p%d" % i)
+
+        shapes = (
+            lambda a, b, c: a & b & c,
+            lambda a, b, c: a | b | c,
+            lambda a, b, c: a ^ b ^ c,
+            lambda a, b, c: (a & b) | ~c,
+            lambda a, b, c: ~(a ^ b) & c,
+        )
+        for shape in shapes:
+            pred = shape(operand(0), operand(1), operand(2))
+            expected = [pred.test(None, target) for target in targets]
+            assert pred.test_many(None, targets) == expected
+
+    def test_short_circuit(self):
+        calls = []
+
+        @predicate
+        def is_even(a, b):
+            calls.append(b)
+            return b % 2 == 0
+
+        @predicate
+        def is_positive(a, b):
+            calls.append(b)
+            return b > 0
+
+        assert (is_even & is_positive).test_many(None, [-2, -1, 1, 2]) == [
+            False,
+            False,
+            False,
+            True,
+        ]
+        assert calls == [-2, -1, 1, 2, -2, 2]
+
+    def test_independent(self):
+        calls = []
+
+        @predicate
+        def is_admin(user):
+            calls.append(user)
+            return user == "admin"
+
+        @predicate
+        def is_owner(user, obj):
+            return obj == user
+
+        pred = is_admin | (is_owner & ~is_admin)
+        assert pred.test_many("admin", ["x", "admin"]) == [True, True]
+        assert pred.test_many("bob", ["x", "bob"]) == [False, True]
+        assert calls == ["admin", "bob", "bob"]
+        assert pred.test_many("bob", []) == []
+
+    def test_batch(self):
+        @predicate
+        def is_owner(user, obj):
+            raise AssertionError("not called when testing a batch")
+
+        @is_owner.batch
+        def is_owner_many(user, objs):
+            return [None if obj is None else obj == user for obj in objs]
+
+        assert is_owner.test_many("bob", ["x", "bob", None]) == [False, True, False]
+        assert (~is_owner).test_many("bob", ["x", "bob", None]) == [
+            True,
+            False,
+            False,
+        ]
+        assert Predicate(is_owner, memoize=True).batch_fn is is_owner_many
+
+        pred = predicate(lambda a, b: b, batch=lambda a, bs: bs)
+        assert pred.test_many(None, iter([1, 0])) == [True, False]
+
+        # the batch function of a combined predicate is not bypassed
+        combined = Predicate(is_owner & always_true, batch=is_owner_many)
+        assert combined.node == Leaf(combined)
+        assert (combined | always_false).test_many("bob", ["x", "bob"]) == [
+            False,
+            True,
+        ]
+
+    def test_invocation_context(self):
+        @predicate(bind=True)
+        def has_target(self, a, b):
+            return len(self.context.args) == 2 and b is not None
+
+        @predicate
+        def store(a, b):
+            store.context.setdefault("targets", []).append(b)
+            return True
+
+        assert (has_target & store).test_many(None, [1, None]) == [True, False]
+        assert not _context.stack
+
+        @predicate(bind=True)
+        def nested(self, a):
+            self.context["outer"] = True
+            return has_parent.test_many(a, [1, 2]) == [True, True]
+
+        @predicate(bind=True)
+        def has_parent(self, a, b):
+            return self.context.parent["outer"]
+
+        assert nested.test("a")
+
+    def test_memoize(self):
+        calls = []
+
+        @predicate(memoize=True)
+        def memoized(a, b):
+            calls.append(b)
+            return True
+
+        assert (memoized & memoized).test_many(None, [1, 2, 1]) == [True] * 3
+        assert calls == [1, 2]
+
+
+def constant(name, value):
+    return predicate(lambda: value, name=name)
+
+
+def async_constant(name, value):
+    async def fn():
+        await asyncio.sleep(0)
+        return value
+
+    return Predicate(fn, name=name)
+
+
+class AsyncTests(TestCase):
+    def test_atest(self):
+        @predicate
+        async def is_even(a):
+            await asyncio.sleep(0)
+            return a % 2 == 0
+
+        assert is_even.is_async
+        assert asyncio.run(is_even.atest(2)) is True
+        assert asyncio.run(is_even.atest(1)) is False
+        assert asyncio.run(async_constant("p", None).atest()) is False
+        with self.assertRaises(TypeError):
+            is_even.test(2)
+        with self.assertRaises(TypeError):
+            (is_even & always_true).test(2)
+        # predicates that need no awaiting are simply tested
+        assert not (always_true & always_false).is_async
+        assert asyncio.run((always_true | always_false).atest()) is True
+
+    def test_equivalent(self):
+        values = (True, False, None)
+        shapes = (
+            lambda a, b, c: a & b & c,
+            lambda a, b, c: a | b | c,
+            lambda a, b, c: a ^ b ^ c,
+            lambda a, b, c: (a & b) | ~c,
+            lambda a, b, c: ~(a ^ b) & c,
+        )
+        for shape in shapes:
+            for a, b, c in itertools.product(values, repeat=3):
+                expected = shape(constant("a", a), constant("b", b), constant("c", c))
+                pred = shape(
+                    async_constant("a", a), constant("b", b), async_constant("c", c)
+                )
+                assert pred.is_async
+                assert asyncio.run(pred.atest()) is expected.test()
+                assert asyncio.run((~pred).atest()) is (~expected).test()
+                compiled = pred.compile()
+                assert asyncio.run(compiled.atest()) is expected.test()
+                assert asyncio.run((~compiled).atest()) is (~expected).test()
+
+    def test_async_safe(self):
+        threads = []
+
+        def recording(name, async_safe=False):
+            def fn(a):
+                threads.append((name, threading.get_ident()))
+                return True
+
+            return predicate(fn, name=name, async_safe=async_safe)
+
+        safe, unsafe = recording("safe", True), recording("unsafe")
+        awaited = async_constant("awaited", True)
+        assert (safe & ~always_false).async_safe
+        assert not (safe & unsafe).async_safe
+        assert awaited.async_safe and (awaited & unsafe).async_safe
+
+        main = threading.get_ident()
+        for pred in (safe & unsafe, (safe & unsafe).compile()):
+            del threads[:]
+            assert asyncio.run(pred.atest(1))
+            # in a single thread, other than the one of the event loop
+            assert len({thread for _, thread in threads} - {main}) == 1
+        for pred in (safe & awaited & unsafe, (safe & awaited & unsafe).compile()):
+            del threads[:]
+            assert asyncio.run(pred.atest(1))
+            assert threads[0] == ("safe", main)
+            assert threads[1][0] == "unsafe" and threads[1][1] != main
+        assert _context.stack == []
+
+    def test_short_circuit(self):
+        @predicate
+        async def shorted_predicate():
+            raise ValueError("this predicate should not be evaluated")
+
+        for pred in (
+            always_false & shorted_predicate,
+            async_constant("a", True) | shorted_predicate,
+            async_constant("a", False) & shorted_predicate,
+        ):
+            asyncio.run(pred.atest())
+            asyncio.run(pred.compile().atest())
+
+        with self.assertRaises(ValueError):
+            asyncio.run((always_true & shorted_predicate).atest())
+
+    def test_arguments(self):
+        @predicate(bind=True)
+        async def is_target(self, a, b):
+            return self.context.args == (a, b)
+
+        @predicate
+        async def is_none(a, b):
+            return a is None and b is None
+
+        assert asyncio.run(is_target.atest("a", "b"))
+        assert asyncio.run((is_none & ~is_target).atest())
+
+    def test_memoize(self):
+        calls = []
+
+        @predicate(memoize=True)
+        async def memoized(a):
+            calls.append(a)
+            return True
+
+        assert asyncio.run((memoized & memoized).atest("a"))
+        assert calls == ["a"]
+
+    def test_invocation_context(self):
+        @predicate(bind=True)
+        async def has_args(self, a):
+            self.context["a"] = a
+            await asyncio.sleep(0)
+            return self.context["a"] == a and self.context.args == (a,)
+
+        @predicate(bind=True)
+        async def nested(self, a):
+            self.context["outer"] = True
+            return has_parent.test(a) and await has_args.atest(a)
+
+        @predicate(bind=True)
+        def has_parent(self, a):
+            return self.context.parent["outer"]
+
+        async def main():
+            return await asyncio.gather(*(has_args.atest(i) for i in range(10)))
+
+        assert asyncio.run(main()) == [True] * 10
+        assert asyncio.run(nested.atest("a"))
+        assert _context.stack == []
+
+
+def slow(name, value, seconds=0.02):
+    def fn():
+        time.sleep(seconds)
+        return value
+
+    return predicate(fn, name=name)
+
+
+class DeadlineTests(TestCase):
+    def setUp(self):
+        self.overruns = []
+        predicates.overrun_handlers.append(self.record)
+        self.addCleanup(predicates.overrun_handlers.remove, self.record)
+        patcher = mock.patch.object(predicates.logger, "warning")
+        self.warning = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, pred, exc):
+        self.overruns.append((pred.name, exc.predicate.name))
+
+    def test_timeout(self):
+        a, b = slow("a", True), constant("b", True)
+        assert not a.test(timeout=0.01)
+        assert not (b & a).test(timeout=0.01)
+        assert not (a | b).test(timeout=0.01)
+        assert (a | b).test(timeout=1)
+        assert (a | b).test()
+        assert self.overruns == [("a", "a"), ("(b & a)", "a"), ("(a | b)", "a")]
+        assert self.warning.call_count == 3
+        assert predicates._deadlines == 0
+
+    def test_policy(self):
+        a = slow("a", False)
+        with mock.patch.object(predicates, "timeout_policy", "allow"):
+            assert a.test(timeout=0.01)
+        with mock.patch.object(predicates, "timeout_policy", "raise"):
+            with self.assertRaises(DeadlineExceeded) as cm:
+                (a | always_false).test(timeout=0.01)
+        assert cm.exception.predicate is a
+        assert cm.exception.overrun > 0
+        assert len(self.overruns) == 2
+
+    def test_deadline(self):
+        calls = []
+        counted = predicate(lambda: calls.append(1) or True)
+        a = slow("a", True)
+        with deadline(1):
+            with deadline(0.01):
+                assert not (a & counted).test()
+            assert (a & counted).test()
+        assert calls == [1]
+        assert predicates._deadlines == 0
+
+    def test_predicate_timeout(self):
+        a = slow("a", True)
+        timed = predicate(a.fn, name="timed", timeout=0.01)
+        assert not timed.test()
+        assert (always_true | timed).test()
+        assert not (always_true & timed).compile().test()
+
+        # combined predicates with a timeout are evaluated as a whole
+        pred = Predicate(constant("b", True) & a & a, timeout=0.01)
+        assert isinstance(pred.node, Leaf)
+        assert pred.simplify() is pred
+        assert not (always_true & pred).test()
+        assert self.overruns[-1] == ("(always_true & ((b & a) & a))", "a")
+
+    def test_compiled(self):
+        calls = []
+        counted = predicate(lambda: calls.append(1) or True, name="counted")
+        a = slow("a", True)
+        compiled = (a & counted).compile()
+        assert not compiled.test(timeout=0.01)
+        assert calls == []
+        assert self.overruns == [("(a & counted)", "a")]
+        assert compiled.test(timeout=1)
+        assert compiled.test()
+        assert calls == [1, 1]
+
+    def test_nested(self):
+        a = slow("a", False)
+
+        @predicate
+        def nested():
+            return not a.test()
+
+        assert not nested.test(timeout=0.01)
+        assert self.overruns == [("nested", "a")]
+
+    def test_many(self):
+        a = predicate(lambda user, obj: time.sleep(0.01) or obj > 1)
+        assert a.test_many("user", [1, 2]) == [False, True]
+        with deadline(0.005):
+            assert a.test_many("user", [2, 3]) == [False, False]
+
+    def test_async(self):
+        @predicate
+        async def hangs():
+            await asyncio.sleep(10)
+            return True
+
+        start = time.monotonic()
+        assert not asyncio.run((hangs | always_true).atest(timeout=0.01))
+        assert not asyncio.run((always_false | hangs).compile().atest(timeout=0.01))
+        timed = predicate(hangs.fn, name="timed", timeout=0.01)
+        assert not asyncio.run((timed | async_constant("b", True)).atest())
+        assert time.monotonic() - start < 5
+        assert self.overruns == [
+            ("(hangs | always_true)", "hangs"),
+            ("(always_false | hangs)", "hangs"),
+            ("(timed | b)", "timed"),
+        ]
+
+
+def of_user(name, value):
+    return predicate(lambda user: value, name=name)
+
+
+def of_object(name, value):
+    # ``value`` for truthy objects, the opposite for others
+    return predicate(lambda user, obj: None if value is None else value is bool(obj))
+
+
+class SpecializeTests(TestCase):
+    def test_equivalent(self):
+        values = (True, False, None)
+        shapes = (
+            lambda a, b, c: a & b & c,
+            lambda a, b, c: a | b | c,
+            lambda a, b, c: a ^ b ^ c,
+            lambda a, b, c: (a & b) | ~c,
+            lambda a, b, c: ~(a ^ b) & c,
+        )
+        for shape in shapes:
+            for a, b, c in itertools.product(values, repeat=3):
+                pred = shape(of_user("a", a), of_object("b", b), of_user("c", c))
+                for obj in (True, False):
+                    residual = pred.specialize("user")
+                    assert residual.test(obj) is pred.test("user", obj)
+
+    def test_constants(self):
+        is_staff = predicate(lambda user: user == "staff")
+        is_owner = predicate(lambda user, obj: obj == user)
+        pred = is_staff | (is_owner & ~is_staff)
+        assert pred.specialize("staff") is always_allow
+        assert (is_staff & is_owner).specialize("user") is always_deny
+        assert predicate(lambda user: None).specialize("user") is always_deny
+
+        residual = pred.specialize("user")
+        assert residual.test("user")
+        assert not residual.test("other")
+
+    def test_evaluated_once(self):
+        calls = []
+
+        @predicate
+        def is_staff(user):
+            calls.append(user)
+            return False
+
+        @predicate
+        def shorted_predicate(user):
+            raise ValueError("this predicate should not be evaluated")
+
+        is_owner = predicate(lambda user, obj: obj == user)
+        pred = (is_staff | is_owner) | (always_true | shorted_predicate)
+        residual = pred.specialize("user")
+        assert calls == ["user"]
+        assert residual is always_allow
+
+        residual = (is_staff | is_owner).specialize("user")
+        assert [residual.test(obj) for obj in ("user", "other")] == [True, False]
+        assert calls == ["user", "user"]
+
+    def test_invocation_context(self):
+        @predicate(bind=True)
+        def has_args(self, user, obj):
+            return self.context.args == (user, obj)
+
+        @predicate
+        def is_user(user):
+            return user == "user" and is_user.context.args == (user,)
+
+        residual = (is_user & has_args).specialize("user")
+        assert residual.test("obj")
+        assert not (is_user & has_args).specialize("other").test("obj")
+
+    def test_async(self):
+        @predicate
+        async def is_owner(user, obj):
+            await asyncio.sleep(0)
+            return obj == user
+
+        residual = (is_owner | always_false).specialize("user")
+        assert residual.is_async
+        assert asyncio.run(residual.atest("user"))
+        assert not asyncio.run(residual.atest("other"))
@@ -1,6 +1,9 @@
+import asyncio
+import copy
+import threading
 from unittest import TestCase
 
-from rules.predicates import always_false, always_true
+from rules.predicates import Predicate, always_false, always_true, predicate
 from rules.rulesets import (
     RuleSet,
     add_rule,
@@ -9,6 +12,7 @@ from rules.rulesets import (
     rule_exists,
     set_rule,
     test_rule,
+    test_rules,
 )
 
 
@@ -49,3 +53,193 @@ class RulesetTests(TestCase):
         assert not test_rule("somerule")
         ruleset.remove_rule("somerule")
         assert not ruleset.rule_exists("somerule")
+
+    def test_simplified_on_registration(self):
+        pred = predicate(lambda: True, name="pred")
+        ruleset = RuleSet()
+        ruleset.add_rule("somerule", pred)
+        assert ruleset["somerule"] is pred
+        ruleset.add_rule("otherrule", (pred & always_true) & (pred & always_true))
+        assert ruleset["otherrule"].name == "(pred & always_true)"
+        ruleset.set_rule("otherrule", ~~pred | always_false | always_true)
+        assert ruleset["otherrule"] is always_true
+        ruleset.set_rule("otherrule", Predicate(pred & pred, name="can_edit"))
+        assert ruleset["otherrule"].name == "can_edit"
+        assert ruleset["otherrule"].node == pred.node
+
+    def test_deep_rule(self):
+        # a rule built in a loop is registered without formatting its tree
+        # recursively
+        def leaf(i):
+            return predicate(lambda: i == 499 or None, name="p%d" % i)
+
+        rule = leaf(0)
+        for i in range(1, 500):
+            rule = rule | leaf(i)
+        ruleset = RuleSet()
+        ruleset.add_rule("somerule", rule)
+        assert ruleset.test_rule("somerule")
+        assert ruleset["somerule"].name == "(%s)" % " | ".join(
+            "p%d" % i for i in range(500)
+        )
+
+    def test_test_rule_many(self):
+        ruleset = RuleSet()
+        ruleset.add_rule("somerule", predicate(lambda a, b: b))
+        assert ruleset.test_rule_many("somerule", None, [1, 0]) == [True, False]
+        assert ruleset.test_rule_many("otherrule", None, [1, 0]) == [False, False]
+
+    def test_atest_rule(self):
+        @predicate
+        async def is_even(a):
+            return a % 2 == 0
+
+        ruleset = RuleSet()
+        ruleset.add_rule("somerule", is_even)
+        assert asyncio.run(ruleset.atest_rule("somerule", 2))
+        assert not asyncio.run(ruleset.atest_rule("somerule", 1))
+        assert not asyncio.run(ruleset.atest_rule("otherrule", 2))
+
+    def test_test_rules(self):
+        calls = []
+
+        @predicate(memoize=True)
+        def is_author(user, book):
+            calls.append((user, book))
+            return book == "book-by-%s" % user
+
+        @predicate(bind=True)
+        def remember(self, user, book):
+            self.context.setdefault("seen", []).append(self.context.args)
+            return len(self.context["seen"]) == 1
+
+        ruleset = RuleSet()
+        ruleset.add_rule("view", always_true)
+        ruleset.add_rule("change", is_author & remember)
+        ruleset.add_rule("delete", is_author & always_false)
+        ruleset.add_rule("share", is_author | remember)
+
+        decisions = ruleset.test_rules(
+            ["view", "change", "delete", "nonexistent", "share"],
+            "adrian",
+            "book-by-adrian",
+        )
+        assert decisions == {
+            "view": True,
+            "change": True,
+            "delete": False,
+            "nonexistent": False,
+            "share": True,
+        }
+        assert calls == [("adrian", "book-by-adrian")]
+        assert ruleset.test_rules([], "adrian") == {}
+
+        # the rules share the context, as well as the memo
+        decisions = ruleset.test_rules(["share", "change"], "adrian", "other-book")
+        assert decisions == {"share": True, "change": False}
+
+        add_rule("somerule", always_true)
+        assert test_rules(["somerule", "otherrule"]) == {
+            "somerule": True,
+            "otherrule": False,
+        }
+
+    def test_rule_names(self):
+        ruleset = RuleSet()
+        for name in ("books.view", "books.change", "bookshelf.view", "authors.view"):
+            ruleset.add_rule(name, always_true)
+        assert ruleset.rule_names("books.") == ["books.change", "books.view"]
+        assert ruleset.rule_names("books") == [
+            "books.change",
+            "books.view",
+            "bookshelf.view",
+        ]
+        assert ruleset.rule_names("zebras.") == []
+        assert ruleset.rule_names() == sorted(ruleset)
+        ruleset.remove_rule("books.view")
+        assert ruleset.rule_names("books.") == ["books.change"]
+
+    def test_snapshot(self):
+        pred = predicate(lambda: True, name="pred")
+        ruleset = RuleSet(somerule=pred)
+        assert ruleset.version == 1
+        snapshot = ruleset.snapshot
+        assert dict(snapshot) == {"somerule": pred}
+        assert ruleset.snapshot is snapshot
+        with self.assertRaises(TypeError):
+            snapshot["otherrule"] = pred
+
+        changes = (
+            lambda: ruleset.add_rule("otherrule", pred & always_true),
+            lambda: ruleset.set_rule("otherrule", pred),
+            lambda: ruleset.remove_rule("otherrule"),
+            lambda: ruleset.update({"otherrule": ~~pred}),
+            lambda: ruleset.setdefault("thirdrule", pred),
+            lambda: ruleset.pop("thirdrule"),
+            lambda: ruleset.popitem(),
+            lambda: ruleset.clear(),
+        )
+        for version, change in enumerate(changes, 2):
+            before = ruleset.snapshot
+            change()
+            assert ruleset.version == version
+            assert ruleset.snapshot is not before
+            assert dict(ruleset.snapshot) == dict(ruleset)
+        # the snapshot taken first is unchanged
+        assert dict(snapshot) == {"somerule": pred}
+        assert not ruleset.test_rule("somerule")
+
+        # rules are simplified however they are set
+        ruleset.update(somerule=pred & pred)
+        ruleset |= {"otherrule": ~~pred}
+        assert ruleset["somerule"] is pred
+        assert ruleset["otherrule"] is pred
+        with self.assertRaises(KeyError):
+            ruleset.pop("nonexistent")
+        assert ruleset.version == len(changes) + 3
+
+        clone = copy.copy(ruleset)
+        assert type(clone) is RuleSet and clone == ruleset
+        clone.clear()
+        assert len(ruleset) == 2
+
+        ruleset.set_rule("otherrule", pred | predicate(lambda: False))
+        clone = copy.deepcopy(ruleset)
+        assert clone["otherrule"].node is ruleset["otherrule"].node
+        assert clone.test_rule("otherrule")
+
+    def test_compiled(self):
+        ruleset = RuleSet()
+        ruleset.add_rule("somerule", predicate(lambda a: a) & always_true)
+        ruleset.compile()
+        ruleset.add_rule("otherrule", predicate(lambda a: a) | always_false)
+        for name in ("somerule", "otherrule"):
+            assert hasattr(ruleset[name].fn, "__source__")
+            assert ruleset.test_rule(name, True)
+
+    def test_concurrent(self):
+        ruleset = RuleSet(somerule=always_true)
+        errors = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                try:
+                    assert ruleset.test_rule("somerule")
+                    list(ruleset.snapshot.items())
+                except Exception as e:  # pragma: no cover
+                    errors.append(e)
+                    return
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for i in range(2000):
+            ruleset.set_rule("rule%d" % i, always_false)
+            if i % 2:
+                ruleset.remove_rule("rule%d" % i)
+        done.set()
+        for reader in readers:
+            reader.join()
+        assert errors == []
+        assert ruleset.version == 3001
@@ -0,0 +1,68 @@
+from unittest import TestCase
+
+from rules.predicates import observers, predicate
+from rules.stats import StatsCollector
+
+
+def constant(name, value):
+    return predicate(lambda: value, name=name)
+
+
+class StatsCollectorTests(TestCase):
+    def setUp(self):
+        self.collector = StatsCollector(buckets=(1.0, 0.001))
+        self.collector.start()
+        self.addCleanup(self.collector.stop)
+
+    def test_start_stop(self):
+        self.collector.start()
+        assert observers.count(self.collector.observe) == 1
+        self.collector.stop()
+        assert self.collector.observe not in observers
+
+        constant("a", True).test()
+        assert self.collector.snapshot() == {}
+
+    def test_counts(self):
+        a, b, c = constant("a", True), constant("b", False), constant("c", None)
+        (a & b).test()
+        (b | c).test()
+        a.test()
+
+        snapshot = self.collector.snapshot()
+        assert set(snapshot) == {"a", "b", "c", "(a & b)", "(b | c)"}
+        assert snapshot["a"]["calls"] == 2
+        assert snapshot["a"]["true"] == 2
+        assert snapshot["b"]["false"] == 2
+        assert snapshot["c"]["skipped"] == 1
+        assert snapshot["(b | c)"]["false"] == 1
+        assert snapshot["a"]["elapsed"] > 0
+
+        self.collector.reset()
+        assert self.collector.snapshot() == {}
+
+    def test_buckets(self):
+        pred = constant("a", True)
+        self.collector.observe(pred, True, 0.0001)
+        self.collector.observe(pred, True, 0.001)
+        self.collector.observe(pred, False, 0.5)
+        self.collector.observe(pred, None, 2.0)
+        buckets = self.collector.snapshot()["a"]["buckets"]
+        assert buckets == {0.001: 2, 1.0: 3, float("inf"): 4}
+
+    def test_prometheus(self):
+        pred = constant('say "hi"\\', True)
+        self.collector.observe(pred, True, 0.0001)
+        self.collector.observe(pred, None, 2.0)
+        lines = self.collector.prometheus(prefix="app").splitlines()
+        label = 'predicate="say \\"hi\\"\\\\"'
+        assert "# TYPE app_calls_total counter" in lines
+        assert 'app_calls_total{%s,result="true"} 1' % label in lines
+        assert 'app_calls_total{%s,result="false"} 0' % label in lines
+        assert 'app_calls_total{%s,result="skipped"} 1' % label in lines
+        assert "# TYPE app_duration_seconds histogram" in lines
+        assert 'app_duration_seconds_bucket{%s,le="0.001"} 1' % label in lines
+        assert 'app_duration_seconds_bucket{%s,le="1.0"} 1' % label in lines
+        assert 'app_duration_seconds_bucket{%s,le="+Inf"} 2' % label in lines
+        assert "app_duration_seconds_sum{%s} 2.0001" % label in lines
+        assert "app_duration_seconds_count{%s} 2" % label in lines